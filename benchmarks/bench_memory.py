@@ -0,0 +1,115 @@
+"""
+Benchmark de memoria por mensaje en MemoryService.
+
+Compara el formato anterior (un dict por mensaje con timestamp ISO y
+metadatos vacíos propios) con los registros compactos de MemoryService.
+
+Uso:
+    python -m benchmarks.bench_memory [--messages 20000]
+"""
+import argparse
+import asyncio
+import gc
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from src.services.memory_service import MemoryService
+
+
+CONVERSATIONS = 100
+CONTENTS = (
+    "Hola, quería reservar para el sábado",
+    "¡Hola! ¿Para cuántas personas sería la reserva?",
+    "Somos 4, a las 21hs",
+    "Perfecto, ¿a nombre de quién?",
+)
+
+
+def _measure(build: Callable[[], Any]) -> int:
+    """Bytes retenidos por la estructura que devuelve `build`"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return after - before
+
+
+def _contents(total: int) -> List[str]:
+    # Contenidos distintos por mensaje, como en conversaciones reales
+    return [f"{CONTENTS[i % len(CONTENTS)]} #{i}" for i in range(total)]
+
+
+def build_dicts(contents: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """Formato anterior: un dict nuevo por mensaje"""
+    conversations: Dict[str, List[Dict[str, Any]]] = {}
+    for i, content in enumerate(contents):
+        conversations.setdefault(f"conv_{i % CONVERSATIONS}", []).append({
+            "role": "user" if i % 2 else "assistant",
+            "content": content,
+            "timestamp": datetime.now().isoformat(),
+            "metadata": {}
+        })
+    return conversations
+
+
+def build_compact(contents: List[str]) -> MemoryService:
+    """Formato actual: registros compactos de MemoryService"""
+    service = MemoryService(
+        max_conversations=CONVERSATIONS,
+        max_messages=len(contents),
+        idle_ttl_seconds=3600
+    )
+    
+    async def fill() -> None:
+        for i, content in enumerate(contents):
+            await service.add_message(
+                f"conv_{i % CONVERSATIONS}",
+                "user" if i % 2 else "assistant",
+                content
+            )
+    
+    asyncio.run(fill())
+    return service
+
+
+def run(messages: int) -> Dict[str, float]:
+    """
+    Ejecuta el benchmark.
+    
+    Args:
+        messages: Cantidad total de mensajes a guardar
+    
+    Returns:
+        Bytes por mensaje de cada formato (sin contar el contenido)
+    """
+    contents = _contents(messages)
+    dict_bytes = _measure(lambda: build_dicts(contents))
+    compact_bytes = _measure(lambda: build_compact(contents))
+    
+    return {
+        "messages": messages,
+        "dict_bytes_per_message": dict_bytes / messages,
+        "compact_bytes_per_message": compact_bytes / messages,
+        "reduction": 1 - compact_bytes / dict_bytes
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args()
+    
+    result = run(args.messages)
+    print(f"Mensajes:                 {result['messages']}")
+    print(f"Formato dict:             {result['dict_bytes_per_message']:.0f} bytes/mensaje")
+    print(f"Formato compacto:         {result['compact_bytes_per_message']:.0f} bytes/mensaje")
+    print(f"Reducción:                {result['reduction']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Reporte de arranque: tiempo hasta la primera llamada a un tool.
+
+Lanza procesos nuevos (arranque en frío, como un contenedor que escala en el
+pico del almuerzo) que importan main, construyen LaCabreraMCPServer y llaman
+a un tool. Informa el tiempo de cada etapa y, con `-X importtime`, los
+imports más caros. Con --target-ms termina con error si el arranque supera
+el objetivo.
+
+Uso:
+    python -m benchmarks.bench_startup [--runs 5] [--top 15] [--target-ms 1500]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Script del proceso hijo: mide cada etapa con el reloj del propio proceso
+CHILD = """
+import asyncio, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+server = main.LaCabreraMCPServer()
+constructed = time.perf_counter()
+asyncio.run(server.tools[{tool!r}]())
+called = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - started) * 1000,
+    "construct_ms": (constructed - imported) * 1000,
+    "first_call_ms": (called - constructed) * 1000
+}}))
+"""
+
+
+def _env(data_dir: str) -> Dict[str, str]:
+    """Entorno aislado: sin planilla, sin SMTP, sin endpoint de métricas"""
+    return {
+        **os.environ,
+        "DATA_DIR": data_dir,
+        "DATABASE_URL": "",
+        "GOOGLE_SHEETS_ID": "",
+        "MEMORY_BACKEND": "memory",
+        "ADMIN_EMAIL": "",
+        "SMTP_HOST": "",
+        "METRICS_PORT": "0"
+    }
+
+
+def run_once(tool: str, importtime: bool = False) -> Tuple[Dict[str, float], str]:
+    """
+    Arranca un proceso nuevo y mide hasta la primera respuesta del tool.
+    
+    Args:
+        tool: Tool a llamar
+        importtime: Ejecutar con -X importtime
+    
+    Returns:
+        Tupla (etapas en ms, stderr del proceso)
+    """
+    data_dir = tempfile.mkdtemp(prefix="lacabrera-startup-")
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", CHILD.format(tool=tool)]
+    try:
+        started = time.perf_counter()
+        process = subprocess.run(command, cwd=ROOT, env=_env(data_dir), capture_output=True, text=True)
+        total_ms = (time.perf_counter() - started) * 1000
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    
+    if process.returncode != 0:
+        raise RuntimeError(f"El proceso de arranque falló:\n{process.stderr[-2000:]}")
+    
+    stages = json.loads(process.stdout.strip().splitlines()[-1])
+    stages["process_ms"] = total_ms
+    return stages, process.stderr
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """
+    Parsea la salida de -X importtime.
+    
+    Returns:
+        Lista de (módulo, profundidad, propio µs, acumulado µs)
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # La indentación del nombre indica quién disparó el import
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5, help="Arranques medidos (se informa la mediana)")
+    parser.add_argument("--tool", default="get_business_hours", help="Tool de la primera llamada")
+    parser.add_argument("--top", type=int, default=15, help="Imports más caros a listar")
+    parser.add_argument("--target-ms", type=float, help="Objetivo de tiempo hasta la primera llamada")
+    args = parser.parse_args()
+    
+    runs = [run_once(args.tool)[0] for _ in range(args.runs)]
+    median = {stage: statistics.median(run[stage] for run in runs) for stage in runs[0]}
+    time_to_first_call = median["process_ms"]
+    
+    _, stderr = run_once(args.tool, importtime=True)
+    imports = parse_importtime(stderr)
+    
+    print(f"Arranque en frío (mediana de {args.runs}):")
+    print(f"  Imports de main:            {median['import_ms']:8.1f} ms")
+    print(f"  Construcción del servidor:  {median['construct_ms']:8.1f} ms")
+    print(f"  Primera llamada:            {median['first_call_ms']:8.1f} ms ({args.tool})")
+    print(f"  Proceso completo:           {time_to_first_call:8.1f} ms (incluye el intérprete)")
+    
+    # Los primeros niveles muestran qué módulo del proyecto arrastra cada dependencia
+    top_level = sorted((row for row in imports if row[1] <= 2), key=lambda row: row[3], reverse=True)
+    print("\nImports más caros (acumulado, -X importtime):")
+    for name, _, _, cumulative_us in top_level[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+    
+    if args.target_ms is not None:
+        if time_to_first_call > args.target_ms:
+            print(f"\n❌ Tiempo hasta la primera llamada {time_to_first_call:.0f} ms > objetivo {args.target_ms:.0f} ms")
+            sys.exit(1)
+        print(f"\n✅ Tiempo hasta la primera llamada {time_to_first_call:.0f} ms <= objetivo {args.target_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""
+Microbenchmarks de los tools MCP y de los servicios que usan.
+
+Llama directamente a cada método de ValidationTools, ReservationTools,
+RestaurantInfoTools, AdminTools, MemoryService y CalendarService contra
+backends falsos y deterministas: snapshot de ejemplo de Google Sheets,
+escrituras a la planilla y notificaciones en memoria, SQLite en un
+directorio temporal y un reloj fijo para la memoria de conversaciones.
+Mide ops/seg, latencia p50/p99 y bytes asignados por llamada.
+
+Uso:
+    python -m benchmarks.bench_tools [--iterations 2000] [--only validation.]
+    python -m benchmarks.bench_tools --save benchmarks/baseline.json
+    python -m benchmarks.bench_tools --compare benchmarks/baseline.json [--threshold 0.25]
+"""
+import argparse
+import asyncio
+import gc
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+from dataclasses import replace
+from datetime import date, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# La configuración se lee al importar src: hay que aislarla antes
+DATA_DIR = tempfile.mkdtemp(prefix="lacabrera-bench-")
+os.environ.update({
+    "DATA_DIR": DATA_DIR,
+    "DATABASE_URL": "",
+    "GOOGLE_SHEETS_ID": "",
+    "MEMORY_BACKEND": "memory",
+    "MEMORY_PERSISTENCE": "false",
+    "ADMIN_EMAIL": "",
+    "SMTP_HOST": ""
+})
+
+from src.services.calendar_service import CalendarService
+from src.services.google_sheets import GoogleSheetsService
+from src.services.memory_service import MemoryService
+from src.tools.admin_tools import AdminTools
+from src.tools.info_tools import RestaurantInfoTools
+from src.tools.reservation_tools import ReservationTools
+from src.tools.validation_tools import ValidationTools
+
+
+BenchFn = Callable[[], Awaitable[Any]]
+
+# Lunes: las fechas de prueba caen siempre en los mismos días de la semana
+BASE_DATE = date(2030, 1, 7)
+FECHAS = [(BASE_DATE + timedelta(days=offset)).isoformat() for offset in range(365)]
+HORAS = ("12:30", "13:00", "13:30", "14:00", "20:30", "21:00", "21:30", "22:00")
+
+# Llamadas medidas con tracemalloc (es lento: se mide aparte de la latencia)
+ALLOC_SAMPLES = 50
+
+# Diferencias de p50 menores a esto son ruido, aunque superen el umbral relativo
+MIN_P50_DELTA_US = 2.0
+# Ídem para los bytes asignados por llamada
+MIN_ALLOC_DELTA_BYTES = 256
+
+# Menú de tamaño realista para la búsqueda (el snapshot de ejemplo no tiene platos)
+BENCH_MENU = {
+    section: [
+        {"nombre": f"{dish} {i}", "descripcion": f"{description} ({i})", "precio": 1000.0 * (i + 1)}
+        for i in range(30)
+        for dish, description in [names]
+    ]
+    for section, names in (
+        ("entradas", ("Provoleta", "Queso provolone a la parrilla con orégano")),
+        ("principales", ("Bife de chorizo", "Corte de novillo a la parrilla con guarnición")),
+        ("postres", ("Panqueque", "Con dulce de leche y crema")),
+        ("bebidas", ("Malbec", "Vino tinto de Mendoza"))
+    )
+}
+SEARCH_QUERIES = ("bife de chorizo", "vinos malbec", "dulce de leche", "provoleta", "postres", "chorrizo")
+
+
+class FakeSheetsService(GoogleSheetsService):
+    """Google Sheets sin red: snapshot de ejemplo y filas de reservas en memoria"""
+    
+    def __init__(self, menu_details: Optional[Dict[str, Any]] = None):
+        super().__init__()
+        self.rows: deque = deque(maxlen=1000)
+        self.menu_details = menu_details
+    
+    async def _reload_snapshot(self, *args, **kwargs):
+        snapshot = await super()._reload_snapshot(*args, **kwargs)
+        if self.menu_details is not None:
+            snapshot = self._snapshot = replace(snapshot, menu_details=self.menu_details)
+        return snapshot
+    
+    async def save_reservation(self, reservation_data: Dict[str, Any]) -> bool:
+        self.rows.append([reservation_data.get(column) for column in self.RESERVATION_COLUMNS])
+        return True
+
+
+class FakeNotificationService:
+    """Cola de notificaciones en memoria (sin SMTP)"""
+    
+    enabled = True
+    
+    def __init__(self):
+        self.queued: deque = deque(maxlen=1000)
+    
+    def enqueue(self, subject: str, message: str, priority: str = "normal", key: Optional[str] = None) -> bool:
+        self.queued.append((subject, message, priority, key))
+        return True
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {"queued": len(self.queued)}
+
+
+class StepClock:
+    """Reloj determinista: avanza 1ms en cada lectura"""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self) -> float:
+        self.now += 0.001
+        return self.now
+
+
+def build_cases() -> List[Tuple[str, BenchFn]]:
+    """
+    Arma los casos de benchmark con sus backends falsos.
+    
+    Returns:
+        Lista de (nombre, función sin argumentos que devuelve el awaitable)
+    """
+    validation = ValidationTools()
+    
+    reservations = ReservationTools()
+    reservations.sheets_service = FakeSheetsService()
+    
+    info = RestaurantInfoTools()
+    info.sheets_service = FakeSheetsService()
+    
+    search = RestaurantInfoTools()
+    search.sheets_service = FakeSheetsService(menu_details=BENCH_MENU)
+    
+    admin = AdminTools(notification_service=FakeNotificationService())
+    
+    memory = MemoryService(max_conversations=1000, max_messages=200, idle_ttl_seconds=3600, clock=StepClock())
+    calendar = CalendarService(capacity=80)
+    
+    counter = itertools.count()
+    batch = [
+        [FECHAS[i], HORAS[i % len(HORAS)], ("ejecutivo", "manso", "carta")[i % 3], bool(i % 2)]
+        for i in range(50)
+    ]
+    replay = {
+        "nombre": "Cliente Repetido", "telefono": "+54 9 261 000 0000", "email": "repetido@example.com",
+        "personas": 2, "fecha": FECHAS[0], "hora": "21:00"
+    }
+    
+    def fecha() -> str:
+        return FECHAS[next(counter) % len(FECHAS)]
+    
+    def new_reservation() -> Dict[str, Any]:
+        # Cliente, día y hora distintos en cada llamada: siempre una reserva nueva
+        i = next(counter)
+        return {
+            "nombre": f"Cliente {i}", "telefono": f"+54 9 261 {i:07d}", "email": f"cliente{i}@example.com",
+            "personas": 1, "fecha": FECHAS[i % len(FECHAS)], "hora": HORAS[(i // len(FECHAS)) % len(HORAS)]
+        }
+    
+    async def reserve_and_release() -> None:
+        reservation_id = f"BENCH_{next(counter)}"
+        await calendar.reserve_seats(fecha(), "21:00", 2, reservation_id)
+        await calendar.release_seats(reservation_id)
+    
+    return [
+        ("validation.validate_executive_menu", lambda: validation.validate_executive_menu(fecha(), "13:00", True)),
+        ("validation.validate_manso_menu", lambda: validation.validate_manso_menu(fecha(), "21:00")),
+        ("validation.validate_menus_batch_50", lambda: validation.validate_menus_batch(batch)),
+        ("reservation.create_reservation", lambda: reservations.create_reservation(new_reservation())),
+        ("reservation.create_reservation_replay", lambda: reservations.create_reservation(dict(replay))),
+        ("reservation.check_availability", lambda: reservations.check_availability(fecha(), "21:00", 4)),
+        ("reservation.get_availability_matrix_31d", lambda: reservations.get_availability_matrix(FECHAS[0], FECHAS[30])),
+        ("info.get_restaurant_info", lambda: info.get_restaurant_info("general")),
+        ("info.get_menu_prices", lambda: info.get_menu_prices("ejecutivo")),
+        ("info.get_business_hours", lambda: info.get_business_hours()),
+        ("info.get_menu_details", lambda: info.get_menu_details()),
+        ("info.search_menu", lambda: search.search_menu(SEARCH_QUERIES[next(counter) % len(SEARCH_QUERIES)])),
+        ("admin.escalate_to_human", lambda: admin.escalate_to_human(
+            "¿Tienen opciones sin TACC?", {"name": "Cliente", "phone": f"+54 9 261 {next(counter) % 100:07d}"}
+        )),
+        ("admin.mark_as_human_required", lambda: admin.mark_as_human_required(f"conv_{next(counter) % 100}", "Reclamo")),
+        ("admin.send_admin_notification", lambda: admin.send_admin_notification(
+            "Consulta", "Detalle de la consulta", "normal", {"conversation_id": f"conv_{next(counter) % 100}"}
+        )),
+        ("admin.get_server_metrics", lambda: admin.get_server_metrics()),
+        ("memory.add_message", lambda: memory.add_message(f"conv_{next(counter) % 500}", "user", "Quiero reservar para 4")),
+        ("memory.get_conversation_history", lambda: memory.get_conversation_history(f"conv_{next(counter) % 500}", limit=20)),
+        ("memory.update_customer_context", lambda: memory.update_customer_context(
+            f"cliente_{next(counter) % 500}", {"personas": 4, "menu": "carta"}
+        )),
+        ("memory.get_customer_context", lambda: memory.get_customer_context(f"cliente_{next(counter) % 500}")),
+        ("calendar.check_availability", lambda: calendar.check_availability(fecha(), "21:00", 4)),
+        ("calendar.get_available_slots", lambda: calendar.get_available_slots(fecha(), personas=4)),
+        ("calendar.reserve_and_release", reserve_and_release),
+        ("calendar.get_remaining_matrix_31d", lambda: calendar.get_remaining_matrix(FECHAS[:31])),
+    ]
+
+
+async def measure(fn: BenchFn, iterations: int, warmup: int) -> Dict[str, float]:
+    """
+    Mide un caso.
+    
+    Args:
+        fn: Función que devuelve el awaitable a medir
+        iterations: Llamadas medidas
+        warmup: Llamadas previas sin medir
+    
+    Returns:
+        ops_per_sec, p50_us, p99_us y alloc_bytes_per_call (mediana del pico
+        de memoria asignada durante una llamada)
+    """
+    for _ in range(warmup):
+        await fn()
+    
+    perf_counter_ns = time.perf_counter_ns
+    samples = []
+    started = perf_counter_ns()
+    for _ in range(iterations):
+        start = perf_counter_ns()
+        await fn()
+        samples.append(perf_counter_ns() - start)
+    elapsed = perf_counter_ns() - started
+    
+    gc.collect()
+    tracemalloc.start()
+    allocated = []
+    for _ in range(ALLOC_SAMPLES):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        await fn()
+        allocated.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    
+    samples.sort()
+    return {
+        "ops_per_sec": round(iterations / (elapsed / 1e9), 1),
+        "p50_us": round(samples[len(samples) // 2] / 1000, 2),
+        "p99_us": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] / 1000, 2),
+        "alloc_bytes_per_call": int(statistics.median(allocated))
+    }
+
+
+async def run_cases(iterations: int, warmup: int, only: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Ejecuta todos los casos (o los que empiezan con `only`).
+    
+    Args:
+        iterations: Llamadas medidas por caso
+        warmup: Llamadas previas sin medir
+        only: Prefijo de nombre para filtrar casos
+    
+    Returns:
+        Resultados por nombre de caso
+    """
+    results = {}
+    for name, fn in build_cases():
+        if only and not name.startswith(only):
+            continue
+        results[name] = await measure(fn, iterations, warmup)
+        print(_format_row(name, results[name]), flush=True)
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float
+) -> List[str]:
+    """
+    Compara contra una línea base.
+    
+    Args:
+        results: Resultados actuales
+        baseline: Resultados de la línea base
+        threshold: Regresión relativa tolerada (0.25 = 25%)
+    
+    Returns:
+        Descripción de cada regresión encontrada (vacía si no hay)
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        
+        p50_delta = current["p50_us"] - base["p50_us"]
+        if p50_delta > MIN_P50_DELTA_US and current["p50_us"] > base["p50_us"] * (1 + threshold):
+            regressions.append(
+                f"{name}: p50 {base['p50_us']:.1f}µs -> {current['p50_us']:.1f}µs "
+                f"(+{p50_delta / base['p50_us']:.0%})"
+            )
+        
+        alloc_delta = current["alloc_bytes_per_call"] - base["alloc_bytes_per_call"]
+        if alloc_delta > MIN_ALLOC_DELTA_BYTES and current["alloc_bytes_per_call"] > base["alloc_bytes_per_call"] * (1 + threshold):
+            regressions.append(
+                f"{name}: memoria {base['alloc_bytes_per_call']} -> {current['alloc_bytes_per_call']} bytes/llamada"
+            )
+    return regressions
+
+
+def _format_row(name: str, result: Dict[str, float]) -> str:
+    return (
+        f"{name:<45} {result['ops_per_sec']:>12,.0f} ops/s  p50 {result['p50_us']:>9.1f}µs  "
+        f"p99 {result['p99_us']:>9.1f}µs  {result['alloc_bytes_per_call']:>8} B/llamada"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--only", help="Prefijo de los casos a ejecutar (por ejemplo, validation.)")
+    parser.add_argument("--save", metavar="ARCHIVO", help="Guardar los resultados como línea base JSON")
+    parser.add_argument("--compare", metavar="ARCHIVO", help="Comparar contra una línea base JSON")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Regresión relativa tolerada (default: 0.25)")
+    args = parser.parse_args()
+    
+    try:
+        results = asyncio.run(run_cases(args.iterations, args.warmup, args.only))
+    finally:
+        shutil.rmtree(DATA_DIR, ignore_errors=True)
+    
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "iterations": args.iterations,
+                "results": results
+            }, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"\nLínea base guardada en {args.save}")
+    
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ Regresiones por encima del {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"   - {regression}")
+            sys.exit(1)
+        print(f"\n✅ Sin regresiones por encima del {args.threshold:.0%} respecto de {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+"""
+Prueba de carga de punta a punta contra el servidor MCP en ejecución.
+
+Abre N clientes MCP concurrentes sobre el transporte real (SSE) y reproduce
+conversaciones guionadas como las de WhatsApp: información -> validación de
+menú -> disponibilidad -> reserva -> (a veces) derivación a un humano. Las
+conversaciones llegan como un proceso de Poisson a la tasa indicada.
+Informa throughput, latencia por tool, tasa de errores y retraso del event
+loop (del generador y, vía get_server_metrics, del servidor).
+
+Con --spawn levanta el servidor localmente con backends falsos: sin planilla
+(snapshot de ejemplo de Google Sheets), sin SMTP y con calendario y SQLite
+en un directorio temporal.
+
+Uso:
+    python -m benchmarks.load_test --spawn [--clients 200] [--rate 20] [--duration 60]
+    python -m benchmarks.load_test --url http://127.0.0.1:8080/sse --clients 50
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from src.services.metrics import EventLoopLagMonitor, Histogram
+
+
+MENUS = ("ejecutivo", "manso", "carta")
+HORAS_ALMUERZO = ("12:30", "13:00", "13:30", "14:00")
+HORAS_CENA = ("20:30", "21:00", "21:30", "22:00")
+CATEGORIAS = ("general", "ubicacion", "horarios")
+
+# Días de reserva a partir de mañana, para no chocar con reglas de fecha pasada
+BOOKING_DAYS = 60
+# Días de la semana (lunes = 0) en que se ofrece cada menú: el agente
+# propone fechas válidas, así los fallos medidos son de capacidad
+MENU_WEEKDAYS = {"ejecutivo": range(5), "manso": range(4), "carta": range(7)}
+
+
+class LoadStats:
+    """Latencias y resultados por tool, acumulados durante la prueba"""
+    
+    def __init__(self):
+        self.latency: Dict[str, Histogram] = {}
+        self.errors: Dict[str, int] = {}
+        self.failures: Dict[str, int] = {}
+        self.queue_wait = Histogram()
+        self.conversations = 0
+        self.dropped = 0
+    
+    def record(self, tool: str, elapsed_us: int, error: bool, failure: bool) -> None:
+        histogram = self.latency.get(tool)
+        if histogram is None:
+            histogram = self.latency[tool] = Histogram()
+            self.errors[tool] = 0
+            self.failures[tool] = 0
+        histogram.record(elapsed_us)
+        self.errors[tool] += error
+        self.failures[tool] += failure
+    
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        """Resumen serializable (latencias en ms)"""
+        calls = sum(histogram.count for histogram in self.latency.values())
+        tools = {}
+        for tool, histogram in sorted(self.latency.items()):
+            tools[tool] = {
+                **histogram.summary(scale=0.001),
+                "errors": self.errors[tool],
+                "failures": self.failures[tool],
+                "error_rate": round(self.errors[tool] / histogram.count, 4) if histogram.count else 0
+            }
+        return {
+            "elapsed_seconds": round(elapsed, 1),
+            "conversations": self.conversations,
+            "conversations_dropped": self.dropped,
+            "calls": calls,
+            "calls_per_second": round(calls / elapsed, 1) if elapsed else 0,
+            "errors": sum(self.errors.values()),
+            "queue_wait_ms": self.queue_wait.summary(scale=0.001),
+            "tools": tools
+        }
+
+
+class Conversation:
+    """Guion de una conversación de WhatsApp que termina (casi siempre) en reserva"""
+    
+    def __init__(self, number: int, rng: random.Random, think_time: float, reserve_ratio: float, escalate_ratio: float):
+        self.number = number
+        self.rng = rng
+        self.think_time = think_time
+        self.reserve_ratio = reserve_ratio
+        self.escalate_ratio = escalate_ratio
+    
+    def steps(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Arma la secuencia de llamadas (tool, argumentos).
+        
+        Returns:
+            Lista de pasos en el orden en que los haría el agente
+        """
+        rng = self.rng
+        menu = rng.choice(MENUS)
+        while True:
+            day = date.today() + timedelta(days=rng.randint(1, BOOKING_DAYS))
+            if day.weekday() in MENU_WEEKDAYS[menu]:
+                break
+        fecha = day.isoformat()
+        hora = rng.choice(HORAS_ALMUERZO if menu == "ejecutivo" or rng.random() < 0.4 else HORAS_CENA)
+        personas = rng.choice((2, 2, 2, 3, 4, 4, 6))
+        telefono = f"+54 9 261 {self.number:07d}"
+        
+        steps: List[Tuple[str, Dict[str, Any]]] = [
+            ("get_restaurant_info", {"category": rng.choice(CATEGORIAS)}),
+            ("get_menu_prices", {"menu_type": menu})
+        ]
+        if rng.random() < 0.3:
+            steps.append(("get_business_hours", {}))
+        
+        if menu == "ejecutivo":
+            steps.append(("validate_executive_menu", {"date": fecha, "time": hora, "residente_argentino": True}))
+        elif menu == "manso":
+            steps.append(("validate_manso_menu", {"date": fecha, "time": hora}))
+        
+        steps.append(("check_availability", {"fecha": fecha, "hora": hora, "personas": personas}))
+        
+        if rng.random() < self.reserve_ratio:
+            steps.append(("create_reservation", {"reservation_data": {
+                "nombre": f"Cliente {self.number}",
+                "telefono": telefono,
+                "email": f"cliente{self.number}@example.com",
+                "personas": personas,
+                "fecha": fecha,
+                "hora": hora,
+                "tipo_menu": menu,
+                "residente_argentino": True
+            }}))
+        
+        if rng.random() < self.escalate_ratio:
+            steps.append(("escalate_to_human", {
+                "customer_query": "¿Puedo llevar torta de cumpleaños?",
+                "customer_info": {"name": f"Cliente {self.number}", "phone": telefono}
+            }))
+        return steps
+    
+    def pause(self) -> float:
+        """Tiempo que tarda el cliente en responder (exponencial)"""
+        return self.rng.expovariate(1 / self.think_time) if self.think_time > 0 else 0.0
+
+
+@contextlib.asynccontextmanager
+async def connect_sse(url: str) -> AsyncIterator[Any]:
+    """Abre una sesión MCP sobre SSE"""
+    from mcp import ClientSession
+    from mcp.client.sse import sse_client
+    
+    async with sse_client(url) as (read_stream, write_stream):
+        async with ClientSession(read_stream, write_stream) as session:
+            await session.initialize()
+            yield session
+
+
+async def call_tool(session: Any, tool: str, arguments: Dict[str, Any], stats: LoadStats) -> Any:
+    """Llama a un tool y registra latencia, error (excepción o isError) y fallo (success=false)"""
+    start = time.perf_counter_ns()
+    error = failure = False
+    result = None
+    try:
+        result = await session.call_tool(tool, arguments)
+        error = bool(getattr(result, "isError", False))
+        failure = _is_failure(result)
+    except Exception:
+        error = True
+    stats.record(tool, (time.perf_counter_ns() - start) // 1000, error, failure)
+    return result
+
+
+def _is_failure(result: Any) -> bool:
+    """True si el tool respondió {"success": false} (sin disponibilidad, validación, etc.)"""
+    for content in getattr(result, "content", None) or ():
+        try:
+            payload = json.loads(getattr(content, "text", "") or "null")
+        except ValueError:
+            continue
+        if isinstance(payload, dict) and payload.get("success") is False:
+            return True
+    return False
+
+
+async def client_worker(
+    connect: Callable[[], Any],
+    queue: "asyncio.Queue[Optional[Tuple[Conversation, float]]]",
+    stats: LoadStats
+) -> None:
+    """Un cliente MCP: atiende conversaciones de la cola hasta recibir None"""
+    async with connect() as session:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            conversation, arrived_at = item
+            stats.queue_wait.record(int((time.perf_counter() - arrived_at) * 1e6))
+            for tool, arguments in conversation.steps():
+                await call_tool(session, tool, arguments, stats)
+                await asyncio.sleep(conversation.pause())
+            stats.conversations += 1
+
+
+async def run_load(
+    connect: Callable[[], Any],
+    clients: int,
+    rate: float,
+    duration: float,
+    think_time: float = 0.5,
+    reserve_ratio: float = 0.7,
+    escalate_ratio: float = 0.1,
+    max_backlog: int = 10000,
+    seed: int = 1
+) -> Dict[str, Any]:
+    """
+    Ejecuta la prueba de carga.
+    
+    Args:
+        connect: Fábrica de context managers que abren una sesión MCP
+        clients: Clientes MCP concurrentes
+        rate: Conversaciones nuevas por segundo (llegadas de Poisson)
+        duration: Segundos durante los que llegan conversaciones
+        think_time: Pausa media entre mensajes de una conversación
+        reserve_ratio: Proporción de conversaciones que terminan en reserva
+        escalate_ratio: Proporción de conversaciones derivadas a un humano
+        max_backlog: Conversaciones en espera antes de descartar llegadas
+        seed: Semilla del generador (guiones reproducibles)
+    
+    Returns:
+        Reporte con throughput, latencias por tool, errores y retraso del loop
+    """
+    rng = random.Random(seed)
+    stats = LoadStats()
+    queue: "asyncio.Queue[Optional[Tuple[Conversation, float]]]" = asyncio.Queue()
+    monitor = EventLoopLagMonitor(interval=0.05)
+    await monitor.start()
+    
+    started = time.perf_counter()
+    workers = [asyncio.create_task(client_worker(connect, queue, stats)) for _ in range(clients)]
+    
+    # Llegadas de Poisson (lazo abierto): no esperan a que haya clientes libres
+    number = 0
+    deadline = started + duration
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(rng.expovariate(rate))
+        number += 1
+        if queue.qsize() >= max_backlog:
+            stats.dropped += 1
+            continue
+        conversation = Conversation(number, random.Random(rng.random()), think_time, reserve_ratio, escalate_ratio)
+        queue.put_nowait((conversation, time.perf_counter()))
+    
+    for _ in workers:
+        queue.put_nowait(None)
+    outcomes = await asyncio.gather(*workers, return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    await monitor.close()
+    
+    report = stats.report(elapsed)
+    report["client_errors"] = [repr(outcome) for outcome in outcomes if isinstance(outcome, BaseException)][:5]
+    report["generator_loop_lag_ms"] = monitor.get_stats()
+    report["server"] = await _server_metrics(connect)
+    return report
+
+
+async def _server_metrics(connect: Callable[[], Any]) -> Optional[Dict[str, Any]]:
+    """Lee get_server_metrics al final de la prueba (incluye el retraso del loop del servidor)"""
+    try:
+        async with connect() as session:
+            result = await session.call_tool("get_server_metrics", {})
+        return json.loads(result.content[0].text)
+    except Exception:
+        return None
+
+
+@contextlib.contextmanager
+def spawn_server(url: str):
+    """Levanta main.py con backends falsos en un directorio temporal"""
+    parsed = urlparse(url)
+    data_dir = tempfile.mkdtemp(prefix="lacabrera-load-")
+    env = {
+        **os.environ,
+        "SERVER_HOST": parsed.hostname or "127.0.0.1",
+        "SERVER_PORT": str(parsed.port or 8080),
+        "DATA_DIR": data_dir,
+        "DATABASE_URL": "",
+        "GOOGLE_SHEETS_ID": "",
+        "MEMORY_BACKEND": "memory",
+        "ADMIN_EMAIL": "",
+        "SMTP_HOST": "",
+        "METRICS_PORT": "0"
+    }
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen([sys.executable, os.path.join(root, "main.py")], env=env, cwd=root)
+    try:
+        _wait_for_port(parsed.hostname or "127.0.0.1", parsed.port or 8080, process)
+        yield
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def _wait_for_port(host: str, port: int, process: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"El servidor terminó al arrancar (código {process.returncode})")
+        with contextlib.suppress(OSError), socket.create_connection((host, port), timeout=0.5):
+            return
+        time.sleep(0.2)
+    raise RuntimeError(f"El servidor no aceptó conexiones en {host}:{port} tras {timeout:.0f}s")
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\nDuración:          {report['elapsed_seconds']}s")
+    print(f"Conversaciones:    {report['conversations']} (descartadas: {report['conversations_dropped']})")
+    print(f"Llamadas:          {report['calls']} ({report['calls_per_second']}/s), errores: {report['errors']}")
+    print(f"Espera en cola:    p50 {report['queue_wait_ms']['p50']}ms  p99 {report['queue_wait_ms']['p99']}ms")
+    print(f"\n{'tool':<26}{'llamadas':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errores':>9}{'fallos':>8}")
+    for tool, row in report["tools"].items():
+        print(
+            f"{tool:<26}{row['count']:>9}{row['p50']:>10}{row['p90']:>10}{row['p99']:>10}"
+            f"{row['max']:>10}{row['errors']:>9}{row['failures']:>8}"
+        )
+    
+    lag = report["generator_loop_lag_ms"]
+    print(f"\nRetraso del loop (generador): p50 {lag['p50']}ms  p99 {lag['p99']}ms  max {lag['max']}ms")
+    server_lag = ((report.get("server") or {}).get("gauges") or {}).get("event_loop_lag_ms")
+    if server_lag:
+        print(f"Retraso del loop (servidor):  p50 {server_lag['p50']}ms  p99 {server_lag['p99']}ms  max {server_lag['max']}ms")
+    for error in report["client_errors"]:
+        print(f"⚠️  Cliente con error: {error}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://127.0.0.1:8080/sse", help="Endpoint SSE del servidor MCP")
+    parser.add_argument("--spawn", action="store_true", help="Levantar el servidor localmente con backends falsos")
+    parser.add_argument("--clients", type=int, default=200, help="Clientes MCP concurrentes")
+    parser.add_argument("--rate", type=float, default=20, help="Conversaciones nuevas por segundo")
+    parser.add_argument("--duration", type=float, default=60, help="Segundos de llegadas")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Pausa media entre mensajes (segundos)")
+    parser.add_argument("--reserve-ratio", type=float, default=0.7)
+    parser.add_argument("--escalate-ratio", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", metavar="ARCHIVO", help="Guardar el reporte en JSON")
+    args = parser.parse_args()
+    
+    def run() -> Dict[str, Any]:
+        return asyncio.run(run_load(
+            lambda: connect_sse(args.url),
+            clients=args.clients,
+            rate=args.rate,
+            duration=args.duration,
+            think_time=args.think_time,
+            reserve_ratio=args.reserve_ratio,
+            escalate_ratio=args.escalate_ratio,
+            seed=args.seed
+        ))
+    
+    if args.spawn:
+        with spawn_server(args.url):
+            report = run()
+    else:
+        report = run()
+    
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,13 @@
 import asyncio
+import time
 from mcp import MCPServer
 from src.tools.info_tools import RestaurantInfoTools
 from src.tools.validation_tools import ValidationTools
 from src.tools.reservation_tools import ReservationTools
 from src.tools.admin_tools import AdminTools
+from src.services.container import ServiceContainer
+from src.services.metrics import EventLoopLagMonitor, MetricsServer, metrics
+from src.services.resilience import with_deadline
 from src.config.settings import settings
 
 
@@ -12,48 +16,121 @@ class LaCabreraMCPServer:
     
     def __init__(self):
         self.server = MCPServer(settings.server_name)
+        # Una instancia por proceso de cada servicio, compartida por todos los tools
+        self.services = ServiceContainer(settings)
+        self.metrics_server = MetricsServer(metrics, settings.server_host, settings.metrics_port)
+        self.loop_monitor = EventLoopLagMonitor()
+        # Herramientas registradas por nombre (instrumentadas)
+        self.tools = {}
+        self._warm_up_task = None
         self.setup_tools()
     
+    def add_tool(self, tool):
+        """Registra una herramienta en el servidor MCP, con deadline e instrumentada con métricas"""
+        instrumented = metrics.instrument_tool(with_deadline(tool, settings.tool_deadline_seconds))
+        self.tools[tool.__name__] = instrumented
+        self.server.add_tool(instrumented)
+    
     def setup_tools(self):
         """Registra todas las herramientas del servidor MCP"""
         
-        # Instanciar herramientas
-        info_tools = RestaurantInfoTools()
+        services = self.services
+        
+        # Instanciar herramientas con los servicios compartidos del contenedor
+        info_tools = RestaurantInfoTools(sheets_service=services.sheets)
         validation_tools = ValidationTools()
-        reservation_tools = ReservationTools()
-        admin_tools = AdminTools()
+        reservation_tools = ReservationTools(
+            validation_tools=validation_tools,
+            sheets_service=services.sheets,
+            reservation_store=services.reservation_store,
+            calendar_service=services.calendar,
+            idempotency_cache=services.idempotency_cache
+        )
+        admin_tools = AdminTools(
+            notification_service=services.notifications,
+            sheets_service=services.sheets
+        )
         
         # Registrar herramientas de información
-        self.server.add_tool(info_tools.get_restaurant_info)
-        self.server.add_tool(info_tools.get_menu_prices)
-        self.server.add_tool(info_tools.get_business_hours)
-        self.server.add_tool(info_tools.get_menu_details)
+        self.add_tool(info_tools.get_restaurant_info)
+        self.add_tool(info_tools.get_menu_prices)
+        self.add_tool(info_tools.get_business_hours)
+        self.add_tool(info_tools.get_menu_details)
+        self.add_tool(info_tools.search_menu)
         
         # Registrar herramientas de validación
-        self.server.add_tool(validation_tools.validate_executive_menu)
-        self.server.add_tool(validation_tools.validate_manso_menu)
+        self.add_tool(validation_tools.validate_executive_menu)
+        self.add_tool(validation_tools.validate_manso_menu)
+        self.add_tool(validation_tools.validate_menus_batch)
         
         # Registrar herramientas de reserva
-        self.server.add_tool(reservation_tools.create_reservation)
-        self.server.add_tool(reservation_tools.check_availability)
+        self.add_tool(reservation_tools.create_reservation)
+        self.add_tool(reservation_tools.check_availability)
+        self.add_tool(reservation_tools.get_availability_matrix)
         
         # Registrar herramientas administrativas
-        self.server.add_tool(admin_tools.escalate_to_human)
-        self.server.add_tool(admin_tools.mark_as_human_required)
-        self.server.add_tool(admin_tools.send_admin_notification)
+        self.add_tool(admin_tools.escalate_to_human)
+        self.add_tool(admin_tools.mark_as_human_required)
+        self.add_tool(admin_tools.send_admin_notification)
+        self.add_tool(admin_tools.get_server_metrics)
+        self.add_tool(admin_tools.refresh_restaurant_data)
+        
+        # Contadores de los servicios, exportados como gauges
+        metrics.register_gauges("memory", services.memory.get_stats)
+        metrics.register_gauges("notifications", services.notifications.get_stats)
+        metrics.register_gauges("sheets_cache", services.sheets.get_cache_stats)
+        metrics.register_gauges("sheets_writes", services.sheets.get_write_stats)
+        metrics.register_gauges("sheets_client", services.sheets.get_client_stats)
+        metrics.register_gauges("idempotency", services.idempotency_cache.get_stats)
+        metrics.register_gauges("event_loop_lag_ms", self.loop_monitor.get_stats)
         
         print(f"✅ Servidor MCP '{settings.server_name}' configurado con todas las herramientas")
     
+    async def warm_up(self):
+        """
+        Precarga lo que es lento de construir mientras el servidor ya acepta conexiones.
+        
+        Cliente de Google y primer snapshot, reservas futuras del calendario y
+        numpy (consultas en bloque). Un fallo no es fatal: la primera llamada que
+        lo necesite lo vuelve a intentar.
+        """
+        started = time.perf_counter()
+        errors = await self.services.warm_up()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if errors:
+            detail = "; ".join(f"{name}: {error}" for name, error in errors.items())
+            print(f"⚠️ Precarga incompleta en {elapsed_ms:.0f} ms: {detail}")
+        else:
+            print(f"🔥 Precarga completa en {elapsed_ms:.0f} ms")
+    
     async def run(self):
         """Inicia el servidor MCP"""
         print(f"🚀 Iniciando servidor MCP en {settings.server_host}:{settings.server_port}")
         print(f"📋 Herramientas disponibles:")
-        print("   - Información del restaurante (info, precios, horarios, menú)")
+        print("   - Información del restaurante (info, precios, horarios, menú, búsqueda en el menú)")
         print("   - Validación de menús (ejecutivo, manso)")
         print("   - Gestión de reservas (crear, verificar disponibilidad)")
-        print("   - Administración (derivar a humano, notificaciones)")
+        print("   - Administración (derivar a humano, notificaciones, métricas, recarga de datos)")
+        if settings.metrics_port:
+            print(f"📈 Métricas Prometheus en {settings.server_host}:{settings.metrics_port}/metrics")
+        
+        # Reenviar reservas pendientes, recuperar la memoria y arrancar las notificaciones
+        await self.services.start()
+        await self.metrics_server.start()
+        await self.loop_monitor.start()
+        
+        # Los clientes se construyen en segundo plano: el servidor atiende desde ya
+        self._warm_up_task = asyncio.create_task(self.warm_up())
         
-        await self.server.run()
+        try:
+            await self.server.run()
+        finally:
+            if not self._warm_up_task.done():
+                self._warm_up_task.cancel()
+            # Vaciar las colas (reservas a Google Sheets, notificaciones) y cerrar conexiones
+            await self.services.close()
+            await self.loop_monitor.close()
+            await self.metrics_server.close()
 
 
 def main():
@@ -10,17 +10,58 @@ class Settings(BaseModel):
     server_name: str = "la-cabrera-mcp"
     server_host: str = "0.0.0.0"
     server_port: int = 8080
+    # Puerto del endpoint de métricas Prometheus (/metrics); 0 lo deshabilita
+    metrics_port: int = 9100
+    # Tiempo máximo de cada invocación de un tool (incluye sus llamadas a servicios)
+    tool_deadline_seconds: float = 10
     
     # Configuración de Google Sheets
     google_sheets_credentials: Optional[str] = None
     google_sheets_id: Optional[str] = None
+    # Llamadas simultáneas a la API de Sheets (hilos del executor dedicado)
+    sheets_max_concurrency: int = 4
+    # Timeout de cada request HTTP a la API de Sheets
+    sheets_timeout_seconds: float = 30
+    # Celda con la versión de los datos (ej. "Config!B1"). Sin ella cada
+    # revalidación relee la planilla completa (cada 300 s en lugar de 60 s)
+    sheets_version_range: Optional[str] = None
     
     # Configuración de base de datos (opcional)
+    # Si no se define, las reservas se guardan en SQLite dentro de data_dir
     database_url: Optional[str] = None
     
+    # Directorio de datos persistentes (volumen mcp-data en Docker)
+    data_dir: str = "/app/data"
+    
+    # Capacidad del salón (cubiertos simultáneos)
+    restaurant_capacity: int = 80
+    
+    # Límites de memoria de conversaciones (MemoryService)
+    memory_max_conversations: int = 10000
+    memory_max_messages: int = 200
+    memory_idle_ttl_seconds: int = 24 * 60 * 60
+    memory_budget_bytes: Optional[int] = None
+    # Persistir conversaciones en data_dir/memoria (log + snapshot)
+    memory_persistence: bool = True
+    # Backend de memoria: "memory" (en el proceso) o "redis" (compartido entre réplicas)
+    memory_backend: str = "memory"
+    redis_url: Optional[str] = None
+    
     # Email de administración para escalamientos (opcional)
     admin_email: Optional[str] = None
     
+    # Servidor SMTP para notificaciones a administración (opcional)
+    smtp_host: Optional[str] = None
+    smtp_port: int = 587
+    smtp_user: Optional[str] = None
+    smtp_password: Optional[str] = None
+    smtp_from: Optional[str] = None
+    smtp_starttls: bool = True
+    # Ventana para agrupar notificaciones repetidas de una misma conversación/cliente
+    notification_coalesce_seconds: int = 300
+    # Resumen periódico de notificaciones normal/low (0 = deshabilitado)
+    notification_digest_minutes: int = 0
+    
     # Configuración de logging
     log_level: str = "INFO"
     
@@ -37,6 +78,18 @@ class Settings(BaseModel):
                 "almuerzo": {"inicio": "12:30", "fin": "16:30"},
                 "cena": {"inicio": "20:00", "fin": "23:30"}
             }
+        },
+        "carta": {
+            "dias": ["lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"],
+            "horarios": {
+                "almuerzo": {"inicio": "12:30", "fin": "16:30"},
+                "cena": {"inicio": "20:00", "fin": "23:30"}
+            },
+            # Viernes y sábado se cierra a medianoche
+            "horarios_por_dia": {
+                "viernes": {"cena": {"inicio": "20:00", "fin": "00:00"}},
+                "sábado": {"cena": {"inicio": "20:00", "fin": "00:00"}}
+            }
         }
     }
     
@@ -54,10 +107,34 @@ def load_settings() -> Settings:
     """
     return Settings(
         # Cargar desde variables de entorno
+        server_host=os.getenv("SERVER_HOST", "0.0.0.0"),
+        server_port=int(os.getenv("SERVER_PORT", "8080")),
+        metrics_port=int(os.getenv("METRICS_PORT", "9100")),
+        tool_deadline_seconds=float(os.getenv("TOOL_DEADLINE_SECONDS", "10")),
         google_sheets_credentials=os.getenv("GOOGLE_SHEETS_CREDENTIALS"),
         google_sheets_id=os.getenv("GOOGLE_SHEETS_ID"),
+        sheets_max_concurrency=int(os.getenv("SHEETS_MAX_CONCURRENCY", "4")),
+        sheets_timeout_seconds=float(os.getenv("SHEETS_TIMEOUT_SECONDS", "30")),
+        sheets_version_range=os.getenv("SHEETS_VERSION_RANGE") or None,
         database_url=os.getenv("DATABASE_URL"),
+        data_dir=os.getenv("DATA_DIR", "/app/data"),
+        restaurant_capacity=int(os.getenv("RESTAURANT_CAPACITY", "80")),
+        memory_max_conversations=int(os.getenv("MEMORY_MAX_CONVERSATIONS", "10000")),
+        memory_max_messages=int(os.getenv("MEMORY_MAX_MESSAGES", "200")),
+        memory_idle_ttl_seconds=int(os.getenv("MEMORY_IDLE_TTL_SECONDS", str(24 * 60 * 60))),
+        memory_budget_bytes=int(os.getenv("MEMORY_BUDGET_BYTES")) if os.getenv("MEMORY_BUDGET_BYTES") else None,
+        memory_persistence=os.getenv("MEMORY_PERSISTENCE", "true").lower() in ("1", "true", "yes"),
+        memory_backend=os.getenv("MEMORY_BACKEND", "memory").lower(),
+        redis_url=os.getenv("REDIS_URL"),
         admin_email=os.getenv("ADMIN_EMAIL"),
+        smtp_host=os.getenv("SMTP_HOST"),
+        smtp_port=int(os.getenv("SMTP_PORT", "587")),
+        smtp_user=os.getenv("SMTP_USER"),
+        smtp_password=os.getenv("SMTP_PASSWORD"),
+        smtp_from=os.getenv("SMTP_FROM"),
+        smtp_starttls=os.getenv("SMTP_STARTTLS", "true").lower() in ("1", "true", "yes"),
+        notification_coalesce_seconds=int(os.getenv("NOTIFICATION_COALESCE_SECONDS", "300")),
+        notification_digest_minutes=int(os.getenv("NOTIFICATION_DIGEST_MINUTES", "0")),
         log_level=os.getenv("LOG_LEVEL", "INFO")
     )
 
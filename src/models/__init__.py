@@ -1,22 +1,27 @@
-from .reservation import ReservationData, ReservationResponse, ReservationRecord
-from .menu import (
-    MenuEjecutivoRestrictions,
-    MenuMansoRestrictions,
-    MenuInfo,
-    ValidationResult
-)
-from .customer import CustomerInfo, CustomerQuery, AdminEscalation
+from importlib import import_module
 
-__all__ = [
-    "ReservationData",
-    "ReservationResponse",
-    "ReservationRecord",
-    "MenuEjecutivoRestrictions",
-    "MenuMansoRestrictions",
-    "MenuInfo",
-    "ValidationResult",
-    "CustomerInfo",
-    "CustomerQuery",
-    "AdminEscalation",
-]
+# Exportaciones diferidas (PEP 562): cada módulo se importa en el primer acceso,
+# así importar un submódulo no arrastra al resto (por ejemplo, la validación de emails)
+_EXPORTS = {
+    "ReservationData": ".reservation",
+    "ReservationResponse": ".reservation",
+    "ReservationRecord": ".reservation",
+    "MenuEjecutivoRestrictions": ".menu",
+    "MenuMansoRestrictions": ".menu",
+    "MenuInfo": ".menu",
+    "ValidationResult": ".menu",
+    "CustomerInfo": ".customer",
+    "CustomerQuery": ".customer",
+    "AdminEscalation": ".customer",
+}
 
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
@@ -38,4 +38,5 @@ class ReservationRecord(BaseModel):
     residente_argentino: Optional[bool] = None
     created_at: datetime
     status: str = "confirmada"
+    idempotency_key: Optional[str] = None
 
@@ -1,10 +1,24 @@
-from .google_sheets import GoogleSheetsService
-from .calendar_service import CalendarService
-from .memory_service import MemoryService
+from importlib import import_module
 
-__all__ = [
-    "GoogleSheetsService",
-    "CalendarService",
-    "MemoryService",
-]
+# Exportaciones diferidas (PEP 562): cada módulo se importa en el primer acceso,
+# así importar un submódulo no arrastra al resto (numpy, redis, clientes de Google)
+_EXPORTS = {
+    "GoogleSheetsService": ".google_sheets",
+    "CalendarService": ".calendar_service",
+    "MemoryService": ".memory_service",
+    "MemoryBackend": ".memory_backends",
+    "InProcessMemoryBackend": ".memory_backends",
+    "ReservationStore": ".reservation_store",
+    "ServiceContainer": ".container",
+}
 
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,187 @@
+import asyncio
+import contextvars
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+
+Loader = Callable[[], Awaitable[Any]]
+
+
+class _CacheEntry:
+    """Valor cacheado junto con el instante (monotónico) en que se obtuvo"""
+
+    __slots__ = ("value", "fetched_at")
+
+    def __init__(self, value: Any, fetched_at: float):
+        self.value = value
+        self.fetched_at = fetched_at
+
+
+class AsyncTTLCache:
+    """
+    Caché asíncrona con TTL por clave, stale-while-revalidate y single-flight.
+
+    - Dentro del TTL el valor se sirve directamente (hit).
+    - Vencido el TTL pero dentro de la ventana stale, se sirve el valor viejo
+      y se lanza UNA sola recarga en segundo plano.
+    - Sin valor utilizable, todas las llamadas concurrentes comparten la
+      misma carga en curso (single-flight).
+    """
+
+    def __init__(self, stale_ttl: float = 600.0, clock: Callable[[], float] = time.monotonic):
+        self.stale_ttl = stale_ttl
+        self._clock = clock
+        self._entries: Dict[str, _CacheEntry] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refreshing: Set[str] = set()
+        self._background: Set[asyncio.Task] = set()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    async def get(
+        self,
+        key: str,
+        loader: Loader,
+        ttl: float,
+        stale_ttl: Optional[float] = None
+    ) -> Any:
+        """
+        Obtiene un valor de la caché o lo carga con `loader`.
+
+        Args:
+            key: Clave del valor
+            loader: Corrutina sin argumentos que obtiene el valor fresco
+            ttl: Segundos durante los que el valor se considera fresco
+            stale_ttl: Segundos extra durante los que se sirve el valor viejo
+                mientras se recarga (por defecto, el de la caché)
+
+        Returns:
+            Valor cacheado o recién cargado
+        """
+        stats = self._key_stats(key)
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            age = self._clock() - entry.fetched_at
+            if age < ttl:
+                stats["hits"] += 1
+                return entry.value
+
+            window = self.stale_ttl if stale_ttl is None else stale_ttl
+            if age < ttl + window:
+                stats["stale_hits"] += 1
+                self._schedule_refresh(key, loader)
+                return entry.value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            stats["coalesced"] += 1
+            return await asyncio.shield(inflight)
+
+        stats["misses"] += 1
+        return await self._load(key, loader)
+
+    def prime(self, key: str, value: Any, age: float = 0.0) -> None:
+        """
+        Guarda un valor ya obtenido por otra vía (por ejemplo, leído de disco).
+
+        Args:
+            key: Clave del valor
+            value: Valor a guardar
+            age: Antigüedad con la que se registra; con una mayor al TTL el
+                valor se sirve de inmediato y la primera lectura lo recarga
+        """
+        self._entries[key] = _CacheEntry(value, self._clock() - age)
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """
+        Descarta valores cacheados.
+
+        Args:
+            key: Clave a descartar; si es None se vacía toda la caché
+        """
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene contadores de uso por clave y totales.
+
+        Returns:
+            Diccionario con hits, stale_hits, misses, coalesced, refreshes y
+            refresh_errors por clave y acumulados
+        """
+        totals: Dict[str, int] = dict.fromkeys(self._empty_stats(), 0)
+        for key_stats in self._stats.values():
+            for name, value in key_stats.items():
+                totals[name] += value
+
+        return {
+            "keys": {key: dict(values) for key, values in self._stats.items()},
+            "totals": totals
+        }
+
+    async def _load(self, key: str, loader: Loader) -> Any:
+        """Ejecuta la carga compartida para una clave y guarda el resultado"""
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Evitar el warning de excepción nunca recuperada si nadie más esperaba
+            future.exception()
+            raise
+        else:
+            self._entries[key] = _CacheEntry(value, self._clock())
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def _schedule_refresh(self, key: str, loader: Loader) -> None:
+        """Lanza una única recarga en segundo plano para una clave vencida"""
+        if key in self._refreshing or key in self._inflight:
+            return
+
+        self._refreshing.add(key)
+        # Contexto vacío: la recarga no hereda el deadline del request que la disparó
+        task = asyncio.get_running_loop().create_task(
+            self._refresh(key, loader),
+            context=contextvars.Context()
+        )
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _refresh(self, key: str, loader: Loader) -> None:
+        """Recarga en segundo plano; ante error se conserva el valor viejo"""
+        stats = self._key_stats(key)
+        try:
+            await self._load(key, loader)
+            stats["refreshes"] += 1
+        except Exception:
+            stats["refresh_errors"] += 1
+        finally:
+            self._refreshing.discard(key)
+
+    def _key_stats(self, key: str) -> Dict[str, int]:
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = self._empty_stats()
+        return stats
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, int]:
+        return {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "refreshes": 0,
+            "refresh_errors": 0
+        }
@@ -1,37 +1,173 @@
-from typing import Dict, List, Optional
-from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+from datetime import date
+import threading
+
+from ..config.settings import settings
+from .menu_rules import MINUTES_PER_DAY, MenuRuleTable, compile_menu_rules, parse_date
+from .metrics import timed
+from .resilience import guarded
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def _to_minutes(hora: str) -> int:
+    """Convierte HH:MM a minutos desde medianoche"""
+    hours, _, minutes = hora.partition(":")
+    value = int(hours) * 60 + int(minutes)
+    if not 0 <= value < 24 * 60:
+        raise ValueError(f"Hora inválida: {hora}")
+    return value
+
+
+def _to_hora(minutes: int) -> str:
+    """Convierte minutos desde medianoche a HH:MM"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class _SlotTree:
+    """
+    Árbol de segmentos sobre los slots de un día.
+    
+    Permite sumar cubiertos a un rango de slots y consultar el máximo de
+    ocupación de un rango, ambos en O(log n). La suma pendiente de cada nodo
+    se guarda en `pending` sin propagarla a los hijos.
+    """
+    
+    __slots__ = ("size", "peak", "pending")
+    
+    def __init__(self, size: int):
+        self.size = size
+        self.peak = [0] * (4 * size)
+        self.pending = [0] * (4 * size)
+    
+    def add(self, lo: int, hi: int, value: int) -> None:
+        """Suma `value` a los slots [lo, hi)"""
+        self._add(1, 0, self.size, lo, hi, value)
+    
+    def max(self, lo: int, hi: int) -> int:
+        """Máxima ocupación en los slots [lo, hi)"""
+        return self._max(1, 0, self.size, lo, hi)
+    
+    def occupancy(self) -> List[int]:
+        """Ocupación de cada slot del día"""
+        result = [0] * self.size
+        self._collect(1, 0, self.size, 0, result)
+        return result
+    
+    def _add(self, node: int, nlo: int, nhi: int, lo: int, hi: int, value: int) -> None:
+        if hi <= nlo or nhi <= lo:
+            return
+        if lo <= nlo and nhi <= hi:
+            self.peak[node] += value
+            self.pending[node] += value
+            return
+        
+        mid = (nlo + nhi) // 2
+        self._add(2 * node, nlo, mid, lo, hi, value)
+        self._add(2 * node + 1, mid, nhi, lo, hi, value)
+        self.peak[node] = self.pending[node] + max(self.peak[2 * node], self.peak[2 * node + 1])
+    
+    def _max(self, node: int, nlo: int, nhi: int, lo: int, hi: int) -> int:
+        if hi <= nlo or nhi <= lo:
+            return 0
+        if lo <= nlo and nhi <= hi:
+            return self.peak[node]
+        
+        mid = (nlo + nhi) // 2
+        return self.pending[node] + max(
+            self._max(2 * node, nlo, mid, lo, hi),
+            self._max(2 * node + 1, mid, nhi, lo, hi)
+        )
+    
+    def _collect(self, node: int, nlo: int, nhi: int, carry: int, result: List[int]) -> None:
+        carry += self.pending[node]
+        if nhi - nlo == 1:
+            result[nlo] = carry
+            return
+        
+        mid = (nlo + nhi) // 2
+        self._collect(2 * node, nlo, mid, carry, result)
+        self._collect(2 * node + 1, mid, nhi, carry, result)
 
 
 class CalendarService:
     """Servicio para gestión de disponibilidad y calendario"""
     
-    def __init__(self):
-        # TODO: Inicializar cliente de calendario (Google Calendar API, etc.)
-        pass
+    # Duración estimada de una reserva
+    DEFAULT_DURATION_MINUTES = 120
+    
+    # Paso entre horarios de llegada ofrecidos dentro de cada franja
+    SLOT_STEP_MINUTES = 30
     
-    async def check_availability(self, fecha: str, hora: str) -> Dict[str, any]:
+    def __init__(
+        self,
+        capacity: int = 80,
+        slot_minutes: int = 15,
+        reservation_store=None,
+        service_hours: Optional[MenuRuleTable] = None
+    ):
+        """
+        Args:
+            capacity: Cubiertos simultáneos que admite el salón
+            slot_minutes: Resolución del índice de ocupación
+            reservation_store: ReservationStore desde el que se cargan las reservas existentes
+            service_hours: Horario de atención compilado en el que se ofrecen
+                horarios (por defecto, la carta de `settings.business_hours`)
+        """
+        # TODO: Sincronizar con calendario externo (Google Calendar API, etc.)
+        self.capacity = capacity
+        self.slot_minutes = slot_minutes
+        self.slots_per_day = (24 * 60) // slot_minutes
+        self.reservation_store = reservation_store
+        self.service_hours = service_hours or compile_menu_rules(settings.business_hours)["carta"]
+        
+        self._days: Dict[str, _SlotTree] = {}
+        self._bookings: Dict[str, Tuple[str, int, int, int]] = {}
+        self._lock = threading.Lock()
+        self._loaded = reservation_store is None
+    
+    @timed("calendar")
+    @guarded("calendar")
+    async def check_availability(
+        self,
+        fecha: str,
+        hora: str,
+        personas: int = 1,
+        duration_minutes: int = DEFAULT_DURATION_MINUTES
+    ) -> Dict[str, any]:
         """
         Verifica disponibilidad para una fecha y hora específica.
         
         Args:
             fecha: Fecha en formato YYYY-MM-DD
             hora: Hora en formato HH:MM
-            
+            personas: Cantidad de personas a ubicar
+            duration_minutes: Duración estimada de la reserva en minutos
+        
         Returns:
             Diccionario con disponibilidad y detalles
         """
-        # TODO: Implementar verificación real contra calendario
+        await self._ensure_loaded()
+        start, end = self._slot_range(hora, duration_minutes)
+        
+        with self._lock:
+            spaces_remaining = self._remaining(fecha, start, end)
+        
         return {
-            "available": True,
+            "available": spaces_remaining >= personas,
             "fecha": fecha,
             "hora": hora,
-            "spaces_remaining": 10
+            "spaces_remaining": spaces_remaining
         }
     
+    @timed("calendar")
+    @guarded("calendar")
     async def get_available_slots(
         self,
         fecha: str,
-        duration_minutes: int = 120
+        duration_minutes: int = DEFAULT_DURATION_MINUTES,
+        personas: int = 1
     ) -> List[Dict[str, str]]:
         """
         Obtiene slots disponibles para una fecha específica.
@@ -39,24 +175,104 @@ class CalendarService:
         Args:
             fecha: Fecha en formato YYYY-MM-DD
             duration_minutes: Duración estimada de la reserva en minutos
-            
+            personas: Cantidad de personas a ubicar
+        
         Returns:
             Lista de horarios disponibles
         """
-        # TODO: Implementar búsqueda de slots disponibles
-        return [
-            {"hora": "12:30", "available": True},
-            {"hora": "13:00", "available": True},
-            {"hora": "20:00", "available": True},
-            {"hora": "21:00", "available": True}
-        ]
+        await self._ensure_loaded()
+        slots = []
+        # Las franjas dependen del día (viernes y sábado se cierra a las 00:00)
+        windows = self.service_hours.windows_for(parse_date(fecha))
+        
+        with self._lock:
+            for window_start, window_end in windows:
+                minute = window_start
+                last = min(window_end, MINUTES_PER_DAY - 1)
+                while minute <= last:
+                    start, end = self._slot_range(_to_hora(minute), duration_minutes)
+                    remaining = self._remaining(fecha, start, end)
+                    if remaining >= personas:
+                        slots.append({
+                            "hora": _to_hora(minute),
+                            "available": True,
+                            "spaces_remaining": remaining
+                        })
+                    minute += self.SLOT_STEP_MINUTES
+        
+        return slots
+    
+    @timed("calendar")
+    @guarded("calendar")
+    async def reserve_seats(
+        self,
+        fecha: str,
+        hora: str,
+        personas: int,
+        reservation_id: str,
+        duration_minutes: int = DEFAULT_DURATION_MINUTES
+    ) -> bool:
+        """
+        Verifica y descuenta capacidad de forma atómica.
+        
+        Dos reservas concurrentes nunca pueden quedarse ambas con el último
+        lugar: la verificación y el descuento ocurren bajo el mismo lock.
+        
+        Args:
+            fecha: Fecha en formato YYYY-MM-DD
+            hora: Hora en formato HH:MM
+            personas: Cantidad de personas
+            reservation_id: ID de la reserva
+            duration_minutes: Duración en minutos
+        
+        Returns:
+            True si había lugar y se descontó
+        
+        Raises:
+            ValueError: Si personas es menor a 1
+        """
+        if personas < 1:
+            raise ValueError(f"Cantidad de personas inválida: {personas}")
+        
+        await self._ensure_loaded()
+        start, end = self._slot_range(hora, duration_minutes)
+        
+        with self._lock:
+            if reservation_id in self._bookings:
+                return True
+            if self._remaining(fecha, start, end) < personas:
+                return False
+            self._book(fecha, start, end, personas, reservation_id)
+            return True
+    
+    # Sin circuit breaker: es la compensación de una reserva fallida y
+    # siempre tiene que poder liberar los cubiertos
+    @timed("calendar")
+    async def release_seats(self, reservation_id: str) -> bool:
+        """
+        Libera la capacidad tomada por una reserva (cancelación o error al guardar).
+        
+        Args:
+            reservation_id: ID de la reserva
+        
+        Returns:
+            True si la reserva estaba registrada
+        """
+        with self._lock:
+            booking = self._bookings.pop(reservation_id, None)
+            if booking is None:
+                return False
+            fecha, start, end, personas = booking
+            self._days[fecha].add(start, end, -personas)
+            return True
     
     async def block_time_slot(
         self,
         fecha: str,
         hora: str,
         duration_minutes: int,
-        reservation_id: str
+        reservation_id: str,
+        personas: Optional[int] = None
     ) -> bool:
         """
         Bloquea un slot de tiempo para una reserva.
@@ -66,12 +282,84 @@ class CalendarService:
             hora: Hora de la reserva
             duration_minutes: Duración en minutos
             reservation_id: ID de la reserva
-            
+            personas: Cubiertos a bloquear; None bloquea el salón completo
+        
         Returns:
             True si se bloqueó exitosamente
         """
-        # TODO: Implementar bloqueo en calendario
-        return True
+        return await self.reserve_seats(
+            fecha,
+            hora,
+            self.capacity if personas is None else personas,
+            reservation_id,
+            duration_minutes
+        )
+    
+    def get_occupancy(self, fecha: str) -> List[int]:
+        """
+        Obtiene la ocupación (cubiertos) de cada slot de un día.
+        
+        Args:
+            fecha: Fecha en formato YYYY-MM-DD
+        
+        Returns:
+            Lista de `slots_per_day` enteros
+        """
+        with self._lock:
+            tree = self._days.get(fecha)
+            return tree.occupancy() if tree is not None else [0] * self.slots_per_day
+    
+    @timed("calendar")
+    @guarded("calendar")
+    async def get_remaining_matrix(
+        self,
+        fechas: Sequence[str],
+        duration_minutes: int = DEFAULT_DURATION_MINUTES
+    ) -> "np.ndarray":
+        """
+        Calcula en bloque los lugares libres para cada fecha y slot de llegada.
+        
+        Equivale a llamar a check_availability para cada combinación, pero
+        resuelto con una única operación de ventana deslizante sobre la
+        ocupación de todos los días.
+        
+        Args:
+            fechas: Fechas en formato YYYY-MM-DD
+            duration_minutes: Duración estimada de la reserva en minutos
+        
+        Returns:
+            Matriz (fechas x slots_per_day) con los cubiertos libres si la
+            reserva llega en ese slot
+        """
+        # numpy solo hace falta en las consultas en bloque: no se carga al arrancar
+        import numpy as np
+        from numpy.lib.stride_tricks import sliding_window_view
+        
+        await self._ensure_loaded()
+        occupancy = np.array(
+            [self.get_occupancy(fecha) for fecha in fechas],
+            dtype=np.int32
+        ).reshape(len(fechas), self.slots_per_day)
+        
+        # Slots que ocupa la reserva; después del fin del día no hay ocupación (se recorta)
+        width = max(-(-duration_minutes // self.slot_minutes), 1)
+        padded = np.pad(occupancy, ((0, 0), (0, width - 1)))
+        peak = sliding_window_view(padded, width, axis=1).max(axis=2)
+        return np.maximum(self.capacity - peak, 0)
+    
+    def load_reservations(self, reservations: List[Dict[str, any]]) -> None:
+        """
+        Carga reservas existentes en el índice (por ejemplo, desde SQLite al arrancar).
+        
+        Args:
+            reservations: Registros con id, fecha, hora y personas
+        """
+        with self._lock:
+            for record in reservations:
+                if record["id"] in self._bookings:
+                    continue
+                start, end = self._slot_range(record["hora"], self.DEFAULT_DURATION_MINUTES)
+                self._book(record["fecha"], start, end, int(record["personas"]), record["id"])
     
     async def get_blocked_dates(self) -> List[str]:
         """
@@ -89,10 +377,44 @@ class CalendarService:
         
         Args:
             fecha: Fecha en formato YYYY-MM-DD
-            
+        
         Returns:
             True si la fecha está bloqueada
         """
         blocked_dates = await self.get_blocked_dates()
         return fecha in blocked_dates
-
+    
+    async def warm_up(self) -> None:
+        """Carga las reservas futuras por adelantado (en segundo plano al arrancar)"""
+        await self._ensure_loaded()
+    
+    async def _ensure_loaded(self) -> None:
+        """Carga una única vez las reservas futuras desde el ReservationStore"""
+        if self._loaded:
+            return
+        
+        today = date.today().isoformat()
+        self.load_reservations(await self.reservation_store.list_from_date(today))
+        self._loaded = True
+    
+    def _slot_range(self, hora: str, duration_minutes: int) -> Tuple[int, int]:
+        """Slots [inicio, fin) que ocupa una reserva; se recorta al final del día"""
+        start_minute = _to_minutes(hora)
+        end_minute = min(start_minute + max(duration_minutes, 1), 24 * 60)
+        start = start_minute // self.slot_minutes
+        end = -(-end_minute // self.slot_minutes)
+        return start, end
+    
+    def _remaining(self, fecha: str, start: int, end: int) -> int:
+        """Lugares libres en el peor slot del rango (requiere tener tomado el lock)"""
+        tree = self._days.get(fecha)
+        used = tree.max(start, end) if tree is not None else 0
+        return max(self.capacity - used, 0)
+    
+    def _book(self, fecha: str, start: int, end: int, personas: int, reservation_id: str) -> None:
+        """Registra la ocupación de una reserva (requiere tener tomado el lock)"""
+        tree = self._days.get(fecha)
+        if tree is None:
+            tree = self._days[fecha] = _SlotTree(self.slots_per_day)
+        tree.add(start, end, personas)
+        self._bookings[reservation_id] = (fecha, start, end, personas)
@@ -0,0 +1,121 @@
+from functools import cached_property
+from typing import Any, Dict
+import asyncio
+import importlib
+from ..config.settings import Settings, settings as default_settings
+from .calendar_service import CalendarService
+from .google_sheets import GoogleSheetsService
+from .idempotency import IdempotencyCache
+from .memory_service import MemoryService, create_memory_backend
+from .menu_rules import compile_menu_rules
+from .notification_service import NotificationService
+from .reservation_store import ReservationStore
+
+
+class ServiceContainer:
+    """
+    Instancias únicas por proceso de los servicios compartidos por los tools.
+    
+    Cada servicio se construye en el primer acceso y se reutiliza: un cliente de
+    Google Sheets (y una caché del snapshot), un índice de capacidad, una base
+    SQLite, una memoria de conversaciones y una cola de notificaciones.
+    `start`, `warm_up` y `close` manejan el ciclo de vida de los que estén
+    construidos.
+    """
+    
+    def __init__(self, config: Settings = default_settings):
+        self.settings = config
+    
+    @cached_property
+    def sheets(self) -> GoogleSheetsService:
+        """Google Sheets: snapshot de datos del restaurante y escritura de reservas"""
+        return GoogleSheetsService(
+            max_concurrency=self.settings.sheets_max_concurrency,
+            request_timeout=self.settings.sheets_timeout_seconds,
+            version_range=self.settings.sheets_version_range
+        )
+    
+    @cached_property
+    def reservation_store(self) -> ReservationStore:
+        """Reservas en SQLite (fuente de verdad)"""
+        return ReservationStore(self.settings.database_url, self.settings.data_dir)
+    
+    @cached_property
+    def calendar(self) -> CalendarService:
+        """Índice de capacidad del salón"""
+        return CalendarService(
+            capacity=self.settings.restaurant_capacity,
+            reservation_store=self.reservation_store,
+            service_hours=compile_menu_rules(self.settings.business_hours)["carta"]
+        )
+    
+    @cached_property
+    def idempotency_cache(self) -> IdempotencyCache:
+        """Resultados de create_reservation por clave de idempotencia"""
+        return IdempotencyCache()
+    
+    @cached_property
+    def memory(self) -> MemoryService:
+        """Memoria de conversaciones (en el proceso con persistencia local, o Redis)"""
+        return MemoryService(backend=create_memory_backend())
+    
+    @cached_property
+    def notifications(self) -> NotificationService:
+        """Notificaciones a administración en segundo plano"""
+        config = self.settings
+        return NotificationService(
+            admin_email=config.admin_email,
+            smtp_host=config.smtp_host,
+            smtp_port=config.smtp_port,
+            smtp_user=config.smtp_user,
+            smtp_password=config.smtp_password,
+            smtp_from=config.smtp_from,
+            smtp_starttls=config.smtp_starttls,
+            coalesce_window=config.notification_coalesce_seconds,
+            digest_interval=config.notification_digest_minutes * 60
+        )
+    
+    async def start(self) -> None:
+        """
+        Arranca los servicios con trabajo en segundo plano.
+        
+        Reenvía las reservas pendientes de un arranque previo, recupera la
+        memoria de conversaciones y arranca la cola de notificaciones.
+        """
+        await self.sheets.start()
+        await self.memory.start()
+        await self.notifications.start()
+    
+    async def warm_up(self) -> Dict[str, Any]:
+        """
+        Precarga lo que es lento de construir: cliente de Google y primer
+        snapshot, reservas futuras del calendario y numpy (consultas en bloque).
+        
+        Returns:
+            Diccionario con los errores por servicio (vacío si todo salió bien)
+        """
+        steps = {
+            "sheets": self.sheets.warm_up(),
+            "calendar": self.calendar.warm_up(),
+            "numpy": asyncio.to_thread(importlib.import_module, "numpy")
+        }
+        results = await asyncio.gather(*steps.values(), return_exceptions=True)
+        return {
+            name: result
+            for name, result in zip(steps, results)
+            if isinstance(result, Exception)
+        }
+    
+    async def close(self) -> None:
+        """Cierra los servicios construidos, en orden inverso al arranque"""
+        constructed = self.__dict__
+        if "notifications" in constructed:
+            # Enviar las notificaciones a administración que sigan en cola
+            await self.notifications.close()
+        if "memory" in constructed:
+            await self.memory.close()
+        if "sheets" in constructed:
+            # Enviar a Google Sheets las reservas que sigan en cola
+            await self.sheets.close()
+        if "reservation_store" in constructed:
+            self.reservation_store.close()
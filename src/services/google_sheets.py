@@ -1,15 +1,89 @@
-from typing import Dict, Any, Optional
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+import asyncio
+import itertools
 import os
+import tempfile
+import time
+from .cache import AsyncTTLCache
+from .metrics import timed
+from .resilience import guarded
+from .sheets_client import SheetsClient
+from .menu_search import MenuIndex
+from .sheets_snapshot import (
+    SHEET_RANGES,
+    RestaurantSnapshot,
+    decode_snapshot,
+    encode_snapshot,
+    example_snapshot,
+    parse_snapshot
+)
+from .write_behind import WriteBehindQueue
 
 
 class GoogleSheetsService:
     """Servicio para integración con Google Sheets"""
     
-    def __init__(self):
+    # TTL (segundos) del snapshot de datos del restaurante. Con celda de
+    # versión, al vencer no se relee la planilla entera: se consulta la celda
+    # (una request chica) y el batchGet completo se hace solo si cambió. Por
+    # eso el TTL puede ser corto sin gastar cuota: los precios cambian pocas
+    # veces por semana pero deben verse apenas cambian.
+    SNAPSHOT_TTL: float = 60
+    # Sin celda de versión cada revalidación es un batchGet completo: TTL más largo.
+    # La versión del archivo en Drive no sirve como marca: cambia con cada
+    # lote de reservas que la cola write-behind agrega a la misma planilla
+    UNVERSIONED_SNAPSHOT_TTL: float = 300
+    
+    # Hoja y orden de columnas donde se registran las reservas
+    RESERVATIONS_RANGE = "Reservas!A:L"
+    RESERVATION_COLUMNS = (
+        "id", "nombre", "telefono", "email", "personas", "fecha", "hora",
+        "tipo_menu", "preferencias", "residente_argentino", "created_at", "status"
+    )
+    
+    # Último snapshot leído con éxito de la planilla (dentro de DATA_DIR)
+    PERSISTED_SNAPSHOT_FILE = "snapshot_restaurante.bin"
+    
+    def __init__(
+        self,
+        snapshot_ttl: Optional[float] = None,
+        cache_stale_ttl: float = 600,
+        write_batch_size: int = 50,
+        write_flush_interval: float = 2.0,
+        max_concurrency: int = 4,
+        request_timeout: float = 30.0,
+        version_range: Optional[str] = None
+    ):
         self.credentials_path = os.getenv("GOOGLE_SHEETS_CREDENTIALS", "/app/credentials.json")
         self.spreadsheet_id = os.getenv("GOOGLE_SHEETS_ID", "")
-        # TODO: Inicializar cliente de Google Sheets API
-        # self.client = self._initialize_client()
+        self.data_dir = os.getenv("DATA_DIR", "/app/data")
+        self.version_range = version_range
+        if snapshot_ttl is None:
+            snapshot_ttl = self.SNAPSHOT_TTL if version_range else self.UNVERSIONED_SNAPSHOT_TTL
+        self.snapshot_ttl = snapshot_ttl
+        self.write_batch_size = write_batch_size
+        self.write_flush_interval = write_flush_interval
+        self.max_concurrency = max_concurrency
+        self.request_timeout = request_timeout
+        self._client: Optional[SheetsClient] = None
+        self._cache = AsyncTTLCache(stale_ttl=cache_stale_ttl)
+        self._snapshot: Optional[RestaurantSnapshot] = None
+        self._versions = itertools.count(1)
+        self._writer: Optional[WriteBehindQueue] = None
+        self._snapshot_stats = {
+            "revision_checks": 0,
+            "revision_unchanged": 0,
+            "revision_errors": 0,
+            "full_reloads": 0,
+            "load_fallbacks": 0,
+            "persisted_restores": 0,
+            "persist_errors": 0
+        }
+        # Instante (epoch) en que los datos se confirmaron contra la planilla
+        self._verified_at: Optional[float] = None
+        self._freshness: Optional[str] = None
+        self._restore_snapshot()
     
     async def get_business_info(self) -> Dict[str, str]:
         """
@@ -18,14 +92,7 @@ class GoogleSheetsService:
         Returns:
             Diccionario con información del negocio por categoría
         """
-        # TODO: Implementar lectura real de Google Sheets
-        # Por ahora retornamos estructura de ejemplo
-        return {
-            "general": "La Cabrera Mendoza - Restaurante especializado en carnes a la parrilla",
-            "ubicacion": "Primitivo de la Reta 1015 - Entrando por Hualta Winery Hotel Curio Collection By Hilton",
-            "telefono": "+54 261 xxx xxxx",
-            "horarios": "Lunes a Domingo - Consultar horarios específicos"
-        }
+        return (await self.get_snapshot()).business_info
     
     async def get_menu_prices(self) -> Dict[str, Any]:
         """
@@ -35,24 +102,7 @@ class GoogleSheetsService:
         Returns:
             Diccionario con precios por tipo de menú
         """
-        # TODO: Implementar lectura real de Google Sheets
-        # Por ahora retornamos estructura de ejemplo
-        return {
-            "ejecutivo": {
-                "precio": None,  # Se debe obtener dinámicamente
-                "descripcion": "Menú ejecutivo: entrada, plato principal y postre o café",
-                "disponibilidad": "Lunes a viernes de 12:30 a 16:30hs",
-                "requisito": "Solo para residentes argentinos"
-            },
-            "manso": {
-                "precio": None,  # Se debe obtener dinámicamente
-                "descripcion": "Menú manso",
-                "disponibilidad": "Lunes a jueves de 12:30 a 16:30hs y de 20:00 a 23:30hs"
-            },
-            "carta": {
-                "descripcion": "Carta completa disponible todos los días"
-            }
-        }
+        return (await self.get_snapshot()).menu_prices
     
     async def get_business_hours(self) -> Dict[str, str]:
         """
@@ -61,13 +111,7 @@ class GoogleSheetsService:
         Returns:
             Diccionario con horarios por día
         """
-        # TODO: Implementar lectura real de Google Sheets
-        return {
-            "lunes_jueves": "12:30 - 16:30 y 20:00 - 23:30",
-            "viernes": "12:30 - 16:30 y 20:00 - 00:00",
-            "sabado": "12:30 - 16:30 y 20:00 - 00:00",
-            "domingo": "12:30 - 16:30 y 20:00 - 23:30"
-        }
+        return (await self.get_snapshot()).business_hours
     
     async def get_menu_details(self) -> Dict[str, Any]:
         """
@@ -76,43 +120,385 @@ class GoogleSheetsService:
         Returns:
             Diccionario con todas las secciones del menú
         """
-        # TODO: Implementar lectura real de Google Sheets
-        return {
-            "entradas": [],
-            "principales": [],
-            "postres": [],
-            "bebidas": []
-        }
+        return (await self.get_snapshot()).menu_details
+    
+    async def get_menu_index(self) -> MenuIndex:
+        """
+        Obtiene el índice de búsqueda del menú vigente.
+        
+        Returns:
+            Índice construido una vez por snapshot
+        """
+        return (await self.get_snapshot()).menu_index
     
+    @timed("google_sheets")
+    async def get_snapshot(self) -> RestaurantSnapshot:
+        """
+        Obtiene el snapshot vigente de datos del restaurante.
+        
+        Si el snapshot está fresco se devuelve desde memoria; si venció se sirve
+        el anterior mientras se revalida en segundo plano (celda de versión y,
+        solo si cambió, batchGet), y las cargas concurrentes comparten una
+        única consulta.
+        
+        Returns:
+            Snapshot inmutable con info, precios, horarios y menú
+        """
+        return await self._cache.get("snapshot", self._load_snapshot, self.snapshot_ttl)
+    
+    @property
+    def current_snapshot(self) -> Optional[RestaurantSnapshot]:
+        """Último snapshot cargado, sin disparar ninguna carga"""
+        return self._snapshot
+    
+    @property
+    def data_freshness(self) -> Optional[str]:
+        """
+        Fecha y hora (ISO) en que los datos vigentes se confirmaron contra la
+        planilla, o None si todavía no hay datos de la planilla.
+        """
+        verified_at = self._verified_at
+        if verified_at is None:
+            return None
+        if self._freshness is None:
+            self._freshness = datetime.fromtimestamp(verified_at).isoformat(timespec="seconds")
+        return self._freshness
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene contadores de la caché del snapshot para ajustar el TTL.
+        
+        Returns:
+            Diccionario con hits, misses y recargas, revisiones consultadas,
+            TTL y versión vigente
+        """
+        stats = self._cache.get_stats()
+        stats.update(self._snapshot_stats)
+        stats["snapshot_ttl"] = self.snapshot_ttl
+        stats["snapshot_version"] = self._snapshot.version if self._snapshot else None
+        stats["snapshot_revision"] = self._snapshot.revision if self._snapshot else None
+        return stats
+    
+    def invalidate_cache(self) -> None:
+        """Invalida el snapshot cacheado (por ejemplo, tras editar la planilla)"""
+        self._cache.invalidate()
+    
+    async def refresh(self) -> RestaurantSnapshot:
+        """
+        Relee la planilla completa ya, sin esperar al TTL ni mirar la revisión.
+        
+        No se suma a una revalidación en curso (que con la misma revisión
+        devolvería el snapshot viejo): hace su propio batchGet y lo publica.
+        
+        Returns:
+            Snapshot recién cargado
+        """
+        snapshot = await self._reload_snapshot()
+        self._cache.prime("snapshot", snapshot)
+        return snapshot
+    
+    @timed("google_sheets")
     async def save_reservation(self, reservation_data: Dict[str, Any]) -> bool:
         """
         Guarda una reserva en Google Sheets.
         
+        La reserva se confirma en cuanto queda persistida en la cola local; la
+        escritura en la planilla se hace en lotes en segundo plano.
+        
         Args:
             reservation_data: Datos de la reserva
-            
+        
         Returns:
             True si se guardó exitosamente
         """
-        # TODO: Implementar escritura en Google Sheets
+        row = [reservation_data.get(column) for column in self.RESERVATION_COLUMNS]
+        await self._get_writer().enqueue(row)
         return True
     
-    def _initialize_client(self):
+    @timed("google_sheets")
+    @guarded("google_sheets")
+    async def append_reservations(self, rows: List[List[Any]]) -> None:
         """
-        Inicializa el cliente de Google Sheets API.
+        Agrega varias filas de reservas a la planilla en un único values.append.
+        
+        Args:
+            rows: Filas en el orden de RESERVATION_COLUMNS
+        """
+        if not self._is_configured():
+            # Sin planilla configurada (desarrollo local): no hay dónde escribir
+            return
+        
+        await self._get_client().call(lambda service: self._append_rows(service, rows))
+    
+    async def warm_up(self, load_snapshot: bool = True) -> None:
+        """
+        Prepara el cliente de Google (y opcionalmente el snapshot) en segundo plano.
+        
+        Construir el cliente (credenciales + discovery) es lento: se hace en el
+        executor de Sheets mientras el servidor ya acepta conexiones, así la
+        primera consulta no lo paga.
+        
+        Args:
+            load_snapshot: Cargar también el primer snapshot de datos
+        """
+        if self._is_configured():
+            await self._get_client().warm_up()
+        if load_snapshot:
+            await self.get_snapshot()
+    
+    async def start(self) -> None:
+        """Arranca la cola de escritura (reenvía reservas pendientes de un arranque previo)"""
+        await self._get_writer().start()
+    
+    async def close(self) -> None:
+        """Vacía la cola de escritura antes de apagar el servidor y cierra el cliente"""
+        if self._writer is not None:
+            await self._writer.close()
+            self._writer = None
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+    
+    def get_write_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene contadores de la cola de escritura de reservas.
         
         Returns:
-            Cliente autenticado
-        """
-        # TODO: Implementar autenticación con Google Sheets API
-        # from google.oauth2.service_account import Credentials
-        # from googleapiclient.discovery import build
-        
-        # credentials = Credentials.from_service_account_file(
-        #     self.credentials_path,
-        #     scopes=['https://www.googleapis.com/auth/spreadsheets']
-        # )
-        # service = build('sheets', 'v4', credentials=credentials)
-        # return service
-        pass
-
+            Diccionario con filas encoladas, enviadas y pendientes
+        """
+        return self._writer.get_stats() if self._writer is not None else {}
+    
+    def get_client_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene contadores del cliente de Google Sheets API.
+        
+        Returns:
+            Diccionario con llamadas, errores, en curso y en espera
+        """
+        return self._client.get_stats() if self._client is not None else {}
+    
+    @timed("google_sheets")
+    async def _load_snapshot(self) -> RestaurantSnapshot:
+        """
+        Revalida el snapshot: si la celda de versión no cambió se conserva el
+        vigente; si cambió (o no hay celda o no se pudo consultar) se relee
+        completa.
+        
+        Returns:
+            Snapshot vigente o recién cargado
+        """
+        current = self._snapshot
+        if current is None or not self._is_configured():
+            return await self._reload_snapshot()
+        
+        try:
+            revision = await self._fetch_revision()
+            if revision is not None and revision == current.revision:
+                self._snapshot_stats["revision_unchanged"] += 1
+                self._mark_verified()
+                # El vigente, no `current`: un refresh pudo publicar otro mientras tanto
+                return self._snapshot
+            return await self._reload_snapshot(revision, fetch_revision=False)
+        except Exception:
+            # Planilla caída o lenta: se sigue sirviendo el último snapshot bueno
+            # (con su fecha de actualización) y se reintenta al vencer el TTL
+            self._snapshot_stats["load_fallbacks"] += 1
+            return self._snapshot
+    
+    @timed("google_sheets")
+    async def _reload_snapshot(
+        self,
+        revision: Optional[str] = None,
+        fetch_revision: bool = True
+    ) -> RestaurantSnapshot:
+        """
+        Lee todos los rangos en un único batchGet, publica el nuevo snapshot y
+        lo persiste en disco como último snapshot bueno.
+        
+        Args:
+            revision: Marca de revisión ya consultada
+            fetch_revision: Consultar la marca si no se recibió
+        
+        Returns:
+            Snapshot recién cargado
+        """
+        version = next(self._versions)
+        
+        if self._is_configured():
+            # La revisión se lee ANTES del batchGet: si la planilla cambia en el
+            # medio, la próxima revalidación verá otra marca y volverá a leer
+            if revision is None and fetch_revision:
+                revision = await self._fetch_revision()
+            response = await self._get_values()
+            snapshot = parse_snapshot(response.get("valueRanges", []), version, revision)
+            self._snapshot_stats["full_reloads"] += 1
+        else:
+            # Sin planilla configurada (desarrollo local): estructura de ejemplo
+            snapshot = example_snapshot(version)
+        
+        current = self._snapshot
+        if current is not None and current.version > snapshot.version:
+            # Una recarga que empezó después (ej. refresh) ya publicó datos más nuevos
+            return current
+        
+        # Reemplazo atómico: los lectores ven el snapshot viejo o el nuevo, nunca uno a medias
+        self._snapshot = snapshot
+        if self._is_configured():
+            self._mark_verified(snapshot.loaded_at)
+            await self._persist_snapshot(snapshot)
+        return snapshot
+    
+    def _restore_snapshot(self) -> None:
+        """
+        Carga el último snapshot bueno persistido (si es de esta planilla).
+        
+        Se hace de forma sincrónica al construir el servicio: son unos pocos KB
+        y evita que las primeras consultas esperen a Google Sheets. Queda
+        registrado como vencido, así la primera lectura lo sirve y lo revalida
+        en segundo plano.
+        """
+        if not self.spreadsheet_id:
+            return
+        try:
+            with open(self._persisted_path(), "rb") as persisted:
+                snapshot, spreadsheet_id = decode_snapshot(persisted.read(), next(self._versions))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Snapshot persistido ilegible, se ignora: {e}")
+            return
+        
+        if spreadsheet_id != self.spreadsheet_id:
+            return
+        self._snapshot = snapshot
+        self._mark_verified(snapshot.loaded_at)
+        self._cache.prime("snapshot", snapshot, age=self.snapshot_ttl)
+        self._snapshot_stats["persisted_restores"] += 1
+    
+    async def _persist_snapshot(self, snapshot: RestaurantSnapshot) -> None:
+        """Guarda el snapshot en disco fuera del event loop; un error no es fatal"""
+        try:
+            data = encode_snapshot(snapshot, self.spreadsheet_id)
+            await asyncio.to_thread(self._write_atomically, self._persisted_path(), data)
+        except Exception as e:
+            self._snapshot_stats["persist_errors"] += 1
+            print(f"⚠️ No se pudo persistir el snapshot: {e}")
+    
+    @staticmethod
+    def _write_atomically(path: str, data: bytes) -> None:
+        """Escribe en un temporal, hace fsync y lo renombra: nunca queda un archivo a medias"""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Un temporal propio por escritura: un refresh y una recarga en segundo
+        # plano simultáneos no se pisan el archivo a medio escribir
+        tmp = tempfile.NamedTemporaryFile(
+            dir=directory,
+            prefix=os.path.basename(path) + ".",
+            suffix=".tmp",
+            delete=False
+        )
+        try:
+            with tmp:
+                tmp.write(data)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            os.replace(tmp.name, path)
+        except BaseException:
+            os.unlink(tmp.name)
+            raise
+        
+        # Hacer durable el rename
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    
+    def _persisted_path(self) -> str:
+        """Ruta del último snapshot bueno persistido"""
+        return os.path.join(self.data_dir, self.PERSISTED_SNAPSHOT_FILE)
+    
+    def _mark_verified(self, verified_at: Optional[float] = None) -> None:
+        """Registra que los datos vigentes coinciden con la planilla"""
+        self._verified_at = time.time() if verified_at is None else verified_at
+        self._freshness = None
+    
+    async def _fetch_revision(self) -> Optional[str]:
+        """
+        Consulta la marca de revisión de la planilla (la celda de versión).
+        
+        Returns:
+            Marca de revisión, o None si no hay celda configurada o no se pudo
+            obtener (se relee completa)
+        """
+        if not self.version_range:
+            return None
+        self._snapshot_stats["revision_checks"] += 1
+        try:
+            return await self._get_revision()
+        except Exception:
+            self._snapshot_stats["revision_errors"] += 1
+            return None
+    
+    @guarded("google_sheets", hedge=True, can_hedge=lambda service: not service._get_client().saturated)
+    async def _get_revision(self) -> Optional[str]:
+        """Lectura de la celda de versión (idempotente: admite hedge)"""
+        return await self._get_client().call(self._read_version_cell)
+    
+    @guarded("google_sheets", hedge=True, can_hedge=lambda service: not service._get_client().saturated)
+    async def _get_values(self) -> Dict[str, Any]:
+        """Lectura de todos los rangos del snapshot (idempotente: admite hedge)"""
+        return await self._get_client().call(self._batch_get)
+    
+    def _read_version_cell(self, service) -> Optional[str]:
+        """Ejecuta spreadsheets.values.get sobre la celda de versión"""
+        response = service.spreadsheets().values().get(
+            spreadsheetId=self.spreadsheet_id,
+            range=self.version_range,
+            valueRenderOption="UNFORMATTED_VALUE"
+        ).execute()
+        values = response.get("values") or [[]]
+        return str(values[0][0]) if values[0] else None
+    
+    def _batch_get(self, service) -> Dict[str, Any]:
+        """Ejecuta spreadsheets.values.batchGet con todos los rangos del snapshot"""
+        return service.spreadsheets().values().batchGet(
+            spreadsheetId=self.spreadsheet_id,
+            ranges=list(SHEET_RANGES.values()),
+            valueRenderOption="UNFORMATTED_VALUE"
+        ).execute()
+    
+    def _append_rows(self, service, rows: List[List[Any]]) -> Dict[str, Any]:
+        """Ejecuta spreadsheets.values.append con un lote de filas"""
+        return service.spreadsheets().values().append(
+            spreadsheetId=self.spreadsheet_id,
+            range=self.RESERVATIONS_RANGE,
+            valueInputOption="RAW",
+            insertDataOption="INSERT_ROWS",
+            body={"values": rows}
+        ).execute()
+    
+    def _get_client(self) -> SheetsClient:
+        """Crea el cliente de Google Sheets API la primera vez que se necesita"""
+        if self._client is None:
+            self._client = SheetsClient(
+                self.credentials_path,
+                max_concurrency=self.max_concurrency,
+                timeout=self.request_timeout
+            )
+        return self._client
+    
+    def _get_writer(self) -> WriteBehindQueue:
+        """Crea la cola write-behind de reservas la primera vez que se necesita"""
+        if self._writer is None:
+            self._writer = WriteBehindQueue(
+                self.append_reservations,
+                os.path.join(self.data_dir, "reservas_pendientes.jsonl"),
+                batch_size=self.write_batch_size,
+                flush_interval=self.write_flush_interval
+            )
+        return self._writer
+    
+    def _is_configured(self) -> bool:
+        """Indica si hay planilla y credenciales para consultar Google Sheets"""
+        return bool(self.spreadsheet_id) and os.path.exists(self.credentials_path)
@@ -0,0 +1,145 @@
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from collections import OrderedDict
+import asyncio
+import time
+
+
+Operation = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+class IdempotencyConflictError(Exception):
+    """La clave de idempotencia ya se usó con otros datos"""
+
+
+class IdempotencyCache:
+    """
+    Resultados de operaciones idempotentes por clave, acotados por TTL y tamaño.
+    
+    - Si la clave ya tiene un resultado vigente, se devuelve sin ejecutar nada.
+    - Si la misma clave está en curso, las llamadas concurrentes esperan y
+      reciben el mismo resultado (un solo efecto).
+    - Solo se guardan los resultados exitosos: un intento fallido puede
+      reintentarse con la misma clave.
+    - Cada clave guarda la huella de los datos con que se usó: la misma clave
+      con datos distintos es un conflicto, no una repetición.
+    """
+    
+    def __init__(
+        self,
+        ttl: float = 24 * 60 * 60,
+        max_entries: int = 10000,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        # Clave -> (vencimiento, huella de los datos, resultado)
+        self._results: "OrderedDict[str, Tuple[float, Optional[str], Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, Tuple[Optional[str], asyncio.Future]] = {}
+        self._stats = {"hits": 0, "coalesced": 0, "misses": 0, "conflicts": 0}
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Obtiene el resultado vigente de una clave.
+        
+        Args:
+            key: Clave de idempotencia
+        
+        Returns:
+            Resultado guardado o None si no hay uno vigente
+        """
+        entry = self._entry(key)
+        return None if entry is None else entry[2]
+    
+    def put(self, key: str, result: Dict[str, Any], fingerprint: Optional[str] = None) -> None:
+        """
+        Guarda el resultado de una clave (desaloja las más viejas si se excede el tamaño).
+        
+        Args:
+            key: Clave de idempotencia
+            result: Resultado a devolver en los reintentos
+            fingerprint: Huella de los datos con que se obtuvo
+        """
+        self._results[key] = (self._clock() + self.ttl, fingerprint, result)
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+    
+    async def run(
+        self,
+        key: str,
+        operation: Operation,
+        is_success: Callable[[Dict[str, Any]], bool] = lambda result: bool(result.get("success")),
+        fingerprint: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Ejecuta la operación una sola vez por clave.
+        
+        Args:
+            key: Clave de idempotencia
+            operation: Corrutina que produce el resultado
+            is_success: Decide si el resultado se guarda para los reintentos
+            fingerprint: Huella de los datos de la operación (None = no se compara)
+        
+        Returns:
+            Tupla (resultado, True si es una repetición de uno ya obtenido)
+        
+        Raises:
+            IdempotencyConflictError: Si la clave ya se usó con otra huella
+        """
+        entry = self._entry(key)
+        if entry is not None:
+            self._check_fingerprint(key, entry[1], fingerprint)
+            self._stats["hits"] += 1
+            return entry[2], True
+        
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._check_fingerprint(key, inflight[0], fingerprint)
+            self._stats["coalesced"] += 1
+            return await asyncio.shield(inflight[1]), True
+        
+        self._stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = (fingerprint, future)
+        try:
+            result = await operation()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Evita el warning de excepción no recuperada si nadie más esperaba
+            future.exception()
+            raise
+        else:
+            if is_success(result):
+                self.put(key, result, fingerprint)
+            future.set_result(result)
+            return result, False
+        finally:
+            self._inflight.pop(key, None)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene contadores de la caché.
+        
+        Returns:
+            Diccionario con aciertos, llamadas agrupadas, ejecuciones, conflictos y entradas
+        """
+        return {**self._stats, "entries": len(self._results), "inflight": len(self._inflight)}
+    
+    def _entry(self, key: str) -> Optional[Tuple[float, Optional[str], Dict[str, Any]]]:
+        """Entrada vigente de una clave (descarta la vencida)"""
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= self._clock():
+            del self._results[key]
+            return None
+        return entry
+    
+    def _check_fingerprint(self, key: str, stored: Optional[str], fingerprint: Optional[str]) -> None:
+        if stored is not None and fingerprint is not None and stored != fingerprint:
+            self._stats["conflicts"] += 1
+            raise IdempotencyConflictError(key)
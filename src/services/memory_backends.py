@@ -0,0 +1,523 @@
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from datetime import datetime
+from itertools import islice
+from operator import attrgetter
+import gc
+import os
+import sys
+import time
+from types import MappingProxyType
+from .memory_log import (
+    MemoryLog,
+    REC_CLEAR,
+    REC_CLEAR_CONTEXT,
+    REC_CONTEXT,
+    REC_CONVERSATION,
+    REC_MESSAGE,
+    encode_clear,
+    encode_clear_context,
+    encode_context,
+    encode_conversation,
+    encode_message
+)
+
+
+# Estimación del costo fijo en memoria de cada mensaje guardado (MemoryMessage con slots)
+MESSAGE_OVERHEAD_BYTES = 80
+
+# Metadatos vacíos compartidos por todos los mensajes que no traen metadatos
+_EMPTY_METADATA = MappingProxyType({})
+_EMPTY_METADATA_SIZE = sys.getsizeof(_EMPTY_METADATA)
+
+# Entradas inactivas que se revisan como máximo por operación (eviction incremental)
+EVICTION_BATCH = 8
+
+
+class MemoryMessage:
+    """
+    Mensaje guardado en forma compacta.
+    
+    El rol se interna (todas las instancias comparten el mismo string), el
+    timestamp es un float epoch y los mensajes sin metadatos apuntan a un único
+    diccionario vacío de solo lectura. El formato ISO se genera recién al leer.
+    """
+    
+    __slots__ = ("role", "content", "timestamp", "metadata")
+    
+    def __init__(self, role: str, content: str, timestamp: float, metadata: Optional[Dict[str, Any]]):
+        self.role = sys.intern(role)
+        self.content = content
+        self.timestamp = timestamp
+        self.metadata = metadata if metadata else _EMPTY_METADATA
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Representación pública del mensaje (la misma que antes se guardaba)"""
+        return {
+            "role": self.role,
+            "content": self.content,
+            "timestamp": datetime.fromtimestamp(self.timestamp).isoformat(),
+            "metadata": dict(self.metadata)
+        }
+
+
+class _Conversation:
+    """Historial acotado de una conversación (ring buffer) con su último acceso"""
+    
+    __slots__ = ("messages", "last_access", "size_bytes")
+    
+    def __init__(self, max_messages: int, now: float):
+        self.messages: Deque[MemoryMessage] = deque(maxlen=max_messages)
+        self.last_access = now
+        self.size_bytes = 0
+
+
+class _CustomerContext:
+    """Contexto de un cliente con su último acceso"""
+    
+    __slots__ = ("data", "last_access")
+    
+    def __init__(self, now: float):
+        self.data: Dict[str, Any] = {}
+        self.last_access = now
+
+
+class MemoryBackend(ABC):
+    """
+    Interfaz de almacenamiento de MemoryService.
+    
+    Los mensajes se devuelven ya en su forma pública (diccionarios con
+    timestamp ISO), igual que los expone MemoryService.
+    """
+    
+    @abstractmethod
+    async def get_conversation_history(
+        self,
+        conversation_id: str,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Historial de la conversación (los últimos `limit` mensajes si se indica)"""
+    
+    @abstractmethod
+    async def add_message(
+        self,
+        conversation_id: str,
+        role: str,
+        content: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Agrega un mensaje al final del historial"""
+    
+    @abstractmethod
+    async def get_customer_context(self, customer_id: str) -> Dict[str, Any]:
+        """Contexto del cliente ({} si no existe)"""
+    
+    @abstractmethod
+    async def update_customer_context(self, customer_id: str, context: Dict[str, Any]) -> None:
+        """Combina `context` con el contexto guardado del cliente"""
+    
+    @abstractmethod
+    async def check_first_interaction(self, conversation_id: str) -> bool:
+        """True si la conversación no tiene mensajes"""
+    
+    @abstractmethod
+    async def clear_conversation(self, conversation_id: str) -> None:
+        """Elimina el historial de la conversación"""
+    
+    async def add_message_with_context(
+        self,
+        conversation_id: str,
+        role: str,
+        content: str,
+        customer_id: str,
+        context: Dict[str, Any],
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Agrega un mensaje y actualiza el contexto del cliente.
+        
+        Los backends remotos lo sobrescriben para hacerlo en un único round trip.
+        """
+        await self.add_message(conversation_id, role, content, metadata)
+        await self.update_customer_context(customer_id, context)
+    
+    async def start(self) -> None:
+        """Arranca tareas en segundo plano del backend (si las hay)"""
+    
+    async def close(self) -> None:
+        """Libera conexiones y escribe lo pendiente"""
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Contadores del backend"""
+        return {}
+
+
+class InProcessMemoryBackend(MemoryBackend):
+    """
+    Backend en memoria del proceso.
+    
+    Conversaciones en ring buffers con desalojo LRU/TTL/presupuesto y
+    persistencia opcional en un log append-only (ver MemoryLog).
+    """
+    
+    def __init__(
+        self,
+        max_conversations: int = 10000,
+        max_messages: int = 200,
+        idle_ttl_seconds: float = 24 * 60 * 60,
+        memory_budget_bytes: Optional[int] = None,
+        data_dir: Optional[str] = None,
+        clock=time.monotonic
+    ):
+        # Ambos diccionarios están ordenados por último acceso (LRU): el primero
+        # es siempre el candidato a desalojar.
+        self.conversations: "OrderedDict[str, _Conversation]" = OrderedDict()
+        self.customer_context: "OrderedDict[str, _CustomerContext]" = OrderedDict()
+        
+        self.max_conversations = max_conversations
+        self.max_messages = max_messages
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.memory_budget_bytes = memory_budget_bytes
+        self._clock = clock
+        self._total_bytes = 0
+        self._evictions = {"lru": 0, "idle": 0, "budget": 0}
+        
+        # Persistencia opcional: log append-only + snapshot en data_dir/memoria
+        self._log: Optional[MemoryLog] = None
+        if data_dir:
+            self._log = MemoryLog(os.path.join(data_dir, "memoria"), capture=self._capture_state)
+            # La recuperación crea cientos de miles de objetos que sobreviven:
+            # pausar el GC evita recorridas completas inútiles durante la carga
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                self._recover()
+            finally:
+                if gc_enabled:
+                    gc.enable()
+    
+    async def get_conversation_history(
+        self,
+        conversation_id: str,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Obtiene historial de conversación.
+        
+        Args:
+            conversation_id: ID de la conversación
+            limit: Número máximo de mensajes a retornar
+        
+        Returns:
+            Lista de mensajes de la conversación
+        """
+        conversation = self._touch_conversation(conversation_id)
+        if conversation is None:
+            return []
+        
+        messages = conversation.messages
+        if limit and limit < len(messages):
+            # Se recorre el ring buffer desde el final: O(limit), sin copiar todo el historial
+            recent = [message.to_dict() for message in islice(reversed(messages), limit)]
+            recent.reverse()
+            return recent
+        
+        return [message.to_dict() for message in messages]
+    
+    async def add_message(
+        self,
+        conversation_id: str,
+        role: str,
+        content: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Agrega un mensaje al historial de conversación.
+        
+        Args:
+            conversation_id: ID de la conversación
+            role: Rol del mensaje (user, assistant, system)
+            content: Contenido del mensaje
+            metadata: Metadatos adicionales
+        """
+        now = self._clock()
+        conversation = self._touch_conversation(conversation_id, now)
+        if conversation is None:
+            conversation = _Conversation(self.max_messages, now)
+            self.conversations[conversation_id] = conversation
+        
+        message = MemoryMessage(role, content, time.time(), metadata)
+        if self._log is not None:
+            self._log.append(encode_message(conversation_id, message.role, content, message.timestamp, metadata))
+        
+        messages = conversation.messages
+        if len(messages) == messages.maxlen:
+            # El ring buffer descarta el mensaje más viejo al agregar
+            self._account(conversation, -self._message_size(messages[0]))
+        messages.append(message)
+        self._account(conversation, self._message_size(message))
+        
+        self._evict(now)
+    
+    async def get_customer_context(self, customer_id: str) -> Dict[str, Any]:
+        """
+        Obtiene contexto del cliente (preferencias, historial, etc.).
+        
+        Args:
+            customer_id: ID del cliente
+        
+        Returns:
+            Contexto del cliente
+        """
+        entry = self.customer_context.get(customer_id)
+        if entry is None:
+            return {}
+        
+        entry.last_access = self._clock()
+        self.customer_context.move_to_end(customer_id)
+        return entry.data
+    
+    async def update_customer_context(
+        self,
+        customer_id: str,
+        context: Dict[str, Any]
+    ) -> None:
+        """
+        Actualiza contexto del cliente.
+        
+        Args:
+            customer_id: ID del cliente
+            context: Nuevo contexto o actualización
+        """
+        now = self._clock()
+        entry = self.customer_context.get(customer_id)
+        if entry is None:
+            entry = self.customer_context[customer_id] = _CustomerContext(now)
+        else:
+            entry.last_access = now
+            self.customer_context.move_to_end(customer_id)
+        
+        entry.data.update(context)
+        if self._log is not None:
+            self._log.append(encode_context(customer_id, context, time.time()))
+        self._evict(now)
+    
+    async def check_first_interaction(self, conversation_id: str) -> bool:
+        """
+        Verifica si es la primera interacción en una conversación.
+        
+        Args:
+            conversation_id: ID de la conversación
+        
+        Returns:
+            True si es la primera interacción
+        """
+        conversation = self._touch_conversation(conversation_id)
+        return conversation is None or len(conversation.messages) == 0
+    
+    async def clear_conversation(self, conversation_id: str) -> None:
+        """
+        Limpia el historial de una conversación.
+        
+        Args:
+            conversation_id: ID de la conversación
+        """
+        conversation = self.conversations.pop(conversation_id, None)
+        if conversation is not None:
+            self._total_bytes -= conversation.size_bytes
+            if self._log is not None:
+                self._log.append(encode_clear(conversation_id))
+    
+    async def start(self) -> None:
+        """Arranca la escritura en segundo plano del log de persistencia"""
+        if self._log is not None:
+            await self._log.start()
+    
+    async def close(self) -> None:
+        """Escribe a disco lo pendiente del log antes de apagar el servidor"""
+        if self._log is not None:
+            await self._log.close()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene el uso de memoria y los desalojos realizados.
+        
+        Returns:
+            Diccionario con conversaciones, contextos, bytes estimados y desalojos
+        """
+        return {
+            "conversations": len(self.conversations),
+            "customer_contexts": len(self.customer_context),
+            "estimated_bytes": self._total_bytes,
+            "max_conversations": self.max_conversations,
+            "max_messages": self.max_messages,
+            "idle_ttl_seconds": self.idle_ttl_seconds,
+            "memory_budget_bytes": self.memory_budget_bytes,
+            "backend": "memory",
+            "evictions": dict(self._evictions),
+            "persistence": self._log.get_stats() if self._log is not None else None
+        }
+    
+    def _touch_conversation(self, conversation_id: str, now: Optional[float] = None) -> Optional[_Conversation]:
+        """Devuelve la conversación y la marca como la más recientemente usada"""
+        conversation = self.conversations.get(conversation_id)
+        if conversation is not None:
+            conversation.last_access = self._clock() if now is None else now
+            self.conversations.move_to_end(conversation_id)
+        return conversation
+    
+    def _account(self, conversation: _Conversation, delta: int) -> None:
+        conversation.size_bytes += delta
+        self._total_bytes += delta
+    
+    @staticmethod
+    def _message_size(message: MemoryMessage) -> int:
+        # Los metadatos vacíos compartidos no suman (se resta su tamaño)
+        return (
+            MESSAGE_OVERHEAD_BYTES - _EMPTY_METADATA_SIZE
+            + sys.getsizeof(message.content) + sys.getsizeof(message.metadata)
+        )
+    
+    def _evict(self, now: float) -> None:
+        """
+        Desalojo incremental: nunca recorre todo el estado.
+        
+        Los límites duros (cantidad de conversaciones y presupuesto de memoria)
+        se aplican desalojando las menos usadas; las entradas inactivas se
+        revisan de a EVICTION_BATCH desde el extremo LRU.
+        """
+        while len(self.conversations) > self.max_conversations:
+            self._evict_oldest_conversation("lru")
+        
+        if self.memory_budget_bytes:
+            while self._total_bytes > self.memory_budget_bytes and len(self.conversations) > 1:
+                self._evict_oldest_conversation("budget")
+        
+        deadline = now - self.idle_ttl_seconds
+        for entries in (self.conversations, self.customer_context):
+            for _ in range(EVICTION_BATCH):
+                if not entries:
+                    break
+                oldest = next(iter(entries.values()))
+                if oldest.last_access > deadline:
+                    break
+                if entries is self.conversations:
+                    self._evict_oldest_conversation("idle")
+                else:
+                    self._evict_oldest_context("idle")
+        
+        while len(self.customer_context) > self.max_conversations:
+            self._evict_oldest_context("lru")
+    
+    def _evict_oldest_conversation(self, reason: str) -> None:
+        conversation_id, conversation = self.conversations.popitem(last=False)
+        self._total_bytes -= conversation.size_bytes
+        self._evictions[reason] += 1
+        if self._log is not None:
+            # Lo desalojado tampoco vuelve al reiniciar
+            self._log.append(encode_clear(conversation_id))
+    
+    def _evict_oldest_context(self, reason: str) -> None:
+        customer_id, _ = self.customer_context.popitem(last=False)
+        self._evictions[reason] += 1
+        if self._log is not None:
+            self._log.append(encode_clear_context(customer_id))
+    
+    def _recover(self) -> None:
+        """
+        Reconstruye el estado desde el snapshot y la cola del log.
+        
+        El último acceso de cada conversación se deriva del timestamp de su
+        último mensaje y el de cada contexto, del guardado en su registro, así
+        el TTL de inactividad sigue valiendo tras reiniciar.
+        """
+        now = self._clock()
+        conversations = self.conversations
+        contexts = self.customer_context
+        max_messages = self.max_messages
+        context_access: Dict[str, float] = {}
+        
+        for record in self._log.recover():
+            kind = record[0]
+            if kind == REC_MESSAGE:
+                _, conversation_id, role, content, timestamp, metadata = record
+                conversation = conversations.get(conversation_id)
+                if conversation is None:
+                    conversation = conversations[conversation_id] = _Conversation(max_messages, now)
+                else:
+                    conversations.move_to_end(conversation_id)
+                conversation.messages.append(MemoryMessage(role, content, timestamp, metadata))
+            elif kind == REC_CONVERSATION:
+                # Conversación completa del snapshot: se restaura en bloque
+                _, conversation_id, roles, contents, timestamps, metadatas = record
+                conversation = conversations[conversation_id] = _Conversation(max_messages, now)
+                conversation.messages.extend(map(MemoryMessage, roles, contents, timestamps, metadatas))
+            elif kind == REC_CONTEXT:
+                _, customer_id, data, timestamp = record
+                entry = contexts.get(customer_id)
+                if entry is None:
+                    entry = contexts[customer_id] = _CustomerContext(now)
+                else:
+                    contexts.move_to_end(customer_id)
+                entry.data.update(data)
+                if timestamp is not None:
+                    context_access[customer_id] = timestamp
+            elif kind == REC_CLEAR:
+                conversations.pop(record[1], None)
+            elif kind == REC_CLEAR_CONTEXT:
+                contexts.pop(record[1], None)
+                context_access.pop(record[1], None)
+        
+        wall_now = time.time()
+        for conversation in conversations.values():
+            if conversation.messages:
+                idle = max(0.0, wall_now - conversation.messages[-1].timestamp)
+                conversation.last_access = now - idle
+            # Equivale a sumar _message_size, pero sin llamadas Python por mensaje
+            messages = conversation.messages
+            conversation.size_bytes = (
+                len(messages) * (MESSAGE_OVERHEAD_BYTES - _EMPTY_METADATA_SIZE)
+                + sum(map(sys.getsizeof, map(attrgetter("content"), messages)))
+                + sum(map(sys.getsizeof, map(attrgetter("metadata"), messages)))
+            )
+            self._total_bytes += conversation.size_bytes
+        for customer_id, timestamp in context_access.items():
+            contexts[customer_id].last_access = now - max(0.0, wall_now - timestamp)
+        
+        while len(conversations) > self.max_conversations:
+            self._evict_oldest_conversation("lru")
+        while len(contexts) > self.max_conversations:
+            self._evict_oldest_context("lru")
+    
+    def _capture_state(self) -> Iterator[bytes]:
+        """
+        Copia el estado vigente para compactarlo en un snapshot.
+        
+        Las copias son superficiales (los mensajes no se modifican una vez
+        creados); la codificación ocurre después, fuera del event loop.
+        """
+        conversations = [(cid, list(c.messages)) for cid, c in self.conversations.items()]
+        # El último acceso se guarda como epoch: el reloj monotónico no sobrevive al reinicio
+        wall_offset = time.time() - self._clock()
+        contexts = [
+            (cid, dict(entry.data), entry.last_access + wall_offset)
+            for cid, entry in self.customer_context.items()
+        ]
+        return self._encode_state(conversations, contexts)
+    
+    @staticmethod
+    def _encode_state(
+        conversations: List[Tuple[str, List[MemoryMessage]]],
+        contexts: List[Tuple[str, Dict[str, Any], float]]
+    ) -> Iterator[bytes]:
+        for customer_id, data, last_access in contexts:
+            yield encode_context(customer_id, data, last_access)
+        for conversation_id, messages in conversations:
+            yield encode_conversation(
+                conversation_id,
+                [message.role for message in messages],
+                [message.content for message in messages],
+                [message.timestamp for message in messages],
+                [message.metadata if message.metadata is not _EMPTY_METADATA else None for message in messages]
+            )
@@ -0,0 +1,483 @@
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from array import array
+from itertools import accumulate
+import asyncio
+import glob
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+
+
+# Tipos de registro
+REC_MESSAGE = 1
+REC_CONTEXT = 2
+REC_CLEAR = 3
+# Conversación completa en formato columnar (solo en snapshots)
+REC_CONVERSATION = 4
+# Contexto con el momento (epoch) del último acceso; REC_CONTEXT queda para
+# leer logs anteriores, que no lo guardaban
+REC_CONTEXT_AT = 5
+# Eliminación del contexto de un cliente (desalojo)
+REC_CLEAR_CONTEXT = 6
+
+# Cada frame: largo del cuerpo + CRC32 del cuerpo, seguido del cuerpo
+_FRAME = struct.Struct("<II")
+# Mensaje: tipo, timestamp, largo de conversation_id, rol, contenido y metadatos
+_MESSAGE = struct.Struct("<BdHBII")
+# Contexto: tipo, largo de customer_id y del JSON con la actualización
+_CONTEXT = struct.Struct("<BHI")
+# Contexto con último acceso: tipo, timestamp, largo de customer_id y del JSON
+_CONTEXT_AT = struct.Struct("<BdHI")
+# Limpieza de conversación: tipo y largo de conversation_id
+_CLEAR = struct.Struct("<BH")
+# Conversación: tipo, largo de conversation_id, cantidad de mensajes, largo de la
+# tabla de roles, bytes de texto y largo del JSON de metadatos
+_CONVERSATION = struct.Struct("<BHIHII")
+
+_SNAPSHOT_MAGIC = b"LCMEM001"
+# Encabezado del snapshot: magic + generación del primer log posterior
+_SNAPSHOT_HEADER = struct.Struct("<8sQ")
+
+Record = Tuple[Any, ...]
+
+
+def encode_message(
+    conversation_id: str,
+    role: str,
+    content: str,
+    timestamp: float,
+    metadata: Optional[Dict[str, Any]]
+) -> bytes:
+    """Codifica un mensaje como frame del log"""
+    conv = conversation_id.encode("utf-8")
+    role_bytes = role.encode("utf-8")
+    text = content.encode("utf-8")
+    meta = json.dumps(metadata, ensure_ascii=False, default=str).encode("utf-8") if metadata else b""
+    body = b"".join((
+        _MESSAGE.pack(REC_MESSAGE, timestamp, len(conv), len(role_bytes), len(text), len(meta)),
+        conv, role_bytes, text, meta
+    ))
+    return _frame(body)
+
+
+def encode_context(customer_id: str, context: Dict[str, Any], timestamp: float) -> bytes:
+    """Codifica una actualización de contexto de cliente (y su último acceso) como frame del log"""
+    customer = customer_id.encode("utf-8")
+    data = json.dumps(context, ensure_ascii=False, default=str).encode("utf-8")
+    return _frame(_CONTEXT_AT.pack(REC_CONTEXT_AT, timestamp, len(customer), len(data)) + customer + data)
+
+
+def encode_clear_context(customer_id: str) -> bytes:
+    """Codifica la eliminación del contexto de un cliente como frame del log"""
+    customer = customer_id.encode("utf-8")
+    return _frame(_CLEAR.pack(REC_CLEAR_CONTEXT, len(customer)) + customer)
+
+
+def encode_clear(conversation_id: str) -> bytes:
+    """Codifica la eliminación de una conversación como frame del log"""
+    conv = conversation_id.encode("utf-8")
+    return _frame(_CLEAR.pack(REC_CLEAR, len(conv)) + conv)
+
+
+def encode_conversation(
+    conversation_id: str,
+    roles: Sequence[str],
+    contents: Sequence[str],
+    timestamps: Sequence[float],
+    metadatas: Sequence[Optional[Dict[str, Any]]]
+) -> bytes:
+    """
+    Codifica una conversación completa en un único frame columnar.
+    
+    Los contenidos van concatenados en un solo bloque UTF-8 junto con sus
+    largos en caracteres, así al recuperar se decodifica el bloque una vez y
+    cada mensaje es un slice.
+    """
+    conv = conversation_id.encode("utf-8")
+    role_table = sorted(set(roles))
+    role_codes = {role: index for index, role in enumerate(role_table)}
+    role_bytes = "\n".join(role_table).encode("utf-8")
+    
+    stamps = array("d", timestamps)
+    lengths = array("I", map(len, contents))
+    if sys.byteorder == "big":
+        stamps.byteswap()
+        lengths.byteswap()
+    
+    text = "".join(contents).encode("utf-8")
+    extra = {str(index): metadata for index, metadata in enumerate(metadatas) if metadata}
+    meta = json.dumps(extra, ensure_ascii=False, default=str).encode("utf-8") if extra else b""
+    
+    body = b"".join((
+        _CONVERSATION.pack(REC_CONVERSATION, len(conv), len(contents), len(role_bytes), len(text), len(meta)),
+        conv, role_bytes, bytes(role_codes[role] for role in roles),
+        stamps.tobytes(), lengths.tobytes(), text, meta
+    ))
+    return _frame(body)
+
+
+def _decode_conversation(view: memoryview, start: int) -> Record:
+    """Decodifica un frame REC_CONVERSATION (ver encode_conversation)"""
+    _, conv_len, count, roles_len, text_len, meta_len = _CONVERSATION.unpack_from(view, start)
+    pos = start + _CONVERSATION.size
+    conv = str(view[pos:pos + conv_len], "utf-8")
+    pos += conv_len
+    role_table = [sys.intern(role) for role in str(view[pos:pos + roles_len], "utf-8").split("\n")]
+    pos += roles_len
+    roles = list(map(role_table.__getitem__, view[pos:pos + count]))
+    pos += count
+    
+    stamps = array("d")
+    stamps.frombytes(view[pos:pos + 8 * count])
+    pos += 8 * count
+    lengths = array("I")
+    lengths.frombytes(view[pos:pos + 4 * count])
+    pos += 4 * count
+    if sys.byteorder == "big":
+        stamps.byteswap()
+        lengths.byteswap()
+    
+    text = str(view[pos:pos + text_len], "utf-8")
+    pos += text_len
+    ends = list(accumulate(lengths))
+    contents = list(map(text.__getitem__, map(slice, [0] + ends[:-1], ends)))
+    
+    metadatas: List[Optional[Dict[str, Any]]] = [None] * count
+    if meta_len:
+        for index, metadata in json.loads(str(view[pos:pos + meta_len], "utf-8")).items():
+            metadatas[int(index)] = metadata
+    
+    return (REC_CONVERSATION, conv, roles, contents, stamps, metadatas)
+
+
+def _frame(body: bytes) -> bytes:
+    return _FRAME.pack(len(body), zlib.crc32(body)) + body
+
+
+def decode_frames(buffer, offset: int = 0) -> Iterator[Tuple[int, Record]]:
+    """
+    Decodifica frames consecutivos de un buffer (bytes o mmap).
+    
+    Se detiene en el primer frame incompleto o con CRC inválido, que solo
+    puede ser la cola de una escritura interrumpida.
+    
+    Args:
+        buffer: Contenido del archivo
+        offset: Posición del primer frame
+    
+    Yields:
+        Tuplas (posición siguiente al frame, registro decodificado)
+    """
+    view = memoryview(buffer)
+    end = len(buffer)
+    unpack_frame = _FRAME.unpack_from
+    unpack_message = _MESSAGE.unpack_from
+    header_size = _FRAME.size
+    message_size = _MESSAGE.size
+    
+    try:
+        while offset + header_size <= end:
+            length, crc = unpack_frame(buffer, offset)
+            start = offset + header_size
+            stop = start + length
+            if stop > end or zlib.crc32(view[start:stop]) != crc:
+                return
+            
+            kind = buffer[start]
+            if kind == REC_MESSAGE:
+                _, timestamp, conv_len, role_len, text_len, meta_len = unpack_message(buffer, start)
+                pos = start + message_size
+                conv = str(view[pos:pos + conv_len], "utf-8")
+                pos += conv_len
+                role = str(view[pos:pos + role_len], "utf-8")
+                pos += role_len
+                text = str(view[pos:pos + text_len], "utf-8")
+                pos += text_len
+                metadata = json.loads(str(view[pos:pos + meta_len], "utf-8")) if meta_len else None
+                yield stop, (REC_MESSAGE, conv, role, text, timestamp, metadata)
+            elif kind == REC_CONTEXT_AT:
+                _, timestamp, customer_len, data_len = _CONTEXT_AT.unpack_from(buffer, start)
+                pos = start + _CONTEXT_AT.size
+                customer = str(view[pos:pos + customer_len], "utf-8")
+                pos += customer_len
+                data = json.loads(str(view[pos:pos + data_len], "utf-8"))
+                yield stop, (REC_CONTEXT, customer, data, timestamp)
+            elif kind == REC_CONTEXT:
+                # Formato anterior, sin último acceso
+                _, customer_len, data_len = _CONTEXT.unpack_from(buffer, start)
+                pos = start + _CONTEXT.size
+                customer = str(view[pos:pos + customer_len], "utf-8")
+                pos += customer_len
+                yield stop, (REC_CONTEXT, customer, json.loads(str(view[pos:pos + data_len], "utf-8")), None)
+            elif kind == REC_CLEAR or kind == REC_CLEAR_CONTEXT:
+                _, key_len = _CLEAR.unpack_from(buffer, start)
+                pos = start + _CLEAR.size
+                yield stop, (kind, str(view[pos:pos + key_len], "utf-8"))
+            elif kind == REC_CONVERSATION:
+                yield stop, _decode_conversation(view, start)
+            
+            offset = stop
+    finally:
+        # Liberar el buffer para poder cerrar el mmap
+        view.release()
+
+
+class MemoryLog:
+    """
+    Log append-only de MemoryService con compactación a snapshot.
+    
+    Los registros se acumulan en memoria y un worker los escribe (y hace
+    fsync) fuera del event loop cada `flush_interval`, así el request nunca
+    espera al disco. Cuando el log supera `compact_bytes`, el estado vigente se
+    vuelca a un snapshot nuevo y los logs anteriores se borran.
+    
+    Archivos en `directory`:
+        memoria.snapshot      estado compactado (se lee con mmap)
+        memoria-<gen>.log     registros posteriores al snapshot
+    """
+    
+    def __init__(
+        self,
+        directory: str,
+        capture: Optional[Callable[[], Iterable[bytes]]] = None,
+        flush_interval: float = 1.0,
+        compact_bytes: int = 16 * 1024 * 1024
+    ):
+        self.directory = directory
+        self.capture = capture
+        self.flush_interval = flush_interval
+        self.compact_bytes = compact_bytes
+        self.snapshot_path = os.path.join(directory, "memoria.snapshot")
+        
+        self._generation = 0
+        self._log_bytes = 0
+        self._buffer: List[bytes] = []
+        self._file = None
+        self._file_lock = threading.Lock()
+        self._lock: Optional[asyncio.Lock] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._stats = {"flushes": 0, "compactions": 0, "recovered_records": 0, "errors": 0}
+    
+    def recover(self) -> Iterator[Record]:
+        """
+        Lee el snapshot (vía mmap) y reproduce solo la cola de logs posterior.
+        
+        Una cola truncada por un corte se descarta y el log se recorta al
+        último frame válido para poder seguir agregando.
+        
+        Yields:
+            Registros en el orden en que fueron escritos
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        count = 0
+        
+        if os.path.exists(self.snapshot_path) and os.path.getsize(self.snapshot_path) >= _SNAPSHOT_HEADER.size:
+            with open(self.snapshot_path, "rb") as snapshot:
+                with mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    magic, generation = _SNAPSHOT_HEADER.unpack_from(data, 0)
+                    if magic == _SNAPSHOT_MAGIC:
+                        self._generation = generation
+                        for _, record in decode_frames(data, _SNAPSHOT_HEADER.size):
+                            count += 1
+                            yield record
+        
+        for generation, path in self._log_files():
+            if generation < self._generation:
+                # Log ya incluido en el snapshot (quedó de una compactación interrumpida)
+                os.remove(path)
+                continue
+            
+            with open(path, "rb") as log:
+                data = log.read()
+            valid = 0
+            for valid, record in decode_frames(data):
+                count += 1
+                yield record
+            if valid < len(data):
+                with open(path, "r+b") as log:
+                    log.truncate(valid)
+            
+            self._generation = generation
+            self._log_bytes = valid
+        
+        self._stats["recovered_records"] = count
+    
+    def append(self, frame: bytes) -> None:
+        """
+        Agrega un frame al buffer; se escribe en el próximo flush.
+        
+        Args:
+            frame: Registro codificado (ver encode_message, encode_context, encode_clear, encode_clear_context)
+        """
+        self._buffer.append(frame)
+        if self._worker is None:
+            self._ensure_started()
+    
+    async def start(self) -> None:
+        """Arranca el worker de escritura"""
+        self._ensure_started()
+    
+    async def flush(self) -> None:
+        """Escribe y fuerza a disco los registros acumulados"""
+        self._ensure_lock()
+        async with self._lock:
+            chunks, self._buffer = self._buffer, []
+            if chunks:
+                await asyncio.to_thread(self._write, self._generation, chunks)
+        
+        if self._log_bytes >= self.compact_bytes and self.capture is not None:
+            await self.compact()
+    
+    async def compact(self) -> None:
+        """
+        Vuelca el estado actual a un snapshot nuevo y descarta los logs previos.
+        
+        El estado se captura en el event loop en el mismo paso en que se
+        cambia de generación: lo anterior queda en el snapshot y lo posterior
+        en el log nuevo. La codificación y escritura corren en un thread.
+        """
+        if self.capture is None:
+            return
+        
+        self._ensure_lock()
+        async with self._lock:
+            # Primero la captura: si falla, el buffer y la generación quedan intactos
+            frames = self.capture()
+            chunks, self._buffer = self._buffer, []
+            previous = self._generation
+            self._generation += 1
+            await asyncio.to_thread(self._write_snapshot, previous, chunks, frames, self._generation)
+            self._log_bytes = 0
+            self._stats["compactions"] += 1
+    
+    async def close(self) -> None:
+        """Detiene el worker y escribe lo pendiente"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        
+        await self.flush()
+        with self._file_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene contadores del log.
+        
+        Returns:
+            Diccionario con generación, bytes del log, flushes, compactaciones y errores
+        """
+        return {
+            **self._stats,
+            "generation": self._generation,
+            "log_bytes": self._log_bytes,
+            "buffered_records": len(self._buffer)
+        }
+    
+    def _ensure_lock(self) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+    
+    def _ensure_started(self) -> None:
+        """Crea el worker en el loop en ejecución (si hay uno)"""
+        if self._worker is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Sin loop (por ejemplo durante la recuperación): se arranca en el próximo append
+            return
+        self._ensure_lock()
+        self._worker = loop.create_task(self._run())
+    
+    async def _run(self) -> None:
+        """Worker: flush periódico fuera del camino del request"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                # Disco, serialización o compactación: los registros del lote
+                # fallido se pierden, pero el worker y el servidor siguen
+                self._stats["errors"] += 1
+                print(f"⚠️ Error escribiendo log de memoria: {type(e).__name__}: {e}")
+    
+    def _log_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"memoria-{generation:08d}.log")
+    
+    def _log_files(self) -> List[Tuple[int, str]]:
+        files = []
+        for path in glob.glob(os.path.join(self.directory, "memoria-*.log")):
+            name = os.path.basename(path)
+            try:
+                files.append((int(name[len("memoria-"):-len(".log")]), path))
+            except ValueError:
+                continue
+        return sorted(files)
+    
+    def _write(self, generation: int, chunks: List[bytes]) -> None:
+        """Agrega frames al log de la generación indicada y hace fsync"""
+        data = b"".join(chunks)
+        with self._file_lock:
+            if self._file is None or self._file.name != self._log_path(generation):
+                if self._file is not None:
+                    self._file.close()
+                os.makedirs(self.directory, exist_ok=True)
+                self._file = open(self._log_path(generation), "ab")
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._log_bytes += len(data)
+        self._stats["flushes"] += 1
+    
+    def _write_snapshot(
+        self,
+        previous: int,
+        chunks: List[bytes],
+        frames: Iterable[bytes],
+        generation: int
+    ) -> None:
+        """Cierra el log anterior, escribe el snapshot de forma atómica y borra logs viejos"""
+        if chunks:
+            self._write(previous, chunks)
+        
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "wb") as snapshot:
+            snapshot.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, generation))
+            batch: List[bytes] = []
+            for frame in frames:
+                batch.append(frame)
+                if len(batch) >= 4096:
+                    snapshot.write(b"".join(batch))
+                    batch = []
+            snapshot.write(b"".join(batch))
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self._fsync_directory()
+        
+        with self._file_lock:
+            if self._file is not None and self._file.name != self._log_path(generation):
+                self._file.close()
+                self._file = None
+        for log_generation, path in self._log_files():
+            if log_generation < generation:
+                os.remove(path)
+    
+    def _fsync_directory(self) -> None:
+        """Hace durable el rename del snapshot"""
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
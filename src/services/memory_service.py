@@ -1,15 +1,35 @@
 from typing import Dict, List, Optional, Any
-from datetime import datetime
+import time
+from .memory_backends import MemoryBackend, InProcessMemoryBackend
+from .metrics import timed
+from ..config.settings import settings
 
 
 class MemoryService:
     """Servicio para gestión de memoria de conversaciones"""
     
-    def __init__(self):
-        # En producción, esto podría ser Redis, MongoDB, etc.
-        self.conversations: Dict[str, List[Dict[str, Any]]] = {}
-        self.customer_context: Dict[str, Dict[str, Any]] = {}
+    def __init__(
+        self,
+        max_conversations: Optional[int] = None,
+        max_messages: Optional[int] = None,
+        idle_ttl_seconds: Optional[float] = None,
+        memory_budget_bytes: Optional[int] = None,
+        data_dir: Optional[str] = None,
+        backend: Optional[MemoryBackend] = None,
+        clock=time.monotonic
+    ):
+        # Por defecto la memoria vive en el proceso; con varias réplicas se usa
+        # un backend compartido (ver create_memory_backend)
+        self.backend = backend or InProcessMemoryBackend(
+            max_conversations=max_conversations or settings.memory_max_conversations,
+            max_messages=max_messages or settings.memory_max_messages,
+            idle_ttl_seconds=idle_ttl_seconds or settings.memory_idle_ttl_seconds,
+            memory_budget_bytes=memory_budget_bytes or settings.memory_budget_bytes,
+            data_dir=data_dir,
+            clock=clock
+        )
     
+    @timed("memory")
     async def get_conversation_history(
         self,
         conversation_id: str,
@@ -21,17 +41,13 @@ class MemoryService:
         Args:
             conversation_id: ID de la conversación
             limit: Número máximo de mensajes a retornar
-            
+        
         Returns:
             Lista de mensajes de la conversación
         """
-        history = self.conversations.get(conversation_id, [])
-        
-        if limit:
-            return history[-limit:]
-        
-        return history
+        return await self.backend.get_conversation_history(conversation_id, limit)
     
+    @timed("memory")
     async def add_message(
         self,
         conversation_id: str,
@@ -48,30 +64,49 @@ class MemoryService:
             content: Contenido del mensaje
             metadata: Metadatos adicionales
         """
-        if conversation_id not in self.conversations:
-            self.conversations[conversation_id] = []
+        await self.backend.add_message(conversation_id, role, content, metadata)
+    
+    @timed("memory")
+    async def add_message_with_context(
+        self,
+        conversation_id: str,
+        role: str,
+        content: str,
+        customer_id: str,
+        context: Dict[str, Any],
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Agrega un mensaje y actualiza el contexto del cliente en una sola operación.
         
-        message = {
-            "role": role,
-            "content": content,
-            "timestamp": datetime.now().isoformat(),
-            "metadata": metadata or {}
-        }
+        Con un backend remoto ambas escrituras viajan en un único round trip.
         
-        self.conversations[conversation_id].append(message)
+        Args:
+            conversation_id: ID de la conversación
+            role: Rol del mensaje (user, assistant, system)
+            content: Contenido del mensaje
+            customer_id: ID del cliente
+            context: Nuevo contexto o actualización
+            metadata: Metadatos adicionales
+        """
+        await self.backend.add_message_with_context(
+            conversation_id, role, content, customer_id, context, metadata
+        )
     
+    @timed("memory")
     async def get_customer_context(self, customer_id: str) -> Dict[str, Any]:
         """
         Obtiene contexto del cliente (preferencias, historial, etc.).
         
         Args:
             customer_id: ID del cliente
-            
+        
         Returns:
             Contexto del cliente
         """
-        return self.customer_context.get(customer_id, {})
+        return await self.backend.get_customer_context(customer_id)
     
+    @timed("memory")
     async def update_customer_context(
         self,
         customer_id: str,
@@ -84,24 +119,22 @@ class MemoryService:
             customer_id: ID del cliente
             context: Nuevo contexto o actualización
         """
-        if customer_id not in self.customer_context:
-            self.customer_context[customer_id] = {}
-        
-        self.customer_context[customer_id].update(context)
+        await self.backend.update_customer_context(customer_id, context)
     
+    @timed("memory")
     async def check_first_interaction(self, conversation_id: str) -> bool:
         """
         Verifica si es la primera interacción en una conversación.
         
         Args:
             conversation_id: ID de la conversación
-            
+        
         Returns:
             True si es la primera interacción
         """
-        history = await self.get_conversation_history(conversation_id)
-        return len(history) == 0
+        return await self.backend.check_first_interaction(conversation_id)
     
+    @timed("memory")
     async def clear_conversation(self, conversation_id: str) -> None:
         """
         Limpia el historial de una conversación.
@@ -109,6 +142,51 @@ class MemoryService:
         Args:
             conversation_id: ID de la conversación
         """
-        if conversation_id in self.conversations:
-            del self.conversations[conversation_id]
+        await self.backend.clear_conversation(conversation_id)
+    
+    async def start(self) -> None:
+        """Arranca las tareas en segundo plano del backend"""
+        await self.backend.start()
+    
+    async def close(self) -> None:
+        """Escribe lo pendiente y libera conexiones antes de apagar el servidor"""
+        await self.backend.close()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene contadores del backend de memoria.
+        
+        Returns:
+            Diccionario con el uso de memoria, desalojos o round trips según el backend
+        """
+        return self.backend.get_stats()
+
 
+def create_memory_backend() -> MemoryBackend:
+    """
+    Crea el backend configurado en `settings.memory_backend`.
+    
+    Returns:
+        InProcessMemoryBackend ("memory") o RedisMemoryBackend ("redis")
+    """
+    if settings.memory_backend == "redis":
+        from .redis_memory import RedisMemoryBackend
+        
+        return RedisMemoryBackend(
+            url=settings.redis_url,
+            max_messages=settings.memory_max_messages,
+            idle_ttl_seconds=settings.memory_idle_ttl_seconds
+        )
+    
+    if settings.memory_backend != "memory":
+        raise ValueError(
+            f"MEMORY_BACKEND no soportado: {settings.memory_backend}. Usar 'memory' o 'redis'"
+        )
+    
+    return InProcessMemoryBackend(
+        max_conversations=settings.memory_max_conversations,
+        max_messages=settings.memory_max_messages,
+        idle_ttl_seconds=settings.memory_idle_ttl_seconds,
+        memory_budget_bytes=settings.memory_budget_bytes,
+        data_dir=settings.data_dir if settings.memory_persistence else None
+    )
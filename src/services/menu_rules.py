@@ -0,0 +1,320 @@
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+from datetime import date as _date
+from functools import lru_cache
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+MINUTES_PER_DAY = 24 * 60
+
+# Códigos de resultado guardados en cada celda de la tabla
+RULE_OK = 0
+RULE_DAY = 1
+RULE_TIME = 2
+
+WEEKDAYS = ("lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo")
+_WEEKDAY_INDEX = {name: index for index, name in enumerate(WEEKDAYS)}
+_WEEKDAY_INDEX.update({"miercoles": 2, "sabado": 5})
+
+
+@lru_cache(maxsize=4096)
+def parse_date(value: str) -> int:
+    """
+    Parser rápido de fechas YYYY-MM-DD.
+    
+    Args:
+        value: Fecha en formato YYYY-MM-DD
+    
+    Returns:
+        Día de la semana (0=lunes, 6=domingo)
+    """
+    if len(value) != 10 or value[4] != "-" or value[7] != "-":
+        raise ValueError(f"Fecha inválida: {value}. Formato esperado YYYY-MM-DD")
+    return _date(int(value[0:4]), int(value[5:7]), int(value[8:10])).weekday()
+
+
+def parse_time(value: str) -> int:
+    """
+    Parser rápido de horas HH:MM (acepta también H:MM).
+    
+    Args:
+        value: Hora en formato HH:MM
+    
+    Returns:
+        Minutos desde medianoche
+    """
+    separator = len(value) - 3
+    if separator not in (1, 2) or value[separator] != ":":
+        raise ValueError(f"Hora inválida: {value}. Formato esperado HH:MM")
+    
+    hours = int(value[:separator])
+    minutes = int(value[separator + 1:])
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"Hora inválida: {value}. Formato esperado HH:MM")
+    return hours * 60 + minutes
+
+
+_TRUE_VALUES = frozenset(("true", "1", "si", "sí", "yes", "s", "y"))
+_FALSE_VALUES = frozenset(("false", "0", "no", "n", ""))
+
+
+def parse_bool(value: Any) -> bool:
+    """
+    Parser estricto de booleanos que llegan como texto desde un tool ("false" no es True).
+    
+    Args:
+        value: bool, None, 0/1 o texto (true/false, sí/no, 1/0)
+    
+    Returns:
+        Valor booleano (None = False)
+    """
+    if value is None or isinstance(value, bool):
+        return bool(value)
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in _TRUE_VALUES:
+            return True
+        if text in _FALSE_VALUES:
+            return False
+    raise ValueError(f"Valor booleano inválido: {value!r}. Se esperaba true/false")
+
+
+def normalize_menu(tipo_menu: str) -> str:
+    """
+    Normaliza el tipo de menú como lo interpreta create_reservation.
+    
+    Args:
+        tipo_menu: Texto libre del tipo de menú ("Menú Ejecutivo", "manso", ...)
+    
+    Returns:
+        "ejecutivo", "manso" o "carta"
+    """
+    tipo_menu = tipo_menu.lower()
+    if "ejecutivo" in tipo_menu:
+        return "ejecutivo"
+    if "manso" in tipo_menu:
+        return "manso"
+    return "carta"
+
+
+class MenuRuleTable:
+    """
+    Reglas de un menú compiladas a una tabla de 7 x 1440 celdas.
+    
+    Cada celda (día de la semana, minuto del día) guarda el código de
+    resultado: RULE_OK, RULE_DAY (día no permitido) o RULE_TIME (fuera de
+    horario). Validar es un único acceso a la tabla. Algunos días pueden
+    tener franjas propias (por ejemplo, cena hasta las 00:00 el viernes).
+    """
+    
+    __slots__ = ("name", "days", "windows", "day_windows", "table", "_days_text", "_hours_text")
+    
+    def __init__(
+        self,
+        name: str,
+        days: Tuple[int, ...],
+        windows: Tuple[Tuple[int, int], ...],
+        day_windows: Optional[Dict[int, Tuple[Tuple[int, int], ...]]] = None
+    ):
+        self.name = name
+        self.days = days
+        self.windows = windows
+        self.day_windows = day_windows or {}
+        self.table = bytearray([RULE_DAY]) * (7 * MINUTES_PER_DAY)
+        
+        for weekday in days:
+            base = weekday * MINUTES_PER_DAY
+            self.table[base:base + MINUTES_PER_DAY] = bytes([RULE_TIME]) * MINUTES_PER_DAY
+            for start, end in self.day_windows.get(weekday, windows):
+                # Los horarios son inclusivos en ambos extremos (12:30 a 16:30 incluye 16:30);
+                # una franja hasta medianoche (fin = MINUTES_PER_DAY) llega hasta las 23:59
+                stop = min(end + 1, MINUTES_PER_DAY)
+                self.table[base + start:base + stop] = bytes(stop - start)
+        
+        self._days_text = self._build_days_text()
+        self._hours_text = _describe_windows(windows)
+        # Días con franjas propias, agrupados: "(viernes y sábado de ... a 00:00hs)"
+        special: Dict[Tuple[Tuple[int, int], ...], List[str]] = {}
+        for weekday in days:
+            if self.day_windows.get(weekday, windows) != windows:
+                special.setdefault(self.day_windows[weekday], []).append(WEEKDAYS[weekday])
+        for day_windows, names in special.items():
+            self._hours_text += f" ({' y '.join(names)} {_describe_windows(day_windows)})"
+    
+    def check(self, weekday: int, minute: int) -> int:
+        """
+        Evalúa un día y minuto contra la tabla.
+        
+        Args:
+            weekday: Día de la semana (0=lunes)
+            minute: Minutos desde medianoche
+        
+        Returns:
+            Código RULE_OK, RULE_DAY o RULE_TIME
+        """
+        return self.table[weekday * MINUTES_PER_DAY + minute]
+    
+    def windows_for(self, weekday: int) -> Tuple[Tuple[int, int], ...]:
+        """
+        Franjas (inicio, fin) en minutos habilitadas un día de la semana.
+        
+        Args:
+            weekday: Día de la semana (0=lunes)
+        
+        Returns:
+            Franjas del día (vacío si el día no está habilitado). Un fin igual
+            a MINUTES_PER_DAY indica cierre a medianoche
+        """
+        if weekday not in self.days:
+            return ()
+        return self.day_windows.get(weekday, self.windows)
+    
+    def describe_days(self) -> str:
+        """Texto de los días habilitados (por ejemplo, de lunes a viernes)"""
+        return self._days_text
+    
+    def describe_hours(self) -> str:
+        """Texto de los horarios habilitados (por ejemplo, de 12:30 a 16:30hs)"""
+        return self._hours_text
+    
+    def _build_days_text(self) -> str:
+        names = [WEEKDAYS[day] for day in self.days]
+        if not names:
+            return "ningún día"
+        if list(self.days) == list(range(self.days[0], self.days[-1] + 1)) and len(names) > 1:
+            return f"de {names[0]} a {names[-1]}"
+        if len(names) == 1:
+            return f"los {names[0]}"
+        return "los " + ", ".join(names[:-1]) + f" y {names[-1]}"
+
+
+class CompiledMenuRules:
+    """Tablas de reglas de todos los menús, compiladas una vez al arrancar"""
+    
+    def __init__(self, tables: Dict[str, MenuRuleTable]):
+        self.tables = tables
+        self.menu_index = {name: index for index, name in enumerate(tables)}
+        self._matrix: Optional["np.ndarray"] = None
+    
+    @property
+    def matrix(self) -> "np.ndarray":
+        """
+        Todas las tablas apiladas en una matriz (menús x 7*1440) para evaluar lotes.
+        
+        Se arma en el primer lote: numpy se importa recién ahí y no demora el arranque.
+        """
+        if self._matrix is None:
+            import numpy as np
+            self._matrix = np.stack([
+                np.frombuffer(bytes(table.table), dtype=np.uint8) for table in self.tables.values()
+            ]) if self.tables else np.zeros((0, 7 * MINUTES_PER_DAY), dtype=np.uint8)
+        return self._matrix
+    
+    def __getitem__(self, menu: str) -> MenuRuleTable:
+        return self.tables[menu]
+    
+    def __contains__(self, menu: str) -> bool:
+        return menu in self.tables
+    
+    def check(self, menu: str, date: str, time: str) -> int:
+        """
+        Valida una fecha y hora contra las reglas de un menú.
+        
+        Args:
+            menu: Nombre del menú (ejecutivo, manso)
+            date: Fecha en formato YYYY-MM-DD
+            time: Hora en formato HH:MM
+        
+        Returns:
+            Código RULE_OK, RULE_DAY o RULE_TIME
+        """
+        return self.tables[menu].check(parse_date(date), parse_time(time))
+    
+    def check_many(
+        self,
+        menu_indexes: Sequence[int],
+        weekdays: Sequence[int],
+        minutes: Sequence[int]
+    ) -> "np.ndarray":
+        """
+        Evalúa muchos candidatos en una sola operación vectorizada.
+        
+        Args:
+            menu_indexes: Índice de menú de cada candidato (ver `menu_index`)
+            weekdays: Día de la semana de cada candidato (0=lunes)
+            minutes: Minutos desde medianoche de cada candidato
+        
+        Returns:
+            Array con el código RULE_* de cada candidato
+        """
+        import numpy as np
+        
+        rows = np.asarray(menu_indexes, dtype=np.intp)
+        offsets = np.asarray(weekdays, dtype=np.intp) * MINUTES_PER_DAY + np.asarray(minutes, dtype=np.intp)
+        return self.matrix[rows, offsets]
+
+
+def compile_menu_rules(business_hours: Dict[str, Any]) -> CompiledMenuRules:
+    """
+    Compila `settings.business_hours` a tablas de búsqueda por menú.
+    
+    Acepta tanto un único horario (`hora_inicio`/`hora_fin`) como varias
+    franjas con nombre (`horarios`: {"almuerzo": {"inicio", "fin"}, ...}).
+    `horarios_por_dia` reemplaza franjas con nombre en días puntuales
+    ({"viernes": {"cena": {"inicio", "fin"}}}). Las claves `menu_<nombre>`
+    se publican como `<nombre>`.
+    
+    Args:
+        business_hours: Diccionario de horarios de negocio
+    
+    Returns:
+        Reglas compiladas por menú
+    """
+    tables = {}
+    for key, rules in business_hours.items():
+        name = key[len("menu_"):] if key.startswith("menu_") else key
+        days = tuple(sorted({_WEEKDAY_INDEX[day.lower()] for day in rules.get("dias", [])}))
+        day_windows = {
+            _WEEKDAY_INDEX[day.lower()]: _compile_windows(rules, overrides)
+            for day, overrides in rules.get("horarios_por_dia", {}).items()
+        }
+        tables[name] = MenuRuleTable(name, days, _compile_windows(rules), day_windows)
+    return CompiledMenuRules(tables)
+
+
+def _compile_windows(
+    rules: Dict[str, Any],
+    overrides: Optional[Dict[str, Any]] = None
+) -> Tuple[Tuple[int, int], ...]:
+    """Extrae las franjas (inicio, fin) en minutos de la configuración de un menú"""
+    raw: List[Tuple[str, str]] = []
+    if "hora_inicio" in rules:
+        raw.append((rules["hora_inicio"], rules["hora_fin"]))
+    for window in {**rules.get("horarios", {}), **(overrides or {})}.values():
+        raw.append((window["inicio"], window["fin"]))
+    
+    windows = []
+    for start, end in raw:
+        start_minute, end_minute = parse_time(start), parse_time(end)
+        if end_minute <= start_minute:
+            # Franja que termina a medianoche (por ejemplo 20:00 a 00:00)
+            end_minute = MINUTES_PER_DAY
+        windows.append((start_minute, end_minute))
+    return tuple(sorted(windows))
+
+
+def _describe_windows(windows: Tuple[Tuple[int, int], ...]) -> str:
+    return " y ".join(
+        f"de {_format_minutes(start)} a {_format_minutes(end)}hs"
+        for start, end in windows
+    )
+
+
+def _format_minutes(minutes: int) -> str:
+    if minutes == MINUTES_PER_DAY:
+        # Fin de una franja que cierra a medianoche
+        return "00:00"
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
@@ -0,0 +1,259 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import heapq
+import math
+import re
+import unicodedata
+
+
+# Palabras que no aportan a la búsqueda
+STOPWORDS = frozenset((
+    "a", "al", "con", "de", "del", "el", "en", "la", "las", "lo", "los",
+    "para", "por", "sin", "su", "un", "una", "unos", "unas", "y", "o"
+))
+
+# Peso de cada campo de un plato en el ranking
+NAME_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+SECTION_WEIGHT = 0.5
+
+# Términos con los que los clientes nombran cada sección
+SECTION_ALIASES: Dict[str, str] = {
+    "entradas": "entrada",
+    "principales": "principal plato carne",
+    "postres": "postre dulce",
+    "bebidas": "bebida vino cerveza gaseosa agua trago"
+}
+
+# Puntaje extra por cada término de la consulta presente en el plato: mayor
+# que cualquier suma de pesos, así primero van los platos que tienen todos
+MATCH_BONUS = 1000.0
+
+# Similitud mínima (Jaccard de trigramas) para aceptar un término con errores de tipeo
+MIN_TRIGRAM_SIMILARITY = 0.45
+# Largo mínimo para buscar por prefijo o por trigramas
+MIN_FUZZY_LENGTH = 3
+
+# Consultas recordadas por índice (las mismas preguntas se repiten mucho)
+QUERY_CACHE_SIZE = 1024
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """
+    Pasa un texto a minúsculas sin acentos ni signos ("Bife de Chorizo ½" -> "bife de chorizo 1 2").
+    
+    Args:
+        text: Texto original
+    
+    Returns:
+        Texto normalizado, palabras separadas por un espacio
+    """
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    folded = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_ALNUM.sub(" ", folded).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Términos de búsqueda de un texto: normalizados, sin stopwords y en singular.
+    
+    Args:
+        text: Texto original
+    
+    Returns:
+        Lista de términos (en orden, con repetidos)
+    """
+    return [_stem(word) for word in normalize(text).split() if word not in STOPWORDS]
+
+
+def _stem(word: str) -> str:
+    """Singular aproximado: "vinos" -> "vino", "bifes" -> "bife" (igual para índice y consulta)"""
+    if len(word) > 3 and word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def _trigrams(term: str) -> frozenset:
+    """Trigramas de un término, con bordes marcados para favorecer inicios y finales"""
+    padded = f" {term} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class MenuIndex:
+    """
+    Índice invertido del menú, construido una vez por snapshot.
+    
+    Cada plato se indexa por los términos de su nombre, descripción y sección
+    (normalizados, sin acentos y en singular) con peso por campo e IDF. Los
+    términos de la consulta que no están en el vocabulario se expanden por
+    prefijo ("chori" -> "chorizo") o por trigramas ("chorrizo" -> "chorizo").
+    Las consultas ya resueltas se recuerdan, así una pregunta repetida cuesta
+    un lookup en un diccionario.
+    """
+    
+    def __init__(self, menu_details: Dict[str, Any], menu_prices: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            menu_details: Platos por sección, como en RestaurantSnapshot.menu_details
+            menu_prices: Precios por tipo de menú, para resolver nombres de menú
+        """
+        self._dishes: List[Dict[str, Any]] = []
+        postings: Dict[str, Dict[int, float]] = {}
+        
+        for section, items in menu_details.items():
+            section_terms = tokenize(f"{section} {SECTION_ALIASES.get(section, '')}")
+            for item in items or ():
+                dish_id = len(self._dishes)
+                self._dishes.append({**item, "seccion": section})
+                fields = (
+                    (tokenize(str(item.get("nombre", ""))), NAME_WEIGHT),
+                    (tokenize(str(item.get("descripcion", ""))), DESCRIPTION_WEIGHT),
+                    (section_terms, SECTION_WEIGHT)
+                )
+                for terms, weight in fields:
+                    for term in terms:
+                        dish_postings = postings.setdefault(term, {})
+                        # Un término cuenta con el peso de su mejor campo
+                        if dish_postings.get(dish_id, 0.0) < weight:
+                            dish_postings[dish_id] = weight
+        
+        # IDF: los términos raros (ej. "malbec") pesan más que los comunes (ej. "bebida")
+        total = len(self._dishes)
+        self._postings: Dict[str, Tuple[Tuple[int, float], ...]] = {
+            term: tuple(
+                (dish_id, weight * math.log(1 + total / len(dish_postings)))
+                for dish_id, weight in dish_postings.items()
+            )
+            for term, dish_postings in postings.items()
+        }
+        
+        self._grams: Dict[str, List[str]] = {}
+        for term in self._postings:
+            if len(term) >= MIN_FUZZY_LENGTH:
+                for gram in _trigrams(term):
+                    self._grams.setdefault(gram, []).append(term)
+        
+        # Término -> menús que lo usan ("menu" aparece en "menú ejecutivo" y "menú manso")
+        self._menu_types: Dict[str, Tuple[str, ...]] = {}
+        for menu_type in (menu_prices or {}):
+            for term in dict.fromkeys(tokenize(menu_type)):
+                self._menu_types[term] = self._menu_types.get(term, ()) + (menu_type,)
+        
+        self._expansions: Dict[str, Tuple[Tuple[str, float], ...]] = {}
+        self._queries: Dict[Tuple[str, int], Tuple[Dict[str, Any], ...]] = {}
+    
+    def __len__(self) -> int:
+        return len(self._dishes)
+    
+    def search(self, query: str, limit: int = 5) -> Tuple[Dict[str, Any], ...]:
+        """
+        Busca platos por nombre, descripción o sección.
+        
+        Los platos que contienen todos los términos de la consulta van primero;
+        dentro de cada grupo se ordenan por puntaje (campo, rareza del término
+        y similitud).
+        
+        Args:
+            query: Texto libre ("bife de chorizo", "vinos malbec")
+            limit: Máximo de platos a devolver
+        
+        Returns:
+            Platos encontrados (con su sección), del más al menos relevante.
+            Son compartidos con el índice: NO deben mutarse.
+        """
+        key = (query, limit)
+        cached = self._queries.get(key)
+        if cached is not None:
+            return cached
+        
+        terms = list(dict.fromkeys(tokenize(query)))
+        # Puntaje = cantidad de términos de la consulta que contiene el plato
+        # (domina) + suma de pesos; así un solo número ordena ambos criterios
+        scores: Dict[int, float] = {}
+        for term in terms:
+            expansions = self._expand(term)
+            if len(expansions) == 1 and expansions[0][1] == 1.0:
+                postings: Iterable[Tuple[int, float]] = self._postings[expansions[0][0]]
+            else:
+                # Varios términos parecidos: cada plato cuenta con el mejor
+                best: Dict[int, float] = {}
+                for candidate, similarity in expansions:
+                    for dish_id, weight in self._postings[candidate]:
+                        score = weight * similarity
+                        if score > best.get(dish_id, 0.0):
+                            best[dish_id] = score
+                postings = best.items()
+            for dish_id, score in postings:
+                scores[dish_id] = scores.get(dish_id, 0.0) + MATCH_BONUS + score
+        
+        ranked = heapq.nsmallest(limit, scores.items(), key=lambda entry: (-entry[1], entry[0]))
+        results = tuple(self._dishes[dish_id] for dish_id, _ in ranked)
+        
+        if len(self._queries) >= QUERY_CACHE_SIZE:
+            self._queries.clear()
+        self._queries[key] = results
+        return results
+    
+    def match_menu_type(self, text: str) -> Optional[str]:
+        """
+        Resuelve el tipo de menú que nombra un texto ("Menú Ejecutivo" -> "ejecutivo").
+        
+        Cada término del texto suma a los menús que lo contienen, repartido
+        entre ellos: un término compartido ("menú") pesa menos que uno propio
+        ("manso"). Los términos sin coincidencia exacta se prueban por prefijo.
+        
+        Args:
+            text: Texto libre del cliente
+        
+        Returns:
+            Clave de menu_prices, o None si no nombra ningún menú o si el
+            texto es ambiguo (empate entre menús)
+        """
+        scores: Dict[str, float] = {}
+        for term in dict.fromkeys(tokenize(text)):
+            menu_types = self._menu_types.get(term)
+            if menu_types is None and len(term) >= MIN_FUZZY_LENGTH:
+                menu_types = tuple(dict.fromkeys(
+                    menu_type
+                    for known, candidates in self._menu_types.items()
+                    if known.startswith(term) or term.startswith(known)
+                    for menu_type in candidates
+                ))
+            for menu_type in menu_types or ():
+                scores[menu_type] = scores.get(menu_type, 0.0) + 1.0 / len(menu_types)
+        
+        if not scores:
+            return None
+        best = max(scores.values())
+        winners = [menu_type for menu_type, score in scores.items() if score == best]
+        return winners[0] if len(winners) == 1 else None
+    
+    def _expand(self, term: str) -> Tuple[Tuple[str, float], ...]:
+        """Términos del vocabulario que corresponden a un término de la consulta, con su similitud"""
+        expansions = self._expansions.get(term)
+        if expansions is None:
+            # Acotado como _queries: los términos con errores de tipeo no tienen fin
+            if len(self._expansions) >= QUERY_CACHE_SIZE:
+                self._expansions.clear()
+            expansions = self._expansions[term] = tuple(self._similar_terms(term))
+        return expansions
+    
+    def _similar_terms(self, term: str) -> Iterable[Tuple[str, float]]:
+        if term in self._postings:
+            yield term, 1.0
+            return
+        if len(term) < MIN_FUZZY_LENGTH:
+            return
+        
+        grams = _trigrams(term)
+        candidates = {candidate for gram in grams for candidate in self._grams.get(gram, ())}
+        for candidate in candidates:
+            if candidate.startswith(term):
+                # Palabra a medio escribir: cuanto más completa, más parecida
+                yield candidate, 0.5 + 0.5 * len(term) / len(candidate)
+                continue
+            candidate_grams = _trigrams(candidate)
+            similarity = len(grams & candidate_grams) / len(grams | candidate_grams)
+            if similarity >= MIN_TRIGRAM_SIMILARITY:
+                yield candidate, similarity
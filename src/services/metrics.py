@@ -0,0 +1,506 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import functools
+import inspect
+import json
+import time
+
+
+# Histograma log-lineal estilo HDR: cada potencia de 2 se divide en 32
+# sub-buckets, así el error relativo de cualquier percentil es < 3.2%
+# sin importar la magnitud (de microsegundos a horas)
+SUB_BUCKET_BITS = 5
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+MAX_VALUE = (1 << 36) - 1
+
+# Límites (µs) de los buckets exportados a Prometheus: 64µs ... ~33s
+PROMETHEUS_LATENCY_BOUNDS = tuple(1 << k for k in range(6, 26))
+
+# El tamaño de las respuestas se mide 1 de cada N llamadas (serializar cuesta
+# bastante más que el resto de la instrumentación)
+PAYLOAD_SAMPLE_EVERY = 16
+
+METRIC_PREFIX = "lacabrera"
+
+
+def _bucket_index(value: int) -> int:
+    """Índice del bucket de un valor (entero no negativo)"""
+    if value < 2 * SUB_BUCKET_COUNT:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return shift * SUB_BUCKET_COUNT + (value >> shift)
+
+
+def _bucket_upper(index: int) -> int:
+    """Mayor valor que cae en el bucket `index`"""
+    if index < 2 * SUB_BUCKET_COUNT:
+        return index
+    shift = index // SUB_BUCKET_COUNT - 1
+    mantissa = index - shift * SUB_BUCKET_COUNT
+    return ((mantissa + 1) << shift) - 1
+
+
+BUCKET_COUNT = _bucket_index(MAX_VALUE) + 1
+
+
+class Histogram:
+    """
+    Histograma de valores enteros (µs o bytes) con precisión relativa fija.
+    
+    Registrar un valor es O(1) y no reserva memoria: un bit_length y un
+    incremento en una lista de tamaño fijo.
+    """
+    
+    __slots__ = ("counts", "count", "total", "max")
+    
+    def __init__(self):
+        self.counts: List[int] = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0
+        self.max = 0
+    
+    def record(self, value: int) -> None:
+        """
+        Registra un valor.
+        
+        Args:
+            value: Valor entero (se recorta a [0, MAX_VALUE])
+        """
+        if value < 0:
+            value = 0
+        elif value > MAX_VALUE:
+            value = MAX_VALUE
+        self.counts[_bucket_index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+    
+    def percentile(self, q: float) -> int:
+        """
+        Obtiene el percentil q (0-100).
+        
+        Args:
+            q: Percentil buscado
+        
+        Returns:
+            Mayor valor equivalente del bucket que contiene el percentil
+        """
+        if self.count == 0:
+            return 0
+        target = max(1, int(self.count * q / 100 + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(_bucket_upper(index), self.max)
+        return self.max
+    
+    def cumulative(self, bounds: Tuple[int, ...]) -> List[int]:
+        """
+        Cantidad de valores menores a cada límite (para buckets de Prometheus).
+        
+        Args:
+            bounds: Límites crecientes
+        
+        Returns:
+            Conteo acumulado por límite
+        """
+        result = []
+        seen = 0
+        start = 0
+        for bound in bounds:
+            end = _bucket_index(min(bound, MAX_VALUE))
+            seen += sum(self.counts[start:end])
+            start = end
+            result.append(seen)
+        return result
+    
+    def summary(self, scale: float = 1.0) -> Dict[str, float]:
+        """
+        Resumen del histograma.
+        
+        Args:
+            scale: Factor para convertir unidades (por ejemplo, µs a ms)
+        
+        Returns:
+            Diccionario con count, mean, p50, p90, p99 y max
+        """
+        mean = self.total / self.count if self.count else 0
+        return {
+            "count": self.count,
+            "mean": round(mean * scale, 3),
+            "p50": round(self.percentile(50) * scale, 3),
+            "p90": round(self.percentile(90) * scale, 3),
+            "p99": round(self.percentile(99) * scale, 3),
+            "max": round(self.max * scale, 3)
+        }
+
+
+class CallMetrics:
+    """Métricas de una operación: llamadas, errores, en curso, latencia y tamaño"""
+    
+    __slots__ = ("calls", "errors", "failures", "inflight", "latency", "payload")
+    
+    def __init__(self):
+        self.calls = 0
+        # Excepciones que escaparon de la operación
+        self.errors = 0
+        # Respuestas {"success": False} (los tools informan errores así)
+        self.failures = 0
+        self.inflight = 0
+        self.latency = Histogram()
+        self.payload = Histogram()
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Representación serializable (latencia en ms, tamaño en bytes)"""
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "failures": self.failures,
+            "inflight": self.inflight,
+            "latency_ms": self.latency.summary(scale=0.001),
+            "payload_bytes": self.payload.summary()
+        }
+
+
+class MetricsRegistry:
+    """
+    Registro de métricas del servidor.
+    
+    - Tools: `instrument_tool` envuelve cada tool registrado en el servidor MCP.
+    - Dependencias: `timed(component)` decora los métodos de Google Sheets,
+      calendario y memoria.
+    - Gauges: callbacks que devuelven los contadores de cada servicio
+      (`get_stats`) y se leen solo al exportar.
+    """
+    
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self.started_at = clock()
+        self._tools: Dict[str, CallMetrics] = {}
+        self._dependencies: Dict[Tuple[str, str], CallMetrics] = {}
+        self._gauges: Dict[str, Callable[[], Dict[str, Any]]] = {}
+    
+    def tool(self, name: str) -> CallMetrics:
+        """Métricas de un tool (se crean en el primer uso)"""
+        metrics = self._tools.get(name)
+        if metrics is None:
+            metrics = self._tools[name] = CallMetrics()
+        return metrics
+    
+    def dependency(self, component: str, operation: str) -> CallMetrics:
+        """Métricas de una operación sobre una dependencia (se crean en el primer uso)"""
+        key = (component, operation)
+        metrics = self._dependencies.get(key)
+        if metrics is None:
+            metrics = self._dependencies[key] = CallMetrics()
+        return metrics
+    
+    def instrument_tool(self, fn: Callable) -> Callable:
+        """
+        Envuelve un tool async con latencia, conteos, en curso y tamaño de respuesta.
+        
+        Args:
+            fn: Tool a instrumentar (conserva nombre, docstring y firma)
+        
+        Returns:
+            Tool instrumentado
+        """
+        return _instrument(fn, self.tool(fn.__name__), sample_payload=True)
+    
+    def timed(self, component: str) -> Callable[[Callable], Callable]:
+        """
+        Decorador para métodos de servicios (async o sync).
+        
+        Args:
+            component: Nombre de la dependencia (google_sheets, calendar, memory)
+        
+        Returns:
+            Decorador que registra la operación con el nombre del método
+        """
+        def decorator(fn: Callable) -> Callable:
+            operation = fn.__name__.lstrip("_")
+            return _instrument(fn, self.dependency(component, operation), sample_payload=False)
+        return decorator
+    
+    def register_gauges(self, name: str, callback: Callable[[], Dict[str, Any]]) -> None:
+        """
+        Registra un callback cuyos valores numéricos se exportan como gauges.
+        
+        Args:
+            name: Prefijo de los gauges (por ejemplo, "notifications")
+            callback: Función sin argumentos que devuelve un diccionario
+        """
+        self._gauges[name] = callback
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Obtiene todas las métricas.
+        
+        Returns:
+            Diccionario con uptime, tools, dependencias y gauges
+        """
+        dependencies: Dict[str, Dict[str, Any]] = {}
+        for (component, operation), metrics in sorted(self._dependencies.items()):
+            dependencies.setdefault(component, {})[operation] = metrics.to_dict()
+        
+        return {
+            "uptime_seconds": round(self._clock() - self.started_at, 1),
+            "tools": {name: metrics.to_dict() for name, metrics in sorted(self._tools.items())},
+            "dependencies": dependencies,
+            "gauges": {name: self._read_gauges(callback) for name, callback in sorted(self._gauges.items())}
+        }
+    
+    def render_prometheus(self) -> str:
+        """
+        Exporta las métricas en el formato de texto de Prometheus.
+        
+        Returns:
+            Texto listo para servir en /metrics
+        """
+        lines: List[str] = []
+        tools = [({"tool": name}, metrics) for name, metrics in sorted(self._tools.items())]
+        dependencies = [
+            ({"component": component, "operation": operation}, metrics)
+            for (component, operation), metrics in sorted(self._dependencies.items())
+        ]
+        
+        for kind, series in (("tool", tools), ("dependency", dependencies)):
+            name = f"{METRIC_PREFIX}_{kind}"
+            _render_counter(lines, f"{name}_calls_total", "Llamadas completadas", series, "calls")
+            _render_counter(lines, f"{name}_errors_total", "Llamadas que lanzaron una excepción", series, "errors")
+            _render_counter(lines, f"{name}_failures_total", "Respuestas con success=false", series, "failures")
+            lines.append(f"# HELP {name}_inflight Llamadas en curso")
+            lines.append(f"# TYPE {name}_inflight gauge")
+            for labels, metrics in series:
+                lines.append(f"{name}_inflight{_labels(labels)} {metrics.inflight}")
+            _render_histogram(lines, f"{name}_latency_seconds", "Latencia por llamada", series)
+        
+        lines.append(f"# HELP {METRIC_PREFIX}_tool_payload_bytes Tamaño de las respuestas (muestreado)")
+        lines.append(f"# TYPE {METRIC_PREFIX}_tool_payload_bytes summary")
+        for labels, metrics in tools:
+            payload = metrics.payload
+            for quantile in (50, 99):
+                quantile_labels = _labels({**labels, "quantile": str(quantile / 100)})
+                lines.append(f"{METRIC_PREFIX}_tool_payload_bytes{quantile_labels} {payload.percentile(quantile)}")
+            lines.append(f"{METRIC_PREFIX}_tool_payload_bytes_sum{_labels(labels)} {payload.total}")
+            lines.append(f"{METRIC_PREFIX}_tool_payload_bytes_count{_labels(labels)} {payload.count}")
+        
+        for gauge_name, callback in sorted(self._gauges.items()):
+            for key, value in sorted(self._read_gauges(callback).items()):
+                metric = f"{METRIC_PREFIX}_{gauge_name}_{key}"
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {value}")
+        
+        lines.append(f"# TYPE {METRIC_PREFIX}_uptime_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}_uptime_seconds {self._clock() - self.started_at:.1f}")
+        return "\n".join(lines) + "\n"
+    
+    @staticmethod
+    def _read_gauges(callback: Callable[[], Dict[str, Any]]) -> Dict[str, float]:
+        """Lee un callback de gauges y se queda con los valores numéricos"""
+        try:
+            values = callback()
+        except Exception:
+            return {}
+        return {
+            key: float(value)
+            for key, value in values.items()
+            if isinstance(value, (int, float))
+        }
+
+
+def _instrument(fn: Callable, metrics: CallMetrics, sample_payload: bool) -> Callable:
+    """Envuelve fn (async o sync) registrando sus métricas en `metrics`"""
+    perf_counter_ns = time.perf_counter_ns
+    record_latency = metrics.latency.record
+    
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            metrics.inflight += 1
+            start = perf_counter_ns()
+            try:
+                result = await fn(*args, **kwargs)
+            except BaseException:
+                metrics.errors += 1
+                raise
+            finally:
+                record_latency((perf_counter_ns() - start) // 1000)
+                metrics.inflight -= 1
+            _count_result(metrics, result, sample_payload)
+            return result
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            metrics.inflight += 1
+            start = perf_counter_ns()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                metrics.errors += 1
+                raise
+            finally:
+                record_latency((perf_counter_ns() - start) // 1000)
+                metrics.inflight -= 1
+            _count_result(metrics, result, sample_payload)
+            return result
+    
+    return wrapper
+
+
+def _count_result(metrics: CallMetrics, result: Any, sample_payload: bool) -> None:
+    """Cuenta la llamada, las respuestas fallidas y (muestreado) el tamaño"""
+    metrics.calls += 1
+    if type(result) is dict and result.get("success") is False:
+        metrics.failures += 1
+    if sample_payload and metrics.calls % PAYLOAD_SAMPLE_EVERY == 1:
+        try:
+            payload = result if isinstance(result, str) else json.dumps(result, ensure_ascii=False, default=str)
+            metrics.payload.record(len(payload.encode("utf-8")))
+        except (TypeError, ValueError):
+            pass
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    """Formatea labels de Prometheus"""
+    escaped = (
+        f'{key}="{value.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for key, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _render_counter(
+    lines: List[str],
+    name: str,
+    help_text: str,
+    series: List[Tuple[Dict[str, str], CallMetrics]],
+    attribute: str
+) -> None:
+    """Agrega un contador con una línea por serie"""
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} counter")
+    for labels, metrics in series:
+        lines.append(f"{name}{_labels(labels)} {getattr(metrics, attribute)}")
+
+
+def _render_histogram(
+    lines: List[str],
+    name: str,
+    help_text: str,
+    series: List[Tuple[Dict[str, str], CallMetrics]]
+) -> None:
+    """Agrega un histograma de latencia (µs internos, segundos exportados)"""
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, metrics in series:
+        latency = metrics.latency
+        for bound, count in zip(PROMETHEUS_LATENCY_BOUNDS, latency.cumulative(PROMETHEUS_LATENCY_BOUNDS)):
+            lines.append(f"{name}_bucket{_labels({**labels, 'le': f'{bound / 1e6:g}'})} {count}")
+        lines.append(f"{name}_bucket{_labels({**labels, 'le': '+Inf'})} {latency.count}")
+        lines.append(f"{name}_sum{_labels(labels)} {latency.total / 1e6:.6f}")
+        lines.append(f"{name}_count{_labels(labels)} {latency.count}")
+
+
+class EventLoopLagMonitor:
+    """
+    Mide el retraso del event loop: cuánto tarde despierta un sleep de `interval`.
+    
+    Un retraso alto indica trabajo bloqueante o de CPU en el loop, que demora a
+    todas las conversaciones a la vez.
+    """
+    
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.lag = Histogram()
+        self._task: Optional[asyncio.Task] = None
+    
+    async def start(self) -> None:
+        """Arranca la medición en segundo plano"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def close(self) -> None:
+        """Detiene la medición"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Obtiene el resumen del retraso medido.
+        
+        Returns:
+            Diccionario con count, mean, p50, p90, p99 y max en milisegundos
+        """
+        return self.lag.summary(scale=0.001)
+    
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lag.record(int((loop.time() - start - self.interval) * 1e6))
+
+
+class MetricsServer:
+    """Endpoint HTTP mínimo (asyncio) que sirve /metrics en formato Prometheus"""
+    
+    def __init__(self, registry: MetricsRegistry, host: str = "0.0.0.0", port: int = 9100):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+    
+    async def start(self) -> None:
+        """Empieza a escuchar (port=0 deshabilita el endpoint)"""
+        if self.port and self._server is None:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+    
+    async def close(self) -> None:
+        """Deja de escuchar"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Atiende una request: GET /metrics o 404"""
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # Descartar headers
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=5)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+            
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status = "200 OK"
+                body = self.registry.render_prometheus().encode("utf-8")
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            else:
+                status = "404 Not Found"
+                body = b"not found\n"
+                content_type = "text/plain; charset=utf-8"
+            
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+# Registro global de métricas del servidor
+metrics = MetricsRegistry()
+timed = metrics.timed
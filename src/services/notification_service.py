@@ -0,0 +1,551 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from datetime import datetime
+from email.message import EmailMessage
+import asyncio
+import heapq
+import itertools
+import random
+import smtplib
+import time
+
+
+# Orden de despacho: menor número sale primero
+PRIORITY_RANK = {"urgent": 0, "high": 1, "normal": 2, "low": 3}
+
+# Prioridades que el modo digest agrupa en un resumen periódico
+DIGEST_PRIORITIES = ("normal", "low")
+
+# Mensajes distintos que conserva una notificación agrupada (los demás solo se cuentan)
+MAX_MERGED_MESSAGES = 10
+
+
+def customer_key(phone: Optional[str] = None, conversation_id: Optional[str] = None) -> Optional[str]:
+    """
+    Clave de coalescencia de un cliente, la misma para todos los tools.
+    
+    Args:
+        phone: Teléfono del cliente (se usan solo los dígitos)
+        conversation_id: Conversación, si no hay teléfono
+    
+    Returns:
+        "tel:<dígitos>", "conv:<conversation_id>" o None si no hay ninguno
+    """
+    digits = "".join(char for char in str(phone or "") if char.isdigit())
+    if digits:
+        return f"tel:{digits}"
+    if conversation_id:
+        return f"conv:{conversation_id}"
+    return None
+
+
+def _header(value: Any) -> str:
+    """Valor de header en una sola línea (un asunto con saltos de línea haría fallar el email)"""
+    return " ".join(str(value).split())
+
+
+class Notification:
+    """
+    Notificación pendiente de envío a administración.
+    
+    Al agrupar repeticiones conserva cada mensaje distinto (asunto y cuerpo),
+    encabezados por el de mayor prioridad.
+    """
+    
+    __slots__ = ("entries", "omitted", "priority", "key", "count", "created_at", "last_at", "attempts")
+    
+    def __init__(self, subject: str, message: str, priority: str = "normal", key: Optional[str] = None):
+        self.entries: List[Tuple[str, str]] = [(subject, message)]
+        self.omitted = 0
+        self.priority = priority if priority in PRIORITY_RANK else "normal"
+        self.key = key
+        self.count = 1
+        self.created_at = time.time()
+        self.last_at = self.created_at
+        self.attempts = 0
+    
+    @property
+    def rank(self) -> int:
+        return PRIORITY_RANK[self.priority]
+    
+    @property
+    def subject(self) -> str:
+        return self.entries[0][0]
+    
+    @property
+    def message(self) -> str:
+        """Cuerpo: el mensaje principal y después cada mensaje distinto agrupado, con su asunto"""
+        parts = [self.entries[0][1]]
+        parts.extend(f"--- {subject} ---\n{message}" for subject, message in self.entries[1:])
+        if self.omitted:
+            parts.append(f"... y {self.omitted} mensajes distintos más")
+        return "\n\n".join(parts)
+    
+    def merge(self, other: "Notification") -> None:
+        """Absorbe una notificación repetida: suma sus mensajes distintos y queda la mayor prioridad"""
+        for entry in other.entries:
+            if entry in self.entries:
+                continue
+            if len(self.entries) < MAX_MERGED_MESSAGES:
+                self.entries.append(entry)
+            else:
+                self.omitted += 1
+        self.omitted += other.omitted
+        
+        if other.rank < self.rank:
+            self.priority = other.priority
+            # El asunto de la más prioritaria encabeza el email
+            lead = other.entries[0]
+            if lead in self.entries:
+                self.entries.remove(lead)
+                self.entries.insert(0, lead)
+        self.count += other.count
+        self.last_at = other.last_at
+
+
+class NotificationService:
+    """
+    Despachador de notificaciones a administración en segundo plano.
+    
+    `enqueue` solo encola y retorna: el envío nunca demora al tool que lo
+    llamó. Un worker toma las notificaciones por prioridad (urgent, high,
+    normal, low; FIFO dentro de cada nivel) y las envía en lotes reutilizando
+    una única conexión SMTP. Los lotes fallidos se reintentan con backoff
+    exponencial. La cola es acotada: llena, una notificación nueva solo entra
+    desplazando a otra de menor prioridad (las urgentes siempre entran).
+    
+    Coalescencia: las notificaciones con la misma clave de cliente se
+    agrupan. La primera sale enseguida; las que se repiten dentro de
+    `coalesce_window` segundos se retienen y salen como una sola notificación
+    con el conteo y cada mensaje distinto. Una pendiente que todavía no salió
+    absorbe directamente a las nuevas.
+    
+    Digest: con `digest_interval` > 0, las notificaciones normal y low se
+    acumulan y salen como un único resumen cada `digest_interval` segundos.
+    """
+    
+    def __init__(
+        self,
+        admin_email: Optional[str] = None,
+        smtp_host: Optional[str] = None,
+        smtp_port: int = 587,
+        smtp_user: Optional[str] = None,
+        smtp_password: Optional[str] = None,
+        smtp_from: Optional[str] = None,
+        smtp_starttls: bool = True,
+        max_queue: int = 1000,
+        batch_size: int = 20,
+        max_attempts: int = 5,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        idle_disconnect: float = 30.0,
+        coalesce_window: float = 300.0,
+        digest_interval: float = 0.0,
+        digest_max_items: int = 100,
+        smtp_factory: Optional[Callable[[], smtplib.SMTP]] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.admin_email = admin_email
+        self.smtp_host = smtp_host
+        self.smtp_port = smtp_port
+        self.smtp_user = smtp_user
+        self.smtp_password = smtp_password
+        self.smtp_from = smtp_from or smtp_user or admin_email
+        self.smtp_starttls = smtp_starttls
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.idle_disconnect = idle_disconnect
+        self.coalesce_window = coalesce_window
+        self.digest_interval = digest_interval
+        self.digest_max_items = digest_max_items
+        self._smtp_factory = smtp_factory or self._connect
+        self._clock = clock
+        
+        # Heap de (rango de prioridad, secuencia, notificación) listas para enviar
+        self._heap: List[Tuple[int, int, Notification]] = []
+        self._seq = itertools.count()
+        # Pendientes por clave (en el heap o retenidas) y fin de la ventana de cada clave
+        self._by_key: Dict[str, Notification] = {}
+        self._held: Dict[str, Notification] = {}
+        self._window_ends: Dict[str, float] = {}
+        # Modo digest: notificaciones acumuladas y próximo envío
+        self._digest: List[Notification] = []
+        self._digest_overflow = 0
+        self._next_digest: Optional[float] = None
+        
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._last_send = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._closing = False
+        self._stats = {
+            "enqueued": 0,
+            "sent": 0,
+            "failed": 0,
+            "dropped": 0,
+            "coalesced": 0,
+            "digested": 0,
+            "digests": 0,
+            "batches": 0,
+            "retries": 0,
+            "connections": 0
+        }
+    
+    @property
+    def enabled(self) -> bool:
+        """True si hay destinatario y servidor SMTP configurados"""
+        return bool(self.admin_email and self.smtp_host)
+    
+    def enqueue(
+        self,
+        subject: str,
+        message: str,
+        priority: str = "normal",
+        key: Optional[str] = None
+    ) -> bool:
+        """
+        Encola una notificación para envío en segundo plano.
+        
+        Args:
+            subject: Asunto del email
+            message: Cuerpo del email
+            priority: Prioridad (low, normal, high, urgent)
+            key: Clave de coalescencia del cliente (ver `customer_key`)
+        
+        Returns:
+            True si quedó encolada (o agrupada con otra pendiente); False si el
+            envío está deshabilitado o la cola está llena de notificaciones de
+            igual o mayor prioridad
+        """
+        if not self.enabled or self._closing:
+            return False
+        
+        notification = Notification(subject, message, priority, key)
+        self._stats["enqueued"] += 1
+        self._ensure_started()
+        
+        if key is not None and self._coalesce(notification):
+            self._wakeup.set()
+            return True
+        
+        if self.digest_interval > 0 and notification.priority in DIGEST_PRIORITIES:
+            self._add_to_digest(notification)
+            self._wakeup.set()
+            return True
+        
+        if key is not None and self._window_ends.get(key, 0.0) > self._clock() and notification.rank > PRIORITY_RANK["urgent"]:
+            # Repetición dentro de la ventana: se retiene hasta que cierre
+            if not self._make_room(notification.rank):
+                self._stats["dropped"] += 1
+                return False
+            self._held[key] = self._by_key[key] = notification
+            self._wakeup.set()
+            return True
+        
+        if not self._make_room(notification.rank):
+            self._stats["dropped"] += 1
+            return False
+        
+        self._push(notification)
+        self._wakeup.set()
+        return True
+    
+    async def start(self) -> None:
+        """Arranca el worker de envío"""
+        if self.enabled:
+            self._ensure_started()
+    
+    async def close(self, timeout: float = 10.0) -> None:
+        """
+        Deja de aceptar notificaciones y envía las pendientes antes de apagar.
+        
+        Las retenidas por coalescencia y el digest en curso se liberan de
+        inmediato para que también salgan.
+        
+        Args:
+            timeout: Tiempo máximo de espera para vaciar la cola
+        """
+        self._closing = True
+        if self._worker is not None:
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self._worker, timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._worker = None
+        
+        self._stats["dropped"] += len(self._heap) + len(self._held) + len(self._digest)
+        self._heap.clear()
+        self._held.clear()
+        self._digest.clear()
+        self._by_key.clear()
+        await asyncio.to_thread(self._disconnect)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene contadores del despachador.
+        
+        Returns:
+            Diccionario con encoladas, enviadas, agrupadas, descartadas y pendientes
+        """
+        return {
+            **self._stats,
+            "pending": len(self._heap),
+            "held": len(self._held),
+            "digest_pending": len(self._digest) + self._digest_overflow,
+            "enabled": self.enabled
+        }
+    
+    def _coalesce(self, notification: Notification) -> bool:
+        """Agrupa con una pendiente de la misma clave; True si la absorbió"""
+        pending = self._by_key.get(notification.key)
+        if pending is None:
+            return False
+        
+        previous_rank = pending.rank
+        pending.merge(notification)
+        self._stats["coalesced"] += 1
+        
+        if pending.rank != previous_rank:
+            self._reposition(pending)
+        return True
+    
+    def _reposition(self, pending: Notification) -> None:
+        """Reubica una pendiente cuya prioridad subió al absorber una repetición"""
+        if self._held.get(pending.key) is pending:
+            if pending.priority == "urgent":
+                # Una urgente no espera a que cierre la ventana
+                del self._held[pending.key]
+                self._push(pending)
+            return
+        
+        for index, item in enumerate(self._digest):
+            if item is pending:
+                if pending.priority not in DIGEST_PRIORITIES:
+                    # Dejó de ser normal/low: no espera al próximo resumen
+                    del self._digest[index]
+                    self._push(pending)
+                return
+        
+        self._heap = [
+            (entry.rank, seq, entry) if entry is pending else (rank, seq, entry)
+            for rank, seq, entry in self._heap
+        ]
+        heapq.heapify(self._heap)
+    
+    def _add_to_digest(self, notification: Notification) -> None:
+        """Acumula para el próximo resumen (acotado a digest_max_items)"""
+        if self._next_digest is None:
+            self._next_digest = self._clock() + self.digest_interval
+        if len(self._digest) < self.digest_max_items:
+            self._digest.append(notification)
+            if notification.key is not None:
+                self._by_key[notification.key] = notification
+        else:
+            self._digest_overflow += 1
+        self._stats["digested"] += 1
+    
+    def _release_due(self, now: float, force: bool = False) -> Optional[float]:
+        """
+        Pasa al heap las retenidas cuya ventana cerró y el digest si venció.
+        
+        Returns:
+            Instante del próximo vencimiento pendiente (None si no hay)
+        """
+        next_due = None
+        for key in list(self._held):
+            window_end = self._window_ends.get(key, 0.0)
+            if force or window_end <= now:
+                self._push(self._held.pop(key))
+            elif next_due is None or window_end < next_due:
+                next_due = window_end
+        
+        if self._next_digest is not None:
+            if force or self._next_digest <= now:
+                self._push(self._build_digest())
+            elif next_due is None or self._next_digest < next_due:
+                next_due = self._next_digest
+        return next_due
+    
+    def _build_digest(self) -> Notification:
+        items, overflow = self._digest, self._digest_overflow
+        self._digest, self._digest_overflow, self._next_digest = [], 0, None
+        for item in items:
+            if item.key is not None and self._by_key.get(item.key) is item:
+                del self._by_key[item.key]
+        
+        lines = [f"Resumen de {len(items) + overflow} notificaciones a administración", ""]
+        for item in items:
+            timestamp = datetime.fromtimestamp(item.created_at).strftime("%H:%M")
+            repeated = f" (x{item.count})" if item.count > 1 else ""
+            lines.append(f"- [{timestamp}] ({item.priority}) {item.subject}{repeated}")
+            lines.extend(f"    {line}" for line in item.message.splitlines())
+        if overflow:
+            lines.append(f"- ... y {overflow} notificaciones más")
+        
+        self._stats["digests"] += 1
+        return Notification(f"Resumen de notificaciones ({len(items) + overflow})", "\n".join(lines), "normal")
+    
+    def _push(self, notification: Notification) -> None:
+        heapq.heappush(self._heap, (notification.rank, next(self._seq), notification))
+        if notification.key is not None:
+            self._by_key[notification.key] = notification
+    
+    def _make_room(self, rank: int) -> bool:
+        """
+        Verifica que haya lugar para una notificación de prioridad `rank`.
+        
+        Con la cola llena descarta la de menor prioridad (la más nueva) si es
+        menos prioritaria. Las urgentes entran siempre, aunque superen el límite.
+        """
+        if len(self._heap) + len(self._held) < self.max_queue or not self._heap:
+            return True
+        
+        lowest = max(range(len(self._heap)), key=lambda index: self._heap[index][:2])
+        if self._heap[lowest][0] <= rank:
+            return rank == PRIORITY_RANK["urgent"]
+        
+        dropped = self._heap[lowest][2]
+        if dropped.key is not None and self._by_key.get(dropped.key) is dropped:
+            del self._by_key[dropped.key]
+        self._heap[lowest] = self._heap[-1]
+        self._heap.pop()
+        heapq.heapify(self._heap)
+        self._stats["dropped"] += 1
+        return True
+    
+    def _ensure_started(self) -> None:
+        """Crea el worker en el loop en ejecución"""
+        if self._worker is not None:
+            return
+        
+        self._wakeup = asyncio.Event()
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+    
+    async def _run(self) -> None:
+        """Worker: envía lotes por prioridad y reintenta con backoff"""
+        failures = 0
+        while True:
+            try:
+                now = self._clock()
+                next_due = self._release_due(now, force=self._closing)
+                
+                if not self._heap:
+                    if self._closing:
+                        return
+                    timeout = self.idle_disconnect
+                    if next_due is not None:
+                        timeout = min(timeout, max(0.0, next_due - now))
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                    except asyncio.TimeoutError:
+                        if self._smtp is not None and self._clock() - self._last_send >= self.idle_disconnect:
+                            # Sin tráfico: no mantener abierta la conexión SMTP
+                            await asyncio.to_thread(self._disconnect)
+                    continue
+                
+                batch = [heapq.heappop(self._heap)[2] for _ in range(min(self.batch_size, len(self._heap)))]
+                for notification in batch:
+                    if notification.key is not None and self._by_key.get(notification.key) is notification:
+                        # Desde ahora las repeticiones de esta clave se retienen hasta que cierre la ventana
+                        del self._by_key[notification.key]
+                        self._window_ends[notification.key] = now + self.coalesce_window
+                
+                unsent = await asyncio.to_thread(self._send_batch, batch)
+                self._last_send = self._clock()
+                self._stats["batches"] += 1
+                self._prune_windows(now)
+                
+                if not unsent:
+                    failures = 0
+                    continue
+                
+                # Se reencola lo que no salió (conserva su prioridad y orden)
+                failures += 1
+                for notification in unsent:
+                    notification.attempts += 1
+                    if notification.attempts >= self.max_attempts:
+                        self._stats["failed"] += 1
+                    else:
+                        self._stats["retries"] += 1
+                        self._push(notification)
+                await asyncio.sleep(self._backoff(failures))
+            
+            except Exception as e:
+                # Un error inesperado no puede terminar el worker: nadie lo volvería a arrancar
+                print(f"Error inesperado en el worker de notificaciones: {e}")
+                failures += 1
+                await asyncio.sleep(self._backoff(failures))
+    
+    def _prune_windows(self, now: float) -> None:
+        """Olvida las ventanas vencidas sin retenidas (mantiene acotado el diccionario)"""
+        if len(self._window_ends) <= self.max_queue:
+            return
+        for key, window_end in list(self._window_ends.items()):
+            if window_end <= now and key not in self._held:
+                del self._window_ends[key]
+    
+    def _send_batch(self, batch: List[Notification]) -> List[Notification]:
+        """Envía un lote por la conexión reutilizada; devuelve las que quedaron sin enviar"""
+        for index, notification in enumerate(batch):
+            try:
+                email = self._build_email(notification)
+            except Exception as e:
+                # Notificación inválida: se descarta sola, sin reintentos ni frenar al lote
+                print(f"Notificación a administración descartada: {e}")
+                self._stats["failed"] += 1
+                continue
+            
+            try:
+                if self._smtp is None:
+                    self._smtp = self._smtp_factory()
+                    self._stats["connections"] += 1
+                self._smtp.send_message(email)
+            except (smtplib.SMTPException, OSError) as e:
+                print(f"Error enviando notificación a administración: {e}")
+                self._disconnect()
+                return batch[index:]
+            self._stats["sent"] += 1
+        return []
+    
+    def _build_email(self, notification: Notification) -> EmailMessage:
+        email = EmailMessage()
+        prefix = f"[{notification.priority.upper()}] " if notification.rank <= PRIORITY_RANK["high"] else ""
+        subject = notification.subject
+        body = notification.message
+        if notification.count > 1:
+            first = datetime.fromtimestamp(notification.created_at).strftime("%H:%M")
+            last = datetime.fromtimestamp(notification.last_at).strftime("%H:%M")
+            subject += f" (x{notification.count})"
+            body += f"\n\nSe repitió {notification.count} veces entre las {first} y las {last}."
+        email["Subject"] = _header(prefix + subject)
+        email["From"] = _header(self.smtp_from)
+        email["To"] = _header(self.admin_email)
+        email.set_content(body)
+        return email
+    
+    def _connect(self) -> smtplib.SMTP:
+        """Abre la conexión SMTP (se reutiliza entre lotes)"""
+        smtp = smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=30)
+        if self.smtp_starttls:
+            smtp.starttls()
+        if self.smtp_user:
+            smtp.login(self.smtp_user, self.smtp_password or "")
+        return smtp
+    
+    def _disconnect(self) -> None:
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._smtp = None
+    
+    def _backoff(self, attempt: int) -> float:
+        """Backoff exponencial con jitter para el intento `attempt`"""
+        delay = min(self.max_backoff, self.base_backoff * (2 ** (attempt - 1)))
+        return delay * random.uniform(0.5, 1.0)
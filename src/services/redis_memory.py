@@ -0,0 +1,219 @@
+from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+import json
+import time
+from .memory_backends import MemoryBackend, MemoryMessage
+
+
+class RedisMemoryBackend(MemoryBackend):
+    """
+    Backend de MemoryService sobre Redis, compartido entre réplicas.
+    
+    Cada conversación es una lista (`RPUSH` + `LTRIM` la mantiene acotada) y
+    cada contexto de cliente un hash con valores JSON. Ambas claves vencen
+    tras `idle_ttl_seconds` sin escrituras. Las escrituras de un mismo turno
+    viajan en un único pipeline y el historial se lee con un solo `LRANGE`.
+    
+    Un near-cache local guarda por `near_cache_ttl` segundos los historiales
+    leídos, así las lecturas repetidas dentro de un turno no salen a la red.
+    Las escrituras de esta réplica lo actualizan; lo escrito por otras
+    réplicas se ve como máximo `near_cache_ttl` segundos tarde.
+    """
+    
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        client=None,
+        max_messages: int = 200,
+        idle_ttl_seconds: float = 24 * 60 * 60,
+        key_prefix: str = "lacabrera:",
+        max_connections: int = 20,
+        near_cache_size: int = 1000,
+        near_cache_ttl: float = 2.0,
+        clock=time.monotonic
+    ):
+        if client is None:
+            if not url:
+                raise ValueError("RedisMemoryBackend requiere `url` (REDIS_URL) o un cliente")
+            # Import diferido: redis solo es necesario con MEMORY_BACKEND=redis
+            import redis.asyncio as redis
+            
+            pool = redis.ConnectionPool.from_url(url, max_connections=max_connections)
+            client = redis.Redis(connection_pool=pool)
+        
+        self.client = client
+        self.max_messages = max_messages
+        self.idle_ttl_seconds = int(idle_ttl_seconds)
+        self.key_prefix = key_prefix
+        self.near_cache_size = near_cache_size
+        self.near_cache_ttl = near_cache_ttl
+        self._clock = clock
+        self._near_cache: "OrderedDict[str, Tuple[float, List[MemoryMessage]]]" = OrderedDict()
+        self._stats = {"round_trips": 0, "near_cache_hits": 0, "near_cache_misses": 0}
+    
+    async def get_conversation_history(
+        self,
+        conversation_id: str,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Historial desde el near-cache o con un único LRANGE"""
+        messages = await self._load_messages(conversation_id)
+        if limit and limit < len(messages):
+            messages = messages[-limit:]
+        return [message.to_dict() for message in messages]
+    
+    async def add_message(
+        self,
+        conversation_id: str,
+        role: str,
+        content: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Agrega el mensaje, recorta la lista y renueva el TTL en un solo round trip"""
+        message = MemoryMessage(role, content, time.time(), metadata)
+        pipe = self.client.pipeline(transaction=False)
+        self._queue_message(pipe, conversation_id, message)
+        await self._execute(pipe)
+        self._cache_append(conversation_id, message)
+    
+    async def add_message_with_context(
+        self,
+        conversation_id: str,
+        role: str,
+        content: str,
+        customer_id: str,
+        context: Dict[str, Any],
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Mensaje y contexto en un único pipeline (un round trip)"""
+        message = MemoryMessage(role, content, time.time(), metadata)
+        pipe = self.client.pipeline(transaction=False)
+        self._queue_message(pipe, conversation_id, message)
+        self._queue_context(pipe, customer_id, context)
+        await self._execute(pipe)
+        self._cache_append(conversation_id, message)
+    
+    async def get_customer_context(self, customer_id: str) -> Dict[str, Any]:
+        """Contexto del cliente con un HGETALL"""
+        self._stats["round_trips"] += 1
+        raw = await self.client.hgetall(self._context_key(customer_id))
+        return {_text(field): json.loads(value) for field, value in raw.items()}
+    
+    async def update_customer_context(self, customer_id: str, context: Dict[str, Any]) -> None:
+        """Combina el contexto con HSET y renueva el TTL en un solo round trip"""
+        if not context:
+            return
+        
+        pipe = self.client.pipeline(transaction=False)
+        self._queue_context(pipe, customer_id, context)
+        await self._execute(pipe)
+    
+    async def check_first_interaction(self, conversation_id: str) -> bool:
+        """True si la lista de la conversación está vacía (usa el near-cache si está fresco)"""
+        cached = self._cache_get(conversation_id)
+        if cached is not None:
+            return not cached
+        self._stats["round_trips"] += 1
+        return await self.client.llen(self._conversation_key(conversation_id)) == 0
+    
+    async def clear_conversation(self, conversation_id: str) -> None:
+        """Borra la lista de la conversación"""
+        self._near_cache.pop(conversation_id, None)
+        self._stats["round_trips"] += 1
+        await self.client.delete(self._conversation_key(conversation_id))
+    
+    async def close(self) -> None:
+        """Cierra el cliente y su pool de conexiones"""
+        await self.client.aclose()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene contadores del backend.
+        
+        Returns:
+            Diccionario con round trips y aciertos/fallos del near-cache
+        """
+        return {
+            **self._stats,
+            "backend": "redis",
+            "near_cache_entries": len(self._near_cache)
+        }
+    
+    def _conversation_key(self, conversation_id: str) -> str:
+        return f"{self.key_prefix}conv:{conversation_id}"
+    
+    def _context_key(self, customer_id: str) -> str:
+        return f"{self.key_prefix}ctx:{customer_id}"
+    
+    def _queue_message(self, pipe, conversation_id: str, message: MemoryMessage) -> None:
+        key = self._conversation_key(conversation_id)
+        pipe.rpush(key, _encode(message))
+        pipe.ltrim(key, -self.max_messages, -1)
+        pipe.expire(key, self.idle_ttl_seconds)
+    
+    def _queue_context(self, pipe, customer_id: str, context: Dict[str, Any]) -> None:
+        if not context:
+            return
+        key = self._context_key(customer_id)
+        pipe.hset(key, mapping={
+            field: json.dumps(value, ensure_ascii=False, default=str)
+            for field, value in context.items()
+        })
+        pipe.expire(key, self.idle_ttl_seconds)
+    
+    async def _execute(self, pipe) -> None:
+        self._stats["round_trips"] += 1
+        await pipe.execute()
+    
+    async def _load_messages(self, conversation_id: str) -> List[MemoryMessage]:
+        cached = self._cache_get(conversation_id)
+        if cached is not None:
+            self._stats["near_cache_hits"] += 1
+            return cached
+        
+        self._stats["near_cache_misses"] += 1
+        self._stats["round_trips"] += 1
+        raw = await self.client.lrange(self._conversation_key(conversation_id), 0, -1)
+        messages = [_decode(item) for item in raw]
+        self._cache_put(conversation_id, messages)
+        return messages
+    
+    def _cache_get(self, conversation_id: str) -> Optional[List[MemoryMessage]]:
+        entry = self._near_cache.get(conversation_id)
+        if entry is None:
+            return None
+        if entry[0] <= self._clock():
+            del self._near_cache[conversation_id]
+            return None
+        self._near_cache.move_to_end(conversation_id)
+        return entry[1]
+    
+    def _cache_put(self, conversation_id: str, messages: List[MemoryMessage]) -> None:
+        self._near_cache[conversation_id] = (self._clock() + self.near_cache_ttl, messages)
+        self._near_cache.move_to_end(conversation_id)
+        while len(self._near_cache) > self.near_cache_size:
+            self._near_cache.popitem(last=False)
+    
+    def _cache_append(self, conversation_id: str, message: MemoryMessage) -> None:
+        """Refleja en el near-cache un mensaje escrito por esta réplica"""
+        cached = self._cache_get(conversation_id)
+        if cached is None:
+            return
+        messages = cached + [message]
+        self._cache_put(conversation_id, messages[-self.max_messages:])
+
+
+def _encode(message: MemoryMessage) -> str:
+    payload = [message.role, message.content, message.timestamp]
+    if message.metadata:
+        payload.append(dict(message.metadata))
+    return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def _decode(raw) -> MemoryMessage:
+    payload = json.loads(raw)
+    return MemoryMessage(payload[0], payload[1], payload[2], payload[3] if len(payload) > 3 else None)
+
+
+def _text(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
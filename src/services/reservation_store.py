@@ -0,0 +1,211 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+import asyncio
+import os
+import sqlite3
+import threading
+
+
+T = TypeVar("T")
+
+
+# Consultas como constantes: sqlite3 cachea la sentencia preparada por texto
+# SQL, así que cada una se compila una única vez por conexión.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reservations (
+    id TEXT PRIMARY KEY,
+    nombre TEXT NOT NULL,
+    telefono TEXT NOT NULL,
+    email TEXT NOT NULL,
+    personas INTEGER NOT NULL,
+    fecha TEXT NOT NULL,
+    hora TEXT NOT NULL,
+    tipo_menu TEXT,
+    preferencias TEXT,
+    residente_argentino INTEGER,
+    created_at TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'confirmada',
+    idempotency_key TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_reservations_fecha_hora ON reservations (fecha, hora);
+CREATE INDEX IF NOT EXISTS idx_reservations_telefono ON reservations (telefono);
+CREATE INDEX IF NOT EXISTS idx_reservations_email ON reservations (email);
+"""
+
+# Índice único aparte: en bases creadas antes de la columna se agrega tras la migración
+_IDEMPOTENCY_INDEX = (
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_reservations_idempotency_key "
+    "ON reservations (idempotency_key) WHERE idempotency_key IS NOT NULL"
+)
+
+_COLUMNS = (
+    "id", "nombre", "telefono", "email", "personas", "fecha", "hora",
+    "tipo_menu", "preferencias", "residente_argentino", "created_at", "status",
+    "idempotency_key"
+)
+
+_INSERT = "INSERT INTO reservations ({}) VALUES ({})".format(
+    ", ".join(_COLUMNS), ", ".join("?" for _ in _COLUMNS)
+)
+_SELECT_BY_ID = "SELECT * FROM reservations WHERE id = ?"
+_SELECT_BY_IDEMPOTENCY_KEY = "SELECT * FROM reservations WHERE idempotency_key = ?"
+_SELECT_FROM_DATE = "SELECT * FROM reservations WHERE fecha >= ? AND status = 'confirmada' ORDER BY fecha, hora"
+
+
+class DuplicateReservationError(Exception):
+    """Ya existe una reserva con la misma clave de idempotencia"""
+
+
+class ReservationStore:
+    """
+    Almacenamiento local de reservas en SQLite (modo WAL).
+    
+    Es la fuente de verdad para disponibilidad; Google Sheets funciona como
+    espejo asíncrono. Las consultas usan índices por (fecha, hora), teléfono
+    y email, por lo que responden en menos de un milisegundo.
+    
+    Todo acceso a SQLite (incluido el fsync del WAL al confirmar) corre en un
+    executor propio de un solo hilo: nunca bloquea el event loop y las
+    escrituras quedan serializadas en orden de llegada.
+    """
+    
+    def __init__(self, database_url: Optional[str] = None, data_dir: str = "/app/data"):
+        self.path = self._resolve_path(database_url, data_dir)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+    
+    async def save(self, record: Dict[str, Any]) -> None:
+        """
+        Guarda una reserva nueva.
+        
+        Args:
+            record: Registro con los campos de ReservationRecord
+        
+        Raises:
+            DuplicateReservationError: si la clave de idempotencia ya fue usada
+        """
+        values = [record.get(column) for column in _COLUMNS]
+        if record.get("status") is None:
+            values[_COLUMNS.index("status")] = "confirmada"
+        await self._run(self._insert, record, values)
+    
+    def _insert(self, record: Dict[str, Any], values: List[Any]) -> None:
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute(_INSERT, values)
+            except sqlite3.IntegrityError as e:
+                if record.get("idempotency_key") and "idempotency_key" in str(e):
+                    raise DuplicateReservationError(record["idempotency_key"]) from e
+                raise
+    
+    async def get(self, reservation_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Obtiene una reserva por ID.
+        
+        Args:
+            reservation_id: ID de la reserva
+        
+        Returns:
+            Registro de la reserva o None si no existe
+        """
+        rows = await self._query(_SELECT_BY_ID, (reservation_id,))
+        return rows[0] if rows else None
+    
+    async def get_by_idempotency_key(self, idempotency_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Obtiene la reserva creada con una clave de idempotencia.
+        
+        Args:
+            idempotency_key: Clave de idempotencia de create_reservation
+        
+        Returns:
+            Registro de la reserva o None si no existe
+        """
+        rows = await self._query(_SELECT_BY_IDEMPOTENCY_KEY, (idempotency_key,))
+        return rows[0] if rows else None
+    
+    async def list_from_date(self, fecha: str) -> List[Dict[str, Any]]:
+        """
+        Obtiene las reservas confirmadas desde una fecha en adelante.
+        
+        Args:
+            fecha: Fecha inicial en formato YYYY-MM-DD
+        
+        Returns:
+            Lista de reservas ordenadas por fecha y hora
+        """
+        return await self._query(_SELECT_FROM_DATE, (fecha,))
+    
+    def close(self) -> None:
+        """Espera las operaciones en curso y cierra la conexión (hace checkpoint del WAL)"""
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+    
+    async def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Ejecuta una operación sobre SQLite en el hilo de la base"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+    
+    async def _query(self, sql: str, params: tuple) -> List[Dict[str, Any]]:
+        """Ejecuta una consulta y devuelve las filas como diccionarios"""
+        return await self._run(self._fetch, sql, params)
+    
+    def _fetch(self, sql: str, params: tuple) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._connect().execute(sql, params).fetchall()
+        return [self._to_record(row) for row in rows]
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Abre la conexión la primera vez que se usa (requiere tener tomado el lock)"""
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            
+            conn = sqlite3.connect(
+                self.path,
+                check_same_thread=False,
+                cached_statements=64
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            # En WAL, NORMAL es seguro ante cortes de proceso y evita un fsync por commit
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._migrate(conn)
+            self._conn = conn
+        return self._conn
+    
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection) -> None:
+        """Agrega las columnas nuevas a bases creadas con un esquema anterior"""
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(reservations)")}
+        if "idempotency_key" not in columns:
+            conn.execute("ALTER TABLE reservations ADD COLUMN idempotency_key TEXT")
+        conn.execute(_IDEMPOTENCY_INDEX)
+        conn.commit()
+    
+    @staticmethod
+    def _to_record(row: sqlite3.Row) -> Dict[str, Any]:
+        record = dict(row)
+        if record.get("residente_argentino") is not None:
+            record["residente_argentino"] = bool(record["residente_argentino"])
+        return record
+    
+    @staticmethod
+    def _resolve_path(database_url: Optional[str], data_dir: str) -> str:
+        """Convierte DATABASE_URL (sqlite:///ruta) en una ruta de archivo"""
+        if not database_url:
+            return os.path.join(data_dir, "reservas.db")
+        
+        prefix = "sqlite:///"
+        path = database_url[len(prefix):] if database_url.startswith(prefix) else ""
+        if not path:
+            raise ValueError(
+                f"DATABASE_URL no soportada: {database_url}. Usar el formato sqlite:///ruta/al/archivo.db"
+            )
+        return path
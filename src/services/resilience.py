@@ -0,0 +1,391 @@
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, Optional, TypeVar
+import asyncio
+import functools
+import time
+from .metrics import Histogram, metrics
+
+
+T = TypeVar("T")
+
+# Excepciones que indican un error de quien llama (datos inválidos), no de la
+# dependencia: no cuentan para el circuit breaker
+CALLER_ERRORS = (ValueError, TypeError, LookupError)
+
+# Hedging: muestras mínimas antes de confiar en el p95 y piso del retraso
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = 0.05
+
+# Instante (time.monotonic) en que vence la invocación en curso
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Se agotó el tiempo de la invocación esperando a una dependencia"""
+
+
+class CircuitOpenError(Exception):
+    """La dependencia está fallando y el circuit breaker rechaza las llamadas"""
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Fija un deadline para todo lo que se ejecute dentro del bloque.
+    
+    Un deadline anidado nunca extiende al externo: vale el más cercano.
+    
+    Args:
+        seconds: Segundos disponibles (None o 0 = sin deadline)
+    """
+    current = _deadline.get()
+    if seconds:
+        candidate = time.monotonic() + seconds
+        current = candidate if current is None else min(current, candidate)
+    token = _deadline.set(current)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """
+    Segundos que le quedan a la invocación en curso.
+    
+    Returns:
+        Segundos restantes (negativo si ya venció), o None si no hay deadline
+    """
+    current = _deadline.get()
+    return None if current is None else current - time.monotonic()
+
+
+def with_deadline(fn: Callable, seconds: Optional[float]) -> Callable:
+    """
+    Envuelve un tool async para que cada invocación tenga `seconds` de deadline.
+    
+    Args:
+        fn: Tool a envolver (conserva nombre, docstring y firma)
+        seconds: Deadline de cada invocación (None o 0 = sin deadline)
+    
+    Returns:
+        Tool con deadline
+    """
+    if not seconds:
+        return fn
+    
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        with deadline(seconds):
+            return await fn(*args, **kwargs)
+    return wrapper
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por tasa de errores sobre una ventana de llamadas.
+    
+    - Cerrado: deja pasar todo y registra el resultado de las últimas
+      `window` llamadas. Con al menos `min_calls` y una tasa de errores de
+      `failure_rate` o más, se abre.
+    - Abierto: rechaza al instante durante `open_seconds`.
+    - Semiabierto: deja pasar una sola llamada de prueba; si sale bien se
+      cierra, si falla vuelve a abrirse.
+    """
+    
+    CLOSED = 0
+    HALF_OPEN = 1
+    OPEN = 2
+    
+    def __init__(
+        self,
+        window: int = 20,
+        min_calls: int = 5,
+        failure_rate: float = 0.5,
+        open_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self._clock = clock
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._failures = 0
+        self.state = self.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._stats = {"opened": 0, "rejected": 0}
+    
+    def allow(self) -> bool:
+        """Indica si una llamada puede pasar (y la registra como prueba si corresponde)"""
+        if self.state == self.OPEN:
+            if self._clock() - self._opened_at < self.open_seconds:
+                self._stats["rejected"] += 1
+                return False
+            self.state = self.HALF_OPEN
+            self._probing = False
+        
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                self._stats["rejected"] += 1
+                return False
+            self._probing = True
+        return True
+    
+    def record(self, success: bool) -> None:
+        """Registra el resultado de una llamada que pasó por `allow`"""
+        if self.state == self.HALF_OPEN:
+            self._probing = False
+            if success:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+                self._failures = 0
+            else:
+                self._open()
+            return
+        
+        outcomes = self._outcomes
+        if len(outcomes) == outcomes.maxlen and not outcomes[0]:
+            self._failures -= 1
+        outcomes.append(success)
+        if success:
+            return
+        
+        # Solo una falla puede abrir el circuito
+        self._failures += 1
+        if len(outcomes) >= self.min_calls and self._failures >= self.failure_rate * len(outcomes):
+            self._open()
+    
+    def release(self) -> None:
+        """Libera la llamada de prueba si se canceló sin resultado"""
+        self._probing = False
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene el estado del breaker.
+        
+        Returns:
+            Diccionario con estado (0 cerrado, 1 semiabierto, 2 abierto), tasa
+            de errores de la ventana, aperturas y llamadas rechazadas
+        """
+        outcomes = len(self._outcomes)
+        return {
+            "state": self.state,
+            "failure_rate": self._failures / outcomes if outcomes else 0.0,
+            **self._stats
+        }
+    
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+        self._failures = 0
+        self._stats["opened"] += 1
+
+
+class Dependency:
+    """
+    Llamadas a una dependencia con deadline, circuit breaker y hedging.
+    
+    Cada llamada usa el tiempo que le queda a la invocación del tool
+    (`remaining_time`). Las lecturas idempotentes pueden lanzar un segundo
+    intento si el primero tarda más que el p95 observado de esa operación;
+    gana la primera respuesta y la otra se cancela.
+    """
+    
+    def __init__(self, name: str, breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.breaker = breaker or CircuitBreaker()
+        # Latencia (µs) de cada intento exitoso de las operaciones con hedge: base del retraso
+        self._latency: Dict[str, Histogram] = {}
+        self._stats = {
+            "calls": 0,
+            "failures": 0,
+            "deadline_exceeded": 0,
+            "hedges": 0,
+            "hedges_skipped": 0,
+            "hedge_wins": 0
+        }
+    
+    async def call(
+        self,
+        operation: str,
+        fn: Callable[[], Awaitable[T]],
+        hedge: bool = False,
+        can_hedge: Optional[Callable[[], bool]] = None
+    ) -> T:
+        """
+        Ejecuta una operación sobre la dependencia.
+        
+        Args:
+            operation: Nombre de la operación
+            fn: Corrutina sin argumentos que hace la llamada (se puede llamar dos veces si hay hedge)
+            hedge: La operación es una lectura idempotente y admite un segundo intento
+            can_hedge: Se consulta al momento de lanzar el segundo intento; si
+                devuelve False (dependencia saturada) no se lanza
+        
+        Returns:
+            Resultado de la operación
+        
+        Raises:
+            CircuitOpenError: Si el breaker está abierto
+            DeadlineExceeded: Si se agota el tiempo de la invocación
+        """
+        self._stats["calls"] += 1
+        timeout = remaining_time()
+        if timeout is not None and timeout <= 0:
+            # La invocación ya venció antes de llegar acá: no es culpa de la dependencia
+            self._stats["deadline_exceeded"] += 1
+            raise DeadlineExceeded(f"Tiempo agotado antes de llamar a {self.name}")
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} no disponible temporalmente")
+        
+        attempt = self._hedged(operation, fn, can_hedge) if hedge else fn()
+        scope = None
+        try:
+            if timeout is None:
+                result = await attempt
+            else:
+                # asyncio.timeout no crea una tarea nueva: solo agenda la cancelación
+                async with asyncio.timeout(timeout) as scope:
+                    result = await attempt
+        except TimeoutError:
+            self._record_failure()
+            if scope is not None and scope.expired():
+                self._stats["deadline_exceeded"] += 1
+                raise DeadlineExceeded(f"Tiempo agotado esperando a {self.name}") from None
+            raise
+        except CALLER_ERRORS:
+            self.breaker.record(True)
+            raise
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except Exception:
+            self._record_failure()
+            raise
+        
+        self.breaker.record(True)
+        return result
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene el estado del breaker y los contadores de la dependencia.
+        
+        Returns:
+            Diccionario con estado del breaker, llamadas, fallas, deadlines
+            vencidos, hedges lanzados y hedges que respondieron primero
+        """
+        return {**self.breaker.get_stats(), **self._stats}
+    
+    async def _attempt(self, operation: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Un intento: registra su latencia si sale bien"""
+        start = time.perf_counter_ns()
+        result = await fn()
+        latency = self._latency.get(operation)
+        if latency is None:
+            latency = self._latency[operation] = Histogram()
+        latency.record((time.perf_counter_ns() - start) // 1000)
+        return result
+    
+    async def _hedged(
+        self,
+        operation: str,
+        fn: Callable[[], Awaitable[T]],
+        can_hedge: Optional[Callable[[], bool]] = None
+    ) -> T:
+        """Primer intento y, si tarda más que el p95 y hay capacidad, un segundo en paralelo"""
+        delay = self._hedge_delay(operation)
+        first = asyncio.ensure_future(self._attempt(operation, fn))
+        pending = {first}
+        try:
+            if delay is None:
+                return await first
+            
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                if can_hedge is None or can_hedge():
+                    self._stats["hedges"] += 1
+                    pending.add(asyncio.ensure_future(self._attempt(operation, fn)))
+                else:
+                    # Dependencia saturada: un segundo intento solo sumaría carga
+                    self._stats["hedges_skipped"] += 1
+            
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self._stats["hedge_wins"] += 1
+                        return task.result()
+                if not pending:
+                    # Fallaron todos los intentos: se propaga el último error
+                    return task.result()
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    def _hedge_delay(self, operation: str) -> Optional[float]:
+        """Retraso del segundo intento (p95 observado), o None si no hay muestras suficientes"""
+        latency = self._latency.get(operation)
+        if latency is None or latency.count < HEDGE_MIN_SAMPLES:
+            return None
+        return max(latency.percentile(95) / 1_000_000, HEDGE_MIN_DELAY)
+    
+    def _record_failure(self) -> None:
+        self._stats["failures"] += 1
+        self.breaker.record(False)
+
+
+_dependencies: Dict[str, Dependency] = {}
+
+
+def dependency(name: str) -> Dependency:
+    """
+    Dependencia por nombre (se crea en el primer uso y exporta su estado como
+    gauges `breaker_<name>` en las métricas).
+    
+    Args:
+        name: Nombre de la dependencia (google_sheets, calendar)
+    
+    Returns:
+        Dependencia compartida por todo el proceso
+    """
+    guard = _dependencies.get(name)
+    if guard is None:
+        guard = _dependencies[name] = Dependency(name)
+        metrics.register_gauges(f"breaker_{name}", guard.get_stats)
+    return guard
+
+
+def guarded(
+    component: str,
+    hedge: bool = False,
+    can_hedge: Optional[Callable[[Any], bool]] = None
+) -> Callable[[Callable], Callable]:
+    """
+    Decorador para métodos async de servicios: deadline y circuit breaker de
+    `component` y, si `hedge`, segundo intento para lecturas idempotentes.
+    
+    Args:
+        component: Nombre de la dependencia
+        hedge: El método es una lectura idempotente
+        can_hedge: Recibe la instancia del servicio e indica si hay capacidad
+            para lanzar el segundo intento
+    
+    Returns:
+        Decorador que ejecuta el método a través de la dependencia
+    """
+    guard = dependency(component)
+    
+    def decorator(fn: Callable) -> Callable:
+        operation = fn.__name__.lstrip("_")
+        
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            gate = (lambda: can_hedge(args[0])) if can_hedge is not None else None
+            return await guard.call(operation, lambda: fn(*args, **kwargs), hedge=hedge, can_hedge=gate)
+        return wrapper
+    return decorator
@@ -0,0 +1,201 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, TypeVar
+import asyncio
+import threading
+
+
+T = TypeVar("T")
+Request = Callable[[Any], T]
+
+
+class SheetsClient:
+    """
+    Cliente de Google Sheets API que nunca bloquea el event loop.
+    
+    - Las llamadas corren en un executor propio y acotado: no compiten con
+      SQLite, SMTP ni el journal en el executor por defecto de asyncio.
+    - Cada hilo tiene su propio AuthorizedHttp y servicios (httplib2 no es
+      thread-safe) y reutiliza sus conexiones keep-alive entre llamadas.
+    - Las credenciales se cargan una vez y se renuevan antes de vencer, con un
+      único refresh aunque haya varios hilos esperando.
+    - Un semáforo limita las llamadas en curso; las demás esperan en el loop
+      sin ocupar hilos, así una planilla lenta no frena al resto de los tools.
+      El permiso se libera cuando termina el hilo, no cuando se cancela quien
+      esperaba (deadline o hedge perdido): una request abandonada sigue
+      ocupando su lugar y las nuevas no se apilan en la cola del executor.
+    """
+    
+    SCOPES = ("https://www.googleapis.com/auth/spreadsheets",)
+    
+    # Versión de cada API que se puede usar con `call`
+    APIS = {"sheets": "v4"}
+    
+    def __init__(
+        self,
+        credentials_path: str,
+        max_concurrency: int = 4,
+        timeout: float = 30.0,
+        refresh_margin: float = 300.0,
+        api_endpoint: Optional[str] = None
+    ):
+        self.credentials_path = credentials_path
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.refresh_margin = refresh_margin
+        self.api_endpoint = api_endpoint
+        
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="sheets")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._local = threading.local()
+        self._credentials = None
+        self._credentials_lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "errors": 0,
+            "in_flight": 0,
+            "waiting": 0,
+            "clients_built": 0,
+            "credential_refreshes": 0
+        }
+    
+    async def call(self, request: Request, api: str = "sheets") -> T:
+        """
+        Ejecuta una request de la API en el executor de Sheets.
+        
+        Args:
+            request: Función que recibe el servicio del hilo y devuelve el
+                resultado de `.execute()`
+            api: API del servicio que recibe `request` (clave de APIS)
+        
+        Returns:
+            Resultado de la request
+        """
+        semaphore = self._get_semaphore()
+        self._stats["waiting"] += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._stats["waiting"] -= 1
+        
+        self._stats["in_flight"] += 1
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self._executor, self._execute, request, api)
+        except BaseException:
+            self._finish(None)
+            raise
+        future.add_done_callback(self._finish)
+        # shield: cancelar a quien espera no marca el future como terminado
+        # mientras el hilo sigue ocupado con la request
+        return await asyncio.shield(future)
+    
+    @property
+    def saturated(self) -> bool:
+        """True si todos los permisos están en uso (no conviene sumar un hedge)"""
+        return self._semaphore is not None and self._semaphore.locked()
+    
+    async def warm_up(self) -> None:
+        """Carga las credenciales y construye el servicio de Sheets de un hilo por adelantado"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._service, "sheets")
+    
+    async def close(self) -> None:
+        """Espera las llamadas en curso y libera los hilos"""
+        await asyncio.to_thread(self._executor.shutdown, True)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene contadores del cliente.
+        
+        Returns:
+            Diccionario con llamadas, errores, en curso, en espera, clientes
+            construidos y renovaciones de credenciales
+        """
+        return {**self._stats, "max_concurrency": self.max_concurrency}
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Semáforo de llamadas en curso (se crea dentro del loop en ejecución)"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+    
+    def _finish(self, future: Optional["asyncio.Future"]) -> None:
+        """Al terminar el hilo de una llamada: libera su permiso y la cuenta"""
+        self._semaphore.release()
+        self._stats["in_flight"] -= 1
+        self._stats["calls"] += 1
+        # Se consulta el resultado aunque nadie lo espere (evita el warning de excepción no recuperada)
+        if future is None or future.cancelled() or future.exception() is not None:
+            self._stats["errors"] += 1
+    
+    def _execute(self, request: Request, api: str) -> T:
+        """Corre en un hilo del executor: renueva credenciales si hace falta y ejecuta"""
+        service = self._service(api)
+        self._refresh_if_expiring()
+        return request(service)
+    
+    def _service(self, api: str) -> Any:
+        """Servicio de `api` del hilo actual (se construye una vez por hilo)"""
+        services = getattr(self._local, "services", None)
+        if services is None:
+            import google_auth_httplib2
+            import httplib2
+            
+            # Http propio del hilo, compartido por sus servicios: mantiene
+            # abiertas sus conexiones keep-alive
+            self._local.http = google_auth_httplib2.AuthorizedHttp(
+                self._get_credentials(),
+                http=httplib2.Http(timeout=self.timeout)
+            )
+            services = self._local.services = {}
+        
+        service = services.get(api)
+        if service is None:
+            from googleapiclient.discovery import build
+            
+            client_options = {"api_endpoint": self.api_endpoint} if self.api_endpoint else None
+            service = services[api] = build(
+                api,
+                self.APIS[api],
+                http=self._local.http,
+                cache_discovery=False,
+                static_discovery=True,
+                client_options=client_options
+            )
+            self._stats["clients_built"] += 1
+        return service
+    
+    def _get_credentials(self) -> Any:
+        """Credenciales de la cuenta de servicio, compartidas por todos los hilos"""
+        if self._credentials is None:
+            with self._credentials_lock:
+                if self._credentials is None:
+                    from google.oauth2.service_account import Credentials
+                    
+                    self._credentials = Credentials.from_service_account_file(
+                        self.credentials_path,
+                        scopes=list(self.SCOPES)
+                    )
+        return self._credentials
+    
+    def _refresh_if_expiring(self) -> None:
+        """Renueva el token si vence dentro de `refresh_margin` (un solo hilo a la vez)"""
+        credentials = self._get_credentials()
+        if not self._expiring(credentials):
+            return
+        
+        with self._credentials_lock:
+            # Otro hilo pudo haberlo renovado mientras se esperaba el lock
+            if not self._expiring(credentials):
+                return
+            import google_auth_httplib2
+            
+            credentials.refresh(google_auth_httplib2.Request(self._local.http.http))
+            self._stats["credential_refreshes"] += 1
+    
+    def _expiring(self, credentials: Any) -> bool:
+        """Indica si el token falta o vence dentro de `refresh_margin`"""
+        if not credentials.token or credentials.expiry is None:
+            return True
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return (credentials.expiry - now).total_seconds() < self.refresh_margin
@@ -0,0 +1,254 @@
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import struct
+import time
+import zlib
+from .menu_search import MenuIndex
+
+
+# Rangos de la planilla que componen un snapshot. Se leen todos juntos con un
+# único spreadsheets.values.batchGet, en este mismo orden.
+SHEET_RANGES: Dict[str, str] = {
+    "business_info": "Info!A2:B",
+    "menu_prices": "Precios!A2:E",
+    "business_hours": "Horarios!A2:B",
+    "menu_details": "Menu!A2:D"
+}
+
+MENU_SECTIONS = ("entradas", "principales", "postres", "bebidas")
+
+# Snapshot persistido: magic + CRC32 del cuerpo, seguido del JSON comprimido con zlib
+_PERSISTED_MAGIC = b"LCSNAP01"
+_PERSISTED_HEADER = struct.Struct("<8sI")
+
+
+@dataclass(frozen=True)
+class RestaurantSnapshot:
+    """
+    Foto inmutable y versionada de los datos del restaurante.
+    
+    Un snapshot nunca se modifica: cada recarga construye uno nuevo y lo
+    reemplaza de forma atómica. Los diccionarios que contiene se comparten
+    entre todas las conversaciones, por lo que NO deben mutarse. `revision`
+    es el valor de la celda de versión con el que se leyó, si hay una
+    configurada y se pudo obtener.
+    """
+    version: int
+    loaded_at: float
+    business_info: Dict[str, str]
+    menu_prices: Dict[str, Any]
+    business_hours: Dict[str, str]
+    menu_details: Dict[str, Any]
+    revision: Optional[str] = None
+    
+    @cached_property
+    def menu_index(self) -> MenuIndex:
+        """Índice de búsqueda del menú (se construye en la primera consulta)"""
+        return MenuIndex(self.menu_details, self.menu_prices)
+
+
+def parse_snapshot(
+    value_ranges: List[Dict[str, Any]],
+    version: int,
+    revision: Optional[str] = None
+) -> RestaurantSnapshot:
+    """
+    Construye un snapshot a partir de la respuesta de batchGet.
+    
+    Args:
+        value_ranges: Lista `valueRanges` de la respuesta, en el orden de SHEET_RANGES
+        version: Número de versión a asignar
+        revision: Marca de la planilla leída antes del batchGet
+    
+    Returns:
+        Snapshot con todas las secciones parseadas
+    """
+    rows = {
+        section: (value_range.get("values") or [])
+        for section, value_range in zip(SHEET_RANGES, value_ranges)
+    }
+    
+    return RestaurantSnapshot(
+        version=version,
+        loaded_at=time.time(),
+        business_info=_parse_key_value(rows.get("business_info", [])),
+        menu_prices=_parse_prices(rows.get("menu_prices", [])),
+        business_hours=_parse_key_value(rows.get("business_hours", [])),
+        menu_details=_parse_menu(rows.get("menu_details", [])),
+        revision=revision
+    )
+
+
+def example_snapshot(version: int) -> RestaurantSnapshot:
+    """
+    Snapshot con la estructura de ejemplo usada cuando no hay planilla configurada.
+    
+    Args:
+        version: Número de versión a asignar
+    
+    Returns:
+        Snapshot de ejemplo (sin precios: nunca se hardcodean)
+    """
+    return RestaurantSnapshot(
+        version=version,
+        loaded_at=time.time(),
+        business_info={
+            "general": "La Cabrera Mendoza - Restaurante especializado en carnes a la parrilla",
+            "ubicacion": "Primitivo de la Reta 1015 - Entrando por Hualta Winery Hotel Curio Collection By Hilton",
+            "telefono": "+54 261 xxx xxxx",
+            "horarios": "Lunes a Domingo - Consultar horarios específicos"
+        },
+        menu_prices={
+            "ejecutivo": {
+                "precio": None,  # Se debe obtener dinámicamente
+                "descripcion": "Menú ejecutivo: entrada, plato principal y postre o café",
+                "disponibilidad": "Lunes a viernes de 12:30 a 16:30hs",
+                "requisito": "Solo para residentes argentinos"
+            },
+            "manso": {
+                "precio": None,  # Se debe obtener dinámicamente
+                "descripcion": "Menú manso",
+                "disponibilidad": "Lunes a jueves de 12:30 a 16:30hs y de 20:00 a 23:30hs"
+            },
+            "carta": {
+                "descripcion": "Carta completa disponible todos los días"
+            }
+        },
+        business_hours={
+            "lunes_jueves": "12:30 - 16:30 y 20:00 - 23:30",
+            "viernes": "12:30 - 16:30 y 20:00 - 00:00",
+            "sabado": "12:30 - 16:30 y 20:00 - 00:00",
+            "domingo": "12:30 - 16:30 y 20:00 - 23:30"
+        },
+        menu_details={section: [] for section in MENU_SECTIONS}
+    )
+
+
+def encode_snapshot(snapshot: RestaurantSnapshot, spreadsheet_id: str) -> bytes:
+    """
+    Serializa un snapshot en formato compacto para persistirlo en disco.
+    
+    Args:
+        snapshot: Snapshot a serializar
+        spreadsheet_id: Planilla de la que se leyó
+    
+    Returns:
+        Bytes con encabezado, CRC32 y JSON comprimido
+    """
+    payload = {
+        "spreadsheet_id": spreadsheet_id,
+        "loaded_at": snapshot.loaded_at,
+        "revision": snapshot.revision,
+        "business_info": snapshot.business_info,
+        "menu_prices": snapshot.menu_prices,
+        "business_hours": snapshot.business_hours,
+        "menu_details": snapshot.menu_details
+    }
+    body = zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    return _PERSISTED_HEADER.pack(_PERSISTED_MAGIC, zlib.crc32(body)) + body
+
+
+def decode_snapshot(data: bytes, version: int) -> Tuple[RestaurantSnapshot, str]:
+    """
+    Reconstruye un snapshot persistido con `encode_snapshot`.
+    
+    Args:
+        data: Contenido del archivo
+        version: Número de versión a asignar
+    
+    Returns:
+        Tupla (snapshot, planilla de la que se leyó)
+    
+    Raises:
+        ValueError: Si el archivo está truncado, corrupto o tiene otro formato
+    """
+    if len(data) < _PERSISTED_HEADER.size:
+        raise ValueError("Snapshot persistido truncado")
+    magic, crc = _PERSISTED_HEADER.unpack_from(data)
+    body = data[_PERSISTED_HEADER.size:]
+    if magic != _PERSISTED_MAGIC or zlib.crc32(body) != crc:
+        raise ValueError("Snapshot persistido corrupto o de otro formato")
+    
+    payload = json.loads(zlib.decompress(body))
+    snapshot = RestaurantSnapshot(
+        version=version,
+        loaded_at=payload["loaded_at"],
+        business_info=payload["business_info"],
+        menu_prices=payload["menu_prices"],
+        business_hours=payload["business_hours"],
+        menu_details=payload["menu_details"],
+        revision=payload["revision"]
+    )
+    return snapshot, payload["spreadsheet_id"]
+
+
+def _cell(row: List[Any], index: int) -> Optional[Any]:
+    """Devuelve la celda `index` de una fila, o None si está vacía o no existe"""
+    if index >= len(row):
+        return None
+    value = row[index]
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def _parse_price(value: Any) -> Optional[float]:
+    """Convierte un precio de la planilla ("$ 25.000,50" o 25000.5) a float"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    
+    cleaned = str(value).replace("$", "").replace(" ", "").replace(".", "").replace(",", ".")
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
+
+
+def _parse_key_value(rows: List[List[Any]]) -> Dict[str, str]:
+    """Filas [clave, valor] -> diccionario con claves en minúscula"""
+    result = {}
+    for row in rows:
+        key, value = _cell(row, 0), _cell(row, 1)
+        if key is not None and value is not None:
+            result[str(key).lower()] = str(value)
+    return result
+
+
+def _parse_prices(rows: List[List[Any]]) -> Dict[str, Any]:
+    """Filas [tipo, precio, descripcion, disponibilidad, requisito] -> precios por menú"""
+    prices = {}
+    for row in rows:
+        menu_type = _cell(row, 0)
+        if menu_type is None:
+            continue
+        
+        entry = {"precio": _parse_price(_cell(row, 1))}
+        for index, field in ((2, "descripcion"), (3, "disponibilidad"), (4, "requisito")):
+            value = _cell(row, index)
+            if value is not None:
+                entry[field] = str(value)
+        
+        prices[str(menu_type).lower()] = entry
+    return prices
+
+
+def _parse_menu(rows: List[List[Any]]) -> Dict[str, Any]:
+    """Filas [seccion, nombre, descripcion, precio] -> platos agrupados por sección"""
+    menu: Dict[str, List[Dict[str, Any]]] = {section: [] for section in MENU_SECTIONS}
+    for row in rows:
+        section, name = _cell(row, 0), _cell(row, 1)
+        if section is None or name is None:
+            continue
+        
+        item = {"nombre": str(name), "precio": _parse_price(_cell(row, 3))}
+        description = _cell(row, 2)
+        if description is not None:
+            item["descripcion"] = str(description)
+        
+        menu.setdefault(str(section).lower(), []).append(item)
+    return menu
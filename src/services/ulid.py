@@ -0,0 +1,66 @@
+from typing import Callable
+import os
+import threading
+import time
+
+
+# Alfabeto base32 de Crockford (sin I, L, O, U): ordena igual que los números
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_RANDOM_BITS = 80
+_RANDOM_MAX = (1 << _RANDOM_BITS) - 1
+
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        chars.append(_ALPHABET[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+class ULIDGenerator:
+    """
+    Generador de IDs ULID: 48 bits de milisegundos + 80 bits aleatorios.
+    
+    Los IDs son de 26 caracteres, ordenables lexicográficamente por momento de
+    creación y no dependen de PYTHONHASHSEED ni de coordinación entre
+    procesos: la parte aleatoria (os.urandom) hace despreciable la chance de
+    colisión entre workers. Dentro de un mismo proceso son estrictamente
+    crecientes: si dos IDs caen en el mismo milisegundo (o el reloj retrocede)
+    se incrementa la parte aleatoria del anterior.
+    """
+    
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._last_random = 0
+    
+    def new_id(self) -> str:
+        """
+        Genera un ULID nuevo.
+        
+        Returns:
+            ULID de 26 caracteres en base32 de Crockford
+        """
+        with self._lock:
+            now_ms = int(self._clock() * 1000)
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._last_random = int.from_bytes(os.urandom(10), "big")
+            elif self._last_random < _RANDOM_MAX:
+                self._last_random += 1
+            else:
+                # Parte aleatoria agotada en este milisegundo: se avanza el reloj lógico
+                self._last_ms += 1
+                self._last_random = int.from_bytes(os.urandom(10), "big")
+            
+            return _encode(self._last_ms, 10) + _encode(self._last_random, 16)
+
+
+_default_generator = ULIDGenerator()
+
+
+def new_ulid() -> str:
+    """Genera un ULID con el generador compartido del proceso"""
+    return _default_generator.new_id()
@@ -0,0 +1,272 @@
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from collections import deque
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+
+
+FlushFn = Callable[[List[List[Any]]], Awaitable[None]]
+
+
+class WriteBehindQueue:
+    """
+    Cola write-behind para escrituras por lotes.
+    
+    Cada fila se confirma en cuanto queda persistida en un journal local
+    (append + fsync). Un worker en segundo plano agrupa las filas pendientes y
+    las envía en lotes cuando se alcanza `batch_size` o vence `flush_interval`.
+    Los lotes fallidos se reintentan con backoff exponencial. Al reiniciar, las
+    filas del journal que no llegaron a enviarse se vuelven a encolar.
+    """
+    
+    def __init__(
+        self,
+        flush_fn: FlushFn,
+        journal_path: str,
+        batch_size: int = 50,
+        flush_interval: float = 2.0,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0
+    ):
+        self.flush_fn = flush_fn
+        self.journal_path = journal_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        
+        self._pending: Deque[Tuple[int, List[Any], float]] = deque()
+        self._next_seq = 1
+        self._journal = None
+        self._journal_lock = threading.Lock()
+        self._journal_unacked = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._closing = False
+        self._stats = {
+            "enqueued": 0,
+            "flushed_rows": 0,
+            "flushed_batches": 0,
+            "failed_batches": 0,
+            "recovered_rows": 0
+        }
+        
+        self._recover()
+    
+    async def enqueue(self, row: List[Any]) -> int:
+        """
+        Encola una fila y la confirma una vez persistida en el journal local.
+        
+        Args:
+            row: Valores de la fila a escribir
+        
+        Returns:
+            Número de secuencia asignado a la fila
+        """
+        if self._closing:
+            raise RuntimeError("La cola de escritura está cerrada")
+        
+        self._ensure_started()
+        seq = self._next_seq
+        self._next_seq += 1
+        
+        # El fsync bloquea: se hace fuera del event loop
+        await asyncio.to_thread(self._append_journal, {"seq": seq, "row": row})
+        
+        self._pending.append((seq, row, time.monotonic()))
+        self._stats["enqueued"] += 1
+        # Despertar al worker si arranca una ventana nueva o se completó un lote
+        if len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        
+        return seq
+    
+    async def start(self) -> None:
+        """Arranca el worker (y con él el envío de filas recuperadas del journal)"""
+        self._ensure_started()
+    
+    async def flush(self) -> bool:
+        """
+        Envía inmediatamente todas las filas pendientes.
+        
+        Returns:
+            True si no quedó ninguna fila pendiente
+        """
+        self._ensure_started()
+        while self._pending:
+            if not await self._flush_batch():
+                return False
+        return True
+    
+    async def close(self, max_attempts: int = 3) -> None:
+        """
+        Detiene el worker y vacía la cola antes de apagar el servidor.
+        
+        Lo que no se logre enviar queda en el journal y se reintenta al próximo
+        arranque.
+        
+        Args:
+            max_attempts: Intentos de envío por lote durante el cierre
+        """
+        self._closing = True
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        
+        attempt = 0
+        while self._pending and attempt < max_attempts:
+            if await self._flush_batch():
+                attempt = 0
+            else:
+                attempt += 1
+                await asyncio.sleep(self._backoff(attempt))
+        
+        with self._journal_lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene contadores de la cola.
+        
+        Returns:
+            Diccionario con filas encoladas, enviadas, lotes fallidos y pendientes
+        """
+        return {**self._stats, "pending": len(self._pending)}
+    
+    def _ensure_started(self) -> None:
+        """Crea las primitivas asyncio y el worker en el loop en ejecución"""
+        if self._worker is not None:
+            return
+        
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+    
+    async def _run(self) -> None:
+        """Worker: envía un lote al llenarse o al vencer la ventana de tiempo"""
+        failures = 0
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            
+            oldest_age = time.monotonic() - self._pending[0][2]
+            if len(self._pending) < self.batch_size and oldest_age < self.flush_interval:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(
+                        self._wakeup.wait(),
+                        timeout=self.flush_interval - oldest_age
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            if await self._flush_batch():
+                failures = 0
+            else:
+                failures += 1
+                await asyncio.sleep(self._backoff(failures))
+    
+    async def _flush_batch(self) -> bool:
+        """Envía el lote más antiguo; devuelve False si el envío falló"""
+        async with self._flush_lock:
+            if not self._pending:
+                return True
+            
+            batch = [self._pending[i] for i in range(min(self.batch_size, len(self._pending)))]
+            try:
+                await self.flush_fn([row for _, row, _ in batch])
+            except Exception:
+                self._stats["failed_batches"] += 1
+                return False
+            
+            for _ in batch:
+                self._pending.popleft()
+            self._stats["flushed_rows"] += len(batch)
+            self._stats["flushed_batches"] += 1
+            
+            await asyncio.to_thread(self._ack_journal, [seq for seq, _, _ in batch])
+            return True
+    
+    def _backoff(self, attempt: int) -> float:
+        """Backoff exponencial con jitter para el intento `attempt`"""
+        delay = min(self.max_backoff, self.base_backoff * (2 ** (attempt - 1)))
+        return delay * random.uniform(0.5, 1.0)
+    
+    def _recover(self) -> None:
+        """Reencola las filas del journal que no llegaron a confirmarse"""
+        if not os.path.exists(self.journal_path):
+            return
+        
+        rows: Dict[int, List[Any]] = {}
+        last_seq = 0
+        with open(self.journal_path, "r", encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Última línea truncada por un corte: nunca fue confirmada
+                    continue
+                if "ack" in entry:
+                    for seq in entry["ack"]:
+                        rows.pop(seq, None)
+                else:
+                    rows[entry["seq"]] = entry["row"]
+                    last_seq = max(last_seq, entry["seq"])
+        
+        now = time.monotonic()
+        for seq in sorted(rows):
+            self._pending.append((seq, rows[seq], now))
+        
+        self._stats["recovered_rows"] = len(rows)
+        self._journal_unacked = len(rows)
+        self._next_seq = last_seq + 1
+        if not rows:
+            # Nada pendiente: se descarta el journal viejo
+            os.remove(self.journal_path)
+    
+    def _append_journal(self, entry: Dict[str, Any]) -> None:
+        """Agrega una fila al journal y la fuerza a disco"""
+        with self._journal_lock:
+            self._write_journal(entry)
+            self._journal_unacked += 1
+    
+    def _ack_journal(self, seqs: List[int]) -> None:
+        """Marca filas como enviadas; si no queda ninguna sin confirmar, trunca el journal"""
+        with self._journal_lock:
+            self._journal_unacked -= len(seqs)
+            if self._journal_unacked > 0:
+                self._write_journal({"ack": seqs})
+                return
+            
+            self._open_journal().truncate(0)
+            os.fsync(self._journal.fileno())
+    
+    def _write_journal(self, entry: Dict[str, Any]) -> None:
+        """Escribe una entrada y hace fsync (requiere tener tomado el lock)"""
+        journal = self._open_journal()
+        journal.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        journal.flush()
+        os.fsync(journal.fileno())
+    
+    def _open_journal(self):
+        """Abre el journal en modo append si todavía no está abierto"""
+        if self._journal is None:
+            os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        return self._journal
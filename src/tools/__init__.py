@@ -1,12 +1,21 @@
-from .validation_tools import ValidationTools
-from .info_tools import RestaurantInfoTools
-from .reservation_tools import ReservationTools
-from .admin_tools import AdminTools
-
-__all__ = [
-    "ValidationTools",
-    "RestaurantInfoTools",
-    "ReservationTools",
-    "AdminTools",
-]
+from importlib import import_module
 
+# Exportaciones diferidas (PEP 562): cada módulo se importa en el primer acceso,
+# así importar un submódulo no arrastra al resto
+_EXPORTS = {
+    "ValidationTools": ".validation_tools",
+    "RestaurantInfoTools": ".info_tools",
+    "ReservationTools": ".reservation_tools",
+    "AdminTools": ".admin_tools",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
@@ -1,11 +1,35 @@
 from mcp import Tool
 from datetime import datetime
 from typing import Optional
+from ..services.google_sheets import GoogleSheetsService
+from ..services.metrics import metrics
+from ..services.notification_service import NotificationService, customer_key
+from ..config.settings import settings
 
 
 class AdminTools:
     """Herramientas de administración y escalamiento"""
     
+    def __init__(
+        self,
+        notification_service: Optional[NotificationService] = None,
+        sheets_service: Optional[GoogleSheetsService] = None
+    ):
+        # Las notificaciones se despachan en segundo plano: los tools solo encolan.
+        # En el servidor la cola viene del ServiceContainer
+        self.notification_service = notification_service or NotificationService(
+            admin_email=settings.admin_email,
+            smtp_host=settings.smtp_host,
+            smtp_port=settings.smtp_port,
+            smtp_user=settings.smtp_user,
+            smtp_password=settings.smtp_password,
+            smtp_from=settings.smtp_from,
+            smtp_starttls=settings.smtp_starttls,
+            coalesce_window=settings.notification_coalesce_seconds,
+            digest_interval=settings.notification_digest_minutes * 60
+        )
+        self.sheets_service = sheets_service or GoogleSheetsService()
+    
     @Tool
     async def escalate_to_human(self, customer_query: str, customer_info: dict) -> dict:
         """
@@ -14,7 +38,7 @@ class AdminTools:
         Args:
             customer_query: Consulta del cliente que no pudo ser resuelta
             customer_info: Información del cliente (name, phone, email)
-            
+        
         Returns:
             Confirmación de derivación con mensaje formateado
         """
@@ -33,16 +57,21 @@ Fecha: {timestamp}
 Por favor, responder al cliente con la información solicitada.
             """.strip()
             
-            # TODO: Enviar email o notificación a administración
-            # await self.notification_service.send_admin_alert(admin_message)
+            queued = self.notification_service.enqueue(
+                subject=f"Consulta no resuelta - {customer_info.get('name', 'Cliente')}",
+                message=admin_message,
+                priority="high",
+                key=customer_key(customer_info.get('phone'), customer_info.get('conversation_id'))
+            )
             
             return {
                 "success": True,
                 "message": "Consulta derivada a administración",
                 "admin_message": admin_message,
-                "timestamp": timestamp
+                "timestamp": timestamp,
+                "notification_queued": queued
             }
-            
+        
         except Exception as e:
             return {
                 "success": False,
@@ -50,27 +79,45 @@ Por favor, responder al cliente con la información solicitada.
             }
     
     @Tool
-    async def mark_as_human_required(self, conversation_id: str, reason: str) -> dict:
+    async def mark_as_human_required(
+        self,
+        conversation_id: str,
+        reason: str,
+        customer_phone: Optional[str] = None
+    ) -> dict:
         """
         Marca una conversación para que sea atendida por un humano.
         
         Args:
             conversation_id: ID de la conversación
             reason: Razón por la cual requiere atención humana
-            
+            customer_phone: Teléfono del cliente, para agrupar con sus otras notificaciones
+        
         Returns:
             Confirmación
         """
         try:
             # TODO: Implementar lógica para marcar en sistema de chat
+            timestamp = datetime.now().isoformat()
+            message = f"Conversación: {conversation_id}\nRazón: {reason}\nFecha: {timestamp}"
+            if customer_phone:
+                message += f"\nWhatsApp: {customer_phone}"
+            queued = self.notification_service.enqueue(
+                subject=f"Conversación requiere atención humana - {conversation_id}",
+                message=message,
+                priority="high",
+                key=customer_key(customer_phone, conversation_id)
+            )
+            
             return {
                 "success": True,
                 "conversation_id": conversation_id,
                 "marked_for_human": True,
                 "reason": reason,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": timestamp,
+                "notification_queued": queued
             }
-            
+        
         except Exception as e:
             return {
                 "success": False,
@@ -93,7 +140,7 @@ Por favor, responder al cliente con la información solicitada.
             message: Mensaje detallado
             priority: Nivel de prioridad (low, normal, high, urgent)
             customer_data: Datos adicionales del cliente
-            
+        
         Returns:
             Confirmación de envío
         """
@@ -106,18 +153,79 @@ Por favor, responder al cliente con la información solicitada.
                 "customer_data": customer_data or {}
             }
             
-            # TODO: Implementar envío real de notificación
-            # await self.notification_service.send(notification)
+            queued = self.notification_service.enqueue(
+                subject=subject,
+                message=self._format_notification(notification),
+                priority=priority,
+                key=customer_key(
+                    notification["customer_data"].get("phone"),
+                    notification["customer_data"].get("conversation_id")
+                )
+            )
             
             return {
                 "success": True,
                 "notification_id": f"NOTIF_{datetime.now().strftime('%Y%m%d%H%M%S')}",
-                "message": "Notificación enviada a administración"
+                "message": "Notificación enviada a administración",
+                "notification_queued": queued
             }
-            
+        
         except Exception as e:
             return {
                 "success": False,
                 "message": f"Error al enviar notificación: {str(e)}"
             }
-
+    
+    @staticmethod
+    def _format_notification(notification: dict) -> str:
+        """Arma el cuerpo del email de una notificación"""
+        lines = [notification["message"], "", f"Prioridad: {notification['priority']}", f"Fecha: {notification['timestamp']}"]
+        for key, value in notification["customer_data"].items():
+            lines.append(f"{key}: {value}")
+        return "\n".join(lines)
+    
+    @Tool
+    async def get_server_metrics(self) -> dict:
+        """
+        Obtiene las métricas del servidor: latencia por tool y por dependencia.
+        
+        Returns:
+            Llamadas, errores, en curso, percentiles de latencia (ms) y tamaño de
+            respuestas por tool; lo mismo por operación de Google Sheets,
+            calendario y memoria; y los contadores de cada servicio
+        """
+        try:
+            return {"success": True, **metrics.snapshot()}
+        
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"Error al obtener métricas: {str(e)}"
+            }
+    
+    @Tool
+    async def refresh_restaurant_data(self) -> dict:
+        """
+        Recarga ya los datos del restaurante desde Google Sheets.
+        
+        Usar después de que el personal edite precios, horarios o el menú en la
+        planilla, para no esperar a la próxima revalidación automática.
+        
+        Returns:
+            Versión y revisión del snapshot recién cargado
+        """
+        try:
+            snapshot = await self.sheets_service.refresh()
+            return {
+                "success": True,
+                "message": "Datos del restaurante recargados desde Google Sheets",
+                "snapshot_version": snapshot.version,
+                "snapshot_revision": snapshot.revision,
+                "loaded_at": datetime.fromtimestamp(snapshot.loaded_at).strftime("%Y-%m-%d %H:%M:%S")
+            }
+        
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"Error al recargar datos: {str(e)}"
+            }
@@ -6,8 +6,8 @@ from ..services.google_sheets import GoogleSheetsService
 class RestaurantInfoTools:
     """Herramientas para obtener información del restaurante"""
     
-    def __init__(self):
-        self.sheets_service = GoogleSheetsService()
+    def __init__(self, sheets_service: Optional[GoogleSheetsService] = None):
+        self.sheets_service = sheets_service or GoogleSheetsService()
     
     @Tool
     async def get_restaurant_info(self, category: str = "general") -> str:
@@ -53,12 +53,13 @@ class RestaurantInfoTools:
             menu_type_lower = menu_type.lower()
             
             if menu_type_lower in prices:
-                return prices[menu_type_lower]
+                return self._with_freshness(prices[menu_type_lower])
             
-            # Buscar por nombre similar
-            for key in prices.keys():
-                if menu_type_lower in key or key in menu_type_lower:
-                    return prices[key]
+            # Buscar por nombre similar ("Menú Ejecutivo", "ejecutivos", "ejec")
+            index = await self.sheets_service.get_menu_index()
+            key = index.match_menu_type(menu_type)
+            if key in prices:
+                return self._with_freshness(prices[key])
             
             return {
                 "error": f"Precio no encontrado para {menu_type}",
@@ -81,7 +82,7 @@ class RestaurantInfoTools:
         """
         try:
             hours = await self.sheets_service.get_business_hours()
-            return hours
+            return self._with_freshness(hours)
             
         except Exception as e:
             return {
@@ -104,13 +105,65 @@ class RestaurantInfoTools:
             menu = await self.sheets_service.get_menu_details()
             
             if menu_section and menu_section in menu:
-                return {menu_section: menu[menu_section]}
+                return self._with_freshness({menu_section: menu[menu_section]})
             
-            return menu
+            return self._with_freshness(menu)
             
         except Exception as e:
             return {
                 "error": str(e),
                 "message": "Error al obtener detalles del menú. Consultar con administración."
             }
+    
+    @Tool
+    async def search_menu(self, query: str, limit: int = 5) -> dict:
+        """
+        Busca platos y bebidas del menú por nombre, descripción o sección.
+        No distingue acentos ni mayúsculas y tolera plurales y errores de tipeo.
+        
+        Args:
+            query: Lo que busca el cliente (ej. "bife de chorizo", "vinos malbec")
+            limit: Máximo de resultados (1 a 20)
+            
+        Returns:
+            Diccionario con los platos encontrados, del más al menos relevante
+        """
+        try:
+            index = await self.sheets_service.get_menu_index()
+            results = index.search(query, max(1, min(limit, 20)))
+            
+            if not results:
+                return self._with_freshness({
+                    "query": query,
+                    "resultados": [],
+                    "message": f"No se encontraron platos para '{query}'. Ofrecer las secciones del menú o consultar con administración."
+                })
+            
+            return self._with_freshness({
+                "query": query,
+                "resultados": list(results),
+                "total": len(results)
+            })
+            
+        except Exception as e:
+            return {
+                "error": str(e),
+                "message": "Error al buscar en el menú. Consultar con administración."
+            }
+    
+    def _with_freshness(self, data: dict) -> dict:
+        """
+        Agrega a la respuesta cuándo se confirmaron los datos contra la planilla.
+        
+        Args:
+            data: Respuesta del tool (compartida con el snapshot: no se modifica)
+            
+        Returns:
+            Copia de la respuesta con `actualizado_al`, o la misma respuesta si
+            los datos no vienen de la planilla
+        """
+        freshness = self.sheets_service.data_freshness
+        if freshness is None:
+            return data
+        return {**data, "actualizado_al": freshness}
 
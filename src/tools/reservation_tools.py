@@ -1,24 +1,72 @@
 from mcp import Tool
-from typing import Optional
-from datetime import datetime
-from ..models.reservation import ReservationData, ReservationResponse
+from typing import TYPE_CHECKING, List, Optional
+from datetime import date, datetime, timedelta
+import hashlib
+from ..config.settings import settings
+from ..services.calendar_service import CalendarService
+from ..services.google_sheets import GoogleSheetsService
+from ..services.menu_rules import (
+    MINUTES_PER_DAY,
+    RULE_DAY,
+    RULE_OK,
+    RULE_TIME,
+    normalize_menu,
+    parse_bool,
+    parse_date,
+    parse_time,
+)
+from ..services.idempotency import IdempotencyCache, IdempotencyConflictError
+from ..services.reservation_store import DuplicateReservationError, ReservationStore
+from ..services.ulid import new_ulid
 from .validation_tools import ValidationTools
 
+if TYPE_CHECKING:
+    import numpy as np
+
+
+# Máximo de días por consulta a get_availability_matrix
+MAX_MATRIX_DAYS = 62
+
 
 class ReservationTools:
     """Herramientas para gestión de reservas"""
     
-    def __init__(self):
-        self.validation_tools = ValidationTools()
+    def __init__(
+        self,
+        validation_tools: Optional[ValidationTools] = None,
+        sheets_service: Optional[GoogleSheetsService] = None,
+        reservation_store: Optional[ReservationStore] = None,
+        calendar_service: Optional[CalendarService] = None,
+        idempotency_cache: Optional[IdempotencyCache] = None
+    ):
+        # En el servidor todas las dependencias vienen del ServiceContainer;
+        # sin él (scripts, benchmarks) se construyen acá
+        self.validation_tools = validation_tools or ValidationTools()
+        self.sheets_service = sheets_service or GoogleSheetsService()
+        self.reservation_store = reservation_store or ReservationStore(settings.database_url, settings.data_dir)
+        self.calendar_service = calendar_service or CalendarService(
+            capacity=settings.restaurant_capacity,
+            reservation_store=self.reservation_store,
+            service_hours=self.validation_tools.menu_rules["carta"]
+        )
+        # Resultados de create_reservation por clave de idempotencia (reintentos del agente)
+        self.idempotency_cache = idempotency_cache or IdempotencyCache()
     
     @Tool
-    async def create_reservation(self, reservation_data: dict) -> dict:
+    async def create_reservation(self, reservation_data: dict, idempotency_key: Optional[str] = None) -> dict:
         """
         Crea una nueva reserva con validación completa.
         
+        Es idempotente: si el agente reintenta la llamada, se devuelve la reserva
+        original en lugar de crear otra. La misma clave con otros datos (por
+        ejemplo, otra cantidad de personas) es un conflicto y no se repite la
+        reserva original.
+        
         Args:
             reservation_data: Diccionario con datos de reserva
-            
+            idempotency_key: Clave para reintentos seguros; si no se indica se
+                deriva del teléfono, la fecha y la hora
+        
         Returns:
             Respuesta con éxito o error
         """
@@ -34,81 +82,206 @@ class ReservationTools:
                     "errors": missing_fields
                 }
             
-            # Validar menú si se especifica
-            if reservation_data.get("tipo_menu"):
-                tipo_menu = reservation_data["tipo_menu"].lower()
-                
-                if "ejecutivo" in tipo_menu:
-                    # Verificar que se haya proporcionado el dato de residencia
-                    if reservation_data.get("residente_argentino") is None:
-                        return {
-                            "success": False,
-                            "message": "Para el menú ejecutivo es obligatorio indicar si es residente argentino"
-                        }
-                    
-                    validation = await self.validation_tools.validate_executive_menu(
-                        reservation_data["fecha"],
-                        reservation_data["hora"],
-                        reservation_data.get("residente_argentino", False)
-                    )
-                    
-                elif "manso" in tipo_menu:
-                    validation = await self.validation_tools.validate_manso_menu(
-                        reservation_data["fecha"],
-                        reservation_data["hora"]
-                    )
-                    
-                else:
-                    # Menú regular o carta completa
-                    validation = {"valid": True, "message": "Menú regular disponible"}
-                
-                # Si la validación falla, retornar el error
-                if not validation["valid"]:
-                    return {
-                        "success": False,
-                        "message": validation["message"],
-                        "alternativas": validation.get("alternativas", [])
-                    }
-            
-            # Guardar reserva
-            result = await self.save_reservation(reservation_data)
-            
-            return {
-                "success": True,
-                "message": "✅ Reserva confirmada exitosamente",
-                "reservation_id": result.get("id"),
-                "details": {
-                    "nombre": reservation_data["nombre"],
-                    "fecha": reservation_data["fecha"],
-                    "hora": reservation_data["hora"],
-                    "personas": reservation_data["personas"],
-                    "tipo_menu": reservation_data.get("tipo_menu", "carta completa")
+            try:
+                personas = int(reservation_data["personas"])
+            except (TypeError, ValueError):
+                personas = 0
+            if personas < 1:
+                return {
+                    "success": False,
+                    "message": "La cantidad de personas debe ser un número entero mayor o igual a 1",
+                    "errors": ["personas"]
                 }
-            }
+            reservation_data = {**reservation_data, "personas": personas}
             
+            key = idempotency_key or self._derive_idempotency_key(reservation_data)
+            fingerprint = self._fingerprint(reservation_data)
+            
+            result, replayed = await self.idempotency_cache.run(
+                key,
+                lambda: self._create_reservation(reservation_data, key, fingerprint),
+                fingerprint=fingerprint
+            )
+            return {**result, "idempotent_replay": True} if replayed else result
+        
+        except IdempotencyConflictError:
+            return self._conflict(key)
+        
         except Exception as e:
             return {
                 "success": False,
                 "message": f"Error al crear reserva: {str(e)}"
             }
     
-    async def save_reservation(self, data: dict) -> dict:
+    async def _create_reservation(self, reservation_data: dict, idempotency_key: str, fingerprint: str) -> dict:
+        """Valida, toma los lugares y guarda la reserva (una vez por clave de idempotencia)"""
+        # Reintento después de un reinicio o atendido por otro proceso: ya está en SQLite
+        existing = await self.reservation_store.get_by_idempotency_key(idempotency_key)
+        if existing is not None:
+            return self._replay(existing, fingerprint)
+        
+        # Fecha y hora se validan siempre, se indique o no el menú
+        try:
+            weekday = parse_date(reservation_data["fecha"])
+            minute = parse_time(reservation_data["hora"])
+        except ValueError:
+            return {
+                "success": False,
+                "message": "❌ Fecha u hora inválida. Formato esperado YYYY-MM-DD y HH:MM",
+                "errors": ["fecha", "hora"]
+            }
+        
+        if reservation_data["fecha"] < date.today().isoformat():
+            return {
+                "success": False,
+                "message": "❌ No se pueden hacer reservas para fechas pasadas"
+            }
+        
+        # Sin tipo de menú se reserva a la carta
+        tipo_menu = normalize_menu(reservation_data.get("tipo_menu") or "carta")
+        
+        if tipo_menu == "ejecutivo":
+            # Verificar que se haya proporcionado el dato de residencia
+            if reservation_data.get("residente_argentino") is None:
+                return {
+                    "success": False,
+                    "message": "Para el menú ejecutivo es obligatorio indicar si es residente argentino"
+                }
+            
+            validation = await self.validation_tools.validate_executive_menu(
+                reservation_data["fecha"],
+                reservation_data["hora"],
+                reservation_data.get("residente_argentino", False)
+            )
+        
+        elif tipo_menu == "manso":
+            validation = await self.validation_tools.validate_manso_menu(
+                reservation_data["fecha"],
+                reservation_data["hora"]
+            )
+        
+        else:
+            validation = self._validate_carta(weekday, minute)
+        
+        # Si la validación falla, retornar el error
+        if not validation["valid"]:
+            return {
+                "success": False,
+                "message": validation["message"],
+                "alternativas": validation.get("alternativas", [])
+            }
+        
+        # Tomar los lugares de forma atómica: dos pedidos concurrentes no
+        # pueden quedarse con la última mesa
+        reservation_id = self._generate_reservation_id()
+        personas = reservation_data["personas"]
+        reserved = await self.calendar_service.reserve_seats(
+            reservation_data["fecha"],
+            reservation_data["hora"],
+            personas,
+            reservation_id
+        )
+        
+        if not reserved:
+            slots = await self.calendar_service.get_available_slots(
+                reservation_data["fecha"],
+                personas=personas
+            )
+            return {
+                "success": False,
+                "message": "❌ No hay lugar disponible para esa fecha y hora",
+                "alternativas": [slot["hora"] for slot in slots]
+            }
+        
+        # Guardar reserva (si falla, se liberan los lugares tomados)
+        try:
+            result = await self.save_reservation(reservation_data, reservation_id, idempotency_key)
+        except DuplicateReservationError:
+            # Otro proceso guardó la misma reserva primero: se devuelve esa
+            await self.calendar_service.release_seats(reservation_id)
+            existing = await self.reservation_store.get_by_idempotency_key(idempotency_key)
+            return self._replay(existing, fingerprint)
+        except Exception:
+            await self.calendar_service.release_seats(reservation_id)
+            raise
+        
+        return self._confirmation(result["id"], reservation_data)
+    
+    def _validate_carta(self, weekday: int, minute: int) -> dict:
+        """Valida día y hora contra el horario de atención (reglas compiladas de la carta)"""
+        menu_rules = self.validation_tools.menu_rules
+        if "carta" not in menu_rules:
+            return {"valid": True, "message": "Menú regular disponible"}
+        
+        rule = menu_rules["carta"]
+        code = rule.check(weekday, minute)
+        if code == RULE_DAY:
+            return {
+                "valid": False,
+                "message": f"❌ El restaurante atiende {rule.describe_days()}"
+            }
+        if code == RULE_TIME:
+            return {
+                "valid": False,
+                "message": f"❌ El horario de reservas es {rule.describe_hours()}"
+            }
+        return {"valid": True, "message": "Menú regular disponible"}
+    
+    def _replay(self, existing: dict, fingerprint: str) -> dict:
+        """Devuelve la reserva ya guardada con la misma clave, si los datos coinciden"""
+        if self._fingerprint(existing) != fingerprint:
+            raise IdempotencyConflictError(existing["idempotency_key"])
+        return {**self._confirmation(existing["id"], existing), "idempotent_replay": True}
+    
+    @staticmethod
+    def _conflict(idempotency_key: str) -> dict:
+        """Respuesta para una clave de idempotencia reutilizada con otros datos"""
+        return {
+            "success": False,
+            "message": (
+                "❌ Ya existe una reserva con la misma clave (teléfono, fecha y hora) y datos "
+                "distintos. Para cambiarla hay que contactar al restaurante"
+            ),
+            "error": "idempotency_conflict",
+            "idempotency_key": idempotency_key
+        }
+    
+    @staticmethod
+    def _confirmation(reservation_id: str, data: dict) -> dict:
+        """Respuesta de reserva confirmada"""
+        return {
+            "success": True,
+            "message": "✅ Reserva confirmada exitosamente",
+            "reservation_id": reservation_id,
+            "details": {
+                "nombre": data["nombre"],
+                "fecha": data["fecha"],
+                "hora": data["hora"],
+                "personas": data["personas"],
+                "tipo_menu": data.get("tipo_menu") or "carta completa"
+            }
+        }
+    
+    async def save_reservation(
+        self,
+        data: dict,
+        reservation_id: Optional[str] = None,
+        idempotency_key: Optional[str] = None
+    ) -> dict:
         """
         Guarda la reserva en la base de datos.
         
         Args:
             data: Datos de la reserva
-            
+            reservation_id: ID ya asignado; si no se indica se genera uno
+            idempotency_key: Clave de idempotencia (única en la base)
+        
         Returns:
             Diccionario con ID de reserva
         """
         try:
-            # Generar ID único para la reserva
-            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-            reservation_id = f"RES_{timestamp}_{hash(str(data)) % 10000:04d}"
-            
-            # Aquí se implementaría la lógica para guardar en base de datos
-            # Por ahora, retornamos el ID generado
+            if reservation_id is None:
+                reservation_id = self._generate_reservation_id()
             
             reservation_record = {
                 "id": reservation_id,
@@ -122,42 +295,197 @@ class ReservationTools:
                 "preferencias": data.get("preferencias"),
                 "residente_argentino": data.get("residente_argentino"),
                 "created_at": datetime.now().isoformat(),
-                "status": "confirmada"
+                "status": "confirmada",
+                "idempotency_key": idempotency_key
             }
             
-            # TODO: Guardar en base de datos (Google Sheets, PostgreSQL, etc.)
-            # await self.database.save(reservation_record)
+            # SQLite es la fuente de verdad; la planilla es un espejo que se actualiza en lotes
+            await self.reservation_store.save(reservation_record)
+            try:
+                await self.sheets_service.save_reservation(reservation_record)
+            except Exception as e:
+                # La reserva ya está confirmada en SQLite: una falla del espejo
+                # no puede deshacerla (liberaría los lugares de una reserva guardada)
+                print(f"⚠️ Reserva {reservation_id} confirmada pero no encolada para Google Sheets: {e}")
             
             return {"id": reservation_id, "record": reservation_record}
-            
+        
+        except DuplicateReservationError:
+            raise
         except Exception as e:
             raise Exception(f"Error al guardar reserva: {str(e)}")
     
+    def _generate_reservation_id(self) -> str:
+        """Genera un ID único y ordenable por fecha de creación (RES_<ULID>)"""
+        return f"RES_{new_ulid()}"
+    
+    @staticmethod
+    def _derive_idempotency_key(data: dict) -> str:
+        """Clave de idempotencia por defecto: teléfono (solo dígitos) + fecha + hora"""
+        telefono = "".join(char for char in str(data["telefono"]) if char.isdigit())
+        return f"{telefono}|{data['fecha']}|{data['hora']}"
+    
+    @staticmethod
+    def _fingerprint(data: dict) -> str:
+        """Huella de los datos que definen una reserva, para detectar una clave reutilizada con otros datos"""
+        fields = (
+            " ".join(str(data["nombre"]).lower().split()),
+            "".join(char for char in str(data["telefono"]) if char.isdigit()),
+            str(data["email"]).strip().lower(),
+            str(int(data["personas"])),
+            str(data["fecha"]),
+            str(data["hora"]),
+            normalize_menu(data.get("tipo_menu") or "carta")
+        )
+        return hashlib.sha256("\x1f".join(fields).encode()).hexdigest()[:16]
+    
     @Tool
-    async def check_availability(self, fecha: str, hora: str) -> dict:
+    async def check_availability(self, fecha: str, hora: str, personas: int = 1) -> dict:
         """
         Verifica disponibilidad para una fecha y hora específica.
         
         Args:
             fecha: Fecha en formato YYYY-MM-DD
             hora: Hora en formato HH:MM
-            
+            personas: Cantidad de personas a ubicar
+        
         Returns:
             Disponibilidad
         """
         try:
-            # TODO: Implementar verificación real de disponibilidad
-            # Por ahora, asumimos disponibilidad
+            # Índice de capacidad en memoria (cargado desde SQLite): cubre toda la
+            # duración de la reserva, no solo la hora de llegada
+            availability = await self.calendar_service.check_availability(fecha, hora, personas)
+            available = availability["available"]
+            
             return {
-                "available": True,
+                "available": available,
                 "fecha": fecha,
                 "hora": hora,
-                "message": "Disponibilidad confirmada"
+                "spaces_remaining": availability["spaces_remaining"],
+                "message": "Disponibilidad confirmada" if available else "No hay lugar disponible en ese horario"
             }
-            
+        
         except Exception as e:
             return {
                 "available": False,
                 "message": f"Error al verificar disponibilidad: {str(e)}"
             }
-
+    
+    @Tool
+    async def get_availability_matrix(
+        self,
+        fecha_desde: str,
+        fecha_hasta: str,
+        personas: int = 2,
+        tipo_menu: str = "carta",
+        residente_argentino: Optional[bool] = None
+    ) -> dict:
+        """
+        Obtiene todos los horarios reservables de un rango de fechas en una sola llamada.
+        
+        Combina las reglas del menú, la capacidad libre durante toda la reserva
+        y las fechas bloqueadas. Responde preguntas como "¿qué días de la
+        semana que viene puedo ir con el menú manso para 6 personas?".
+        
+        Args:
+            fecha_desde: Fecha inicial en formato YYYY-MM-DD
+            fecha_hasta: Fecha final (inclusive) en formato YYYY-MM-DD
+            personas: Cantidad de personas
+            tipo_menu: Tipo de menú (ejecutivo, manso, carta)
+            residente_argentino: Si el cliente es residente argentino (menú ejecutivo)
+        
+        Returns:
+            Horarios de llegada disponibles por fecha, comprimidos en rangos
+            "HH:MM-HH:MM" cada `intervalo_minutos`. Las fechas sin lugar no se listan.
+        """
+        try:
+            # numpy solo hace falta en las consultas en bloque: no se carga al arrancar
+            import numpy as np
+            
+            try:
+                personas = int(personas)
+            except (TypeError, ValueError):
+                personas = 0
+            if personas < 1:
+                return {
+                    "success": False,
+                    "message": "La cantidad de personas debe ser un número entero mayor o igual a 1",
+                    "errors": ["personas"]
+                }
+            
+            start = date.fromisoformat(fecha_desde)
+            end = date.fromisoformat(fecha_hasta)
+            days = (end - start).days + 1
+            
+            if days < 1 or days > MAX_MATRIX_DAYS:
+                return {
+                    "success": False,
+                    "message": f"El rango debe tener entre 1 y {MAX_MATRIX_DAYS} días"
+                }
+            
+            menu = normalize_menu(tipo_menu)
+            if menu == "ejecutivo" and residente_argentino is not None and not parse_bool(residente_argentino):
+                return {
+                    "success": False,
+                    "message": "❌ El menú ejecutivo está disponible solo para residentes argentinos",
+                    "alternativas": ["carta completa"]
+                }
+            
+            calendar = self.calendar_service
+            fechas = [(start + timedelta(days=offset)).isoformat() for offset in range(days)]
+            weekdays = np.array([(start + timedelta(days=offset)).weekday() for offset in range(days)])
+            step = calendar.SLOT_STEP_MINUTES
+            arrivals = np.arange(0, MINUTES_PER_DAY, step)
+            
+            # Reglas del menú: una consulta vectorizada a la tabla día x minuto
+            rules = self.validation_tools.menu_rules
+            rule_row = rules.matrix[rules.menu_index[menu]]
+            allowed = rule_row[weekdays[:, None] * MINUTES_PER_DAY + arrivals[None, :]] == RULE_OK
+            
+            # Capacidad libre durante toda la reserva, para todas las fechas a la vez
+            remaining = await calendar.get_remaining_matrix(fechas)
+            allowed &= remaining[:, arrivals // calendar.slot_minutes] >= personas
+            
+            blocked = set(await calendar.get_blocked_dates())
+            if blocked:
+                allowed &= ~np.isin(np.array(fechas), list(blocked))[:, None]
+            
+            availability = {}
+            for row, fecha in enumerate(fechas):
+                ranges = self._compress_runs(allowed[row], arrivals)
+                if ranges:
+                    availability[fecha] = ranges
+            
+            return {
+                "success": True,
+                "fecha_desde": fecha_desde,
+                "fecha_hasta": fecha_hasta,
+                "personas": personas,
+                "tipo_menu": menu,
+                "intervalo_minutos": step,
+                "disponibilidad": availability,
+                "fechas_bloqueadas": sorted(fecha for fecha in fechas if fecha in blocked)
+            }
+        
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"Error al calcular disponibilidad: {str(e)}"
+            }
+    
+    @staticmethod
+    def _compress_runs(mask: "np.ndarray", arrivals: "np.ndarray") -> List[str]:
+        """Comprime una fila de horarios habilitados en rangos HH:MM-HH:MM"""
+        import numpy as np
+        
+        edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1) - 1
+        
+        ranges = []
+        for first, last in zip(starts.tolist(), ends.tolist()):
+            begin = f"{arrivals[first] // 60:02d}:{arrivals[first] % 60:02d}"
+            finish = f"{arrivals[last] // 60:02d}:{arrivals[last] % 60:02d}"
+            ranges.append(begin if first == last else f"{begin}-{finish}")
+        return ranges
@@ -1,11 +1,52 @@
-from datetime import datetime
+from typing import Optional
 from mcp import Tool
+from ..config.settings import settings
 from ..models.menu import ValidationResult
+from ..services.menu_rules import (
+    RULE_DAY,
+    RULE_OK,
+    RULE_TIME,
+    CompiledMenuRules,
+    compile_menu_rules,
+    normalize_menu,
+    parse_bool,
+    parse_date,
+    parse_time
+)
+
+
+# Reglas compiladas una única vez al arrancar, compartidas por todas las instancias
+MENU_RULES = compile_menu_rules(settings.business_hours)
+
+# Regla de prioridad por código de resultado, para cada menú validable
+PRIORITY_RULES = {
+    "ejecutivo": {
+        RULE_OK: "ACEPTAR",
+        RULE_DAY: "RECHAZAR_FIN_DE_SEMANA",
+        RULE_TIME: "RECHAZAR_HORARIO"
+    },
+    "manso": {
+        RULE_OK: "ACEPTAR_SIEMPRE",
+        RULE_DAY: "RECHAZAR_SIEMPRE",
+        RULE_TIME: "RECHAZAR_HORARIO"
+    },
+    "carta": {
+        RULE_OK: "ACEPTAR",
+        RULE_DAY: "RECHAZAR_DIA",
+        RULE_TIME: "RECHAZAR_HORARIO"
+    }
+}
+
+# Máximo de candidatos por llamada a validate_menus_batch
+MAX_BATCH_CANDIDATES = 500
 
 
 class ValidationTools:
     """Herramientas de validación de menús"""
     
+    def __init__(self, menu_rules: Optional[CompiledMenuRules] = None):
+        self.menu_rules = menu_rules or MENU_RULES
+    
     @Tool
     async def validate_executive_menu(self, date: str, time: str, residente_argentino: bool = False) -> dict:
         """
@@ -25,41 +66,28 @@ class ValidationTools:
             dict con valid, message y priority_rule
         """
         try:
-            date_obj = datetime.strptime(date, "%Y-%m-%d")
-            time_obj = datetime.strptime(time, "%H:%M")
-            
-            # Día de la semana (0=lunes, 6=domingo)
-            weekday = date_obj.weekday()
-            
-            # Hora en minutos desde medianoche
-            time_in_minutes = time_obj.hour * 60 + time_obj.minute
-            start_time = 12 * 60 + 30  # 12:30
-            end_time = 16 * 60 + 30    # 16:30
-            
-            # Validar día (lunes=0 a viernes=4)
-            is_weekday = 0 <= weekday <= 4
-            
-            # Validar horario
-            is_lunch_time = start_time <= time_in_minutes <= end_time
+            # Una única consulta a la tabla compilada (día de la semana x minuto)
+            rule = self.menu_rules["ejecutivo"]
+            code = rule.check(parse_date(date), parse_time(time))
             
             # Validar todas las condiciones
-            if not is_weekday:
+            if code == RULE_DAY:
                 return {
                     "valid": False,
-                    "message": "❌ El menú ejecutivo solo está disponible de lunes a viernes",
+                    "message": f"❌ El menú ejecutivo solo está disponible {rule.describe_days()}",
                     "priority_rule": "RECHAZAR_FIN_DE_SEMANA",
                     "alternativas": ["carta completa"]
                 }
             
-            if not is_lunch_time:
+            if code == RULE_TIME:
                 return {
                     "valid": False,
-                    "message": "❌ El menú ejecutivo solo está disponible de 12:30 a 16:30hs",
+                    "message": f"❌ El menú ejecutivo solo está disponible {rule.describe_hours()}",
                     "priority_rule": "RECHAZAR_HORARIO",
                     "alternativas": ["carta completa"]
                 }
             
-            if not residente_argentino:
+            if not parse_bool(residente_argentino):
                 return {
                     "valid": False,
                     "message": "❌ El menú ejecutivo está disponible solo para residentes argentinos",
@@ -98,49 +126,31 @@ class ValidationTools:
             dict con valid, message y priority_rule
         """
         try:
-            date_obj = datetime.strptime(date, "%Y-%m-%d")
-            time_obj = datetime.strptime(time, "%H:%M")
-            
-            # Día de la semana (0=lunes, 6=domingo)
-            weekday = date_obj.weekday()
+            # REGLA DE PRIORIDAD ABSOLUTA: la tabla compilada devuelve primero el rechazo por día
+            rule = self.menu_rules["manso"]
+            code = rule.check(parse_date(date), parse_time(time))
             
-            # Hora en minutos desde medianoche
-            time_in_minutes = time_obj.hour * 60 + time_obj.minute
-            
-            # Horarios permitidos
-            lunch_start = 12 * 60 + 30   # 12:30
-            lunch_end = 16 * 60 + 30     # 16:30
-            dinner_start = 20 * 60       # 20:00
-            dinner_end = 23 * 60 + 30    # 23:30
-            
-            # REGLA DE PRIORIDAD ABSOLUTA: Validar día primero
-            # Lunes=0, Martes=1, Miércoles=2, Jueves=3, Viernes=4, Sábado=5, Domingo=6
+            if code == RULE_OK:
+                return {
+                    "valid": True,
+                    "message": "¡Perfecto! Podés disfrutar del menú manso",
+                    "priority_rule": "ACEPTAR_SIEMPRE"
+                }
             
-            if weekday in [0, 1, 2, 3]:  # Lunes a Jueves
-                # Validar horario
-                is_lunch_time = lunch_start <= time_in_minutes <= lunch_end
-                is_dinner_time = dinner_start <= time_in_minutes <= dinner_end
-                
-                if is_lunch_time or is_dinner_time:
-                    return {
-                        "valid": True,
-                        "message": "¡Perfecto! Podés disfrutar del menú manso",
-                        "priority_rule": "ACEPTAR_SIEMPRE"
-                    }
-                else:
-                    return {
-                        "valid": False,
-                        "message": "❌ El menú manso está disponible de 12:30 a 16:30hs y de 20:00 a 23:30hs",
-                        "priority_rule": "RECHAZAR_HORARIO",
-                        "alternativas": ["carta completa"]
-                    }
-            else:  # Viernes a Domingo
+            if code == RULE_TIME:
                 return {
                     "valid": False,
-                    "message": "Lamento informarte que el menú manso solo está disponible de lunes a jueves",
-                    "priority_rule": "RECHAZAR_SIEMPRE",
+                    "message": f"❌ El menú manso está disponible {rule.describe_hours()}",
+                    "priority_rule": "RECHAZAR_HORARIO",
                     "alternativas": ["carta completa"]
                 }
+            
+            return {
+                "valid": False,
+                "message": f"Lamento informarte que el menú manso solo está disponible {rule.describe_days()}",
+                "priority_rule": "RECHAZAR_SIEMPRE",
+                "alternativas": ["carta completa"]
+            }
                 
         except Exception as e:
             return {
@@ -148,4 +158,89 @@ class ValidationTools:
                 "message": f"Error al validar: {str(e)}",
                 "priority_rule": "ERROR"
             }
-
+    
+    @Tool
+    async def validate_menus_batch(self, candidates: list) -> dict:
+        """
+        Valida muchas combinaciones de fecha, hora y menú en una sola llamada.
+        
+        Útil cuando el cliente es flexible ("¿martes 21:00 o miércoles 13:00?"):
+        evita una llamada por opción. Aplica las mismas reglas que
+        validate_executive_menu y validate_manso_menu, y los horarios de la
+        carta que usa get_availability_matrix.
+        
+        Args:
+            candidates: Lista de [fecha, hora, menu, residente_argentino] o de
+                diccionarios con claves date, time, menu y residente_argentino.
+                Fecha YYYY-MM-DD, hora HH:MM, menu ejecutivo/manso/carta.
+            
+        Returns:
+            dict con results (uno por candidato: date, time, menu, valid,
+            priority_rule) y valid_count
+        """
+        try:
+            if len(candidates) > MAX_BATCH_CANDIDATES:
+                return {
+                    "success": False,
+                    "message": f"Máximo {MAX_BATCH_CANDIDATES} candidatos por llamada"
+                }
+            
+            results = []
+            positions, menu_indexes, weekdays, minutes = [], [], [], []
+            
+            # Parseo por candidato; la evaluación de reglas se hace en un solo paso
+            for candidate in candidates:
+                if isinstance(candidate, dict):
+                    date = candidate.get("date") or candidate.get("fecha")
+                    time = candidate.get("time") or candidate.get("hora")
+                    menu = candidate.get("menu") or candidate.get("tipo_menu") or "carta"
+                    residente = candidate.get("residente_argentino", False)
+                else:
+                    date, time, menu, residente = (list(candidate) + [None, None, "carta", False])[:4]
+                
+                menu_name = normalize_menu(str(menu))
+                result = {"date": date, "time": time, "menu": menu_name}
+                results.append(result)
+                
+                try:
+                    weekday, minute = parse_date(date), parse_time(time)
+                    result["residente_argentino"] = parse_bool(residente)
+                except Exception as e:
+                    result.update(valid=False, priority_rule="ERROR", message=str(e))
+                    continue
+                
+                if menu_name not in self.menu_rules:
+                    # Menú sin horarios configurados: sin restricciones de día ni horario
+                    result.pop("residente_argentino")
+                    result.update(valid=True, priority_rule="ACEPTAR")
+                    continue
+                
+                positions.append(len(results) - 1)
+                menu_indexes.append(self.menu_rules.menu_index[menu_name])
+                weekdays.append(weekday)
+                minutes.append(minute)
+            
+            codes = self.menu_rules.check_many(menu_indexes, weekdays, minutes).tolist()
+            
+            for position, code in zip(positions, codes):
+                result = results[position]
+                residente = result.pop("residente_argentino")
+                valid = code == RULE_OK
+                rule = PRIORITY_RULES[result["menu"]][code]
+                
+                if valid and result["menu"] == "ejecutivo" and not residente:
+                    valid, rule = False, "RECHAZAR_NO_RESIDENTE"
+                
+                result.update(valid=valid, priority_rule=rule)
+            
+            return {
+                "success": True,
+                "results": results,
+                "valid_count": sum(1 for result in results if result["valid"])
+            }
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"Error al validar: {str(e)}"
+            }
@@ -0,0 +1,185 @@
+"""
+Pruebas de NotificationService contra un servidor SMTP falso en el proceso.
+
+El falso guarda cada email enviado y cuenta las conexiones abiertas, así se
+verifica el orden por prioridad, el envío por lotes sobre una misma
+conexión, los reintentos con backoff y el vaciado de la cola al cerrar.
+"""
+import asyncio
+import smtplib
+from email.message import EmailMessage
+from typing import List
+
+from src.services.notification_service import NotificationService
+
+
+class FakeSMTPServer:
+    """Sumidero de emails; `fail_sends` hace fallar los próximos envíos"""
+    
+    def __init__(self, fail_sends: int = 0):
+        self.fail_sends = fail_sends
+        self.connections: List["FakeSMTPConnection"] = []
+        self.sent: List[EmailMessage] = []
+    
+    def connect(self) -> "FakeSMTPConnection":
+        connection = FakeSMTPConnection(self)
+        self.connections.append(connection)
+        return connection
+    
+    @property
+    def subjects(self) -> List[str]:
+        return [email["Subject"] for email in self.sent]
+
+
+class FakeSMTPConnection:
+    def __init__(self, server: FakeSMTPServer):
+        self.server = server
+        self.sent = 0
+        self.closed = False
+    
+    def send_message(self, email: EmailMessage) -> None:
+        if self.server.fail_sends > 0:
+            self.server.fail_sends -= 1
+            raise smtplib.SMTPServerDisconnected("conexión cerrada por el servidor")
+        self.sent += 1
+        self.server.sent.append(email)
+    
+    def quit(self) -> None:
+        self.closed = True
+
+
+def make_service(server: FakeSMTPServer, **kwargs) -> NotificationService:
+    options = {"base_backoff": 0.01, "max_backoff": 0.05, **kwargs}
+    return NotificationService(
+        admin_email="admin@lacabrera.com.ar",
+        smtp_host="smtp.test",
+        smtp_factory=server.connect,
+        **options
+    )
+
+
+async def wait_until(condition, timeout: float = 5.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timeout esperando al worker"
+        await asyncio.sleep(0.01)
+
+
+def test_sends_by_priority_in_one_batch_over_one_connection():
+    server = FakeSMTPServer()
+    service = make_service(server)
+    
+    async def scenario():
+        for priority in ("low", "normal", "high", "urgent", "normal"):
+            assert service.enqueue(f"aviso {priority}", "detalle", priority)
+        await service.close()
+    
+    asyncio.run(scenario())
+    
+    assert server.subjects == [
+        "[URGENT] aviso urgent",
+        "[HIGH] aviso high",
+        "aviso normal",
+        "aviso normal",
+        "aviso low"
+    ]
+    assert len(server.connections) == 1
+    assert server.connections[0].closed
+    stats = service.get_stats()
+    assert stats["batches"] == 1
+    assert stats["sent"] == 5
+    assert stats["pending"] == 0
+
+
+def test_failed_batch_is_retried_with_backoff_on_a_new_connection():
+    server = FakeSMTPServer(fail_sends=1)
+    service = make_service(server)
+    
+    async def scenario():
+        service.enqueue("primero", "detalle", "high")
+        service.enqueue("segundo", "detalle", "normal")
+        await wait_until(lambda: service.get_stats()["sent"] == 2)
+        await service.close()
+    
+    asyncio.run(scenario())
+    
+    # El lote completo vuelve a la cola y sale en orden por una conexión nueva
+    assert server.subjects == ["[HIGH] primero", "segundo"]
+    assert len(server.connections) == 2
+    stats = service.get_stats()
+    assert stats["retries"] == 2
+    assert stats["failed"] == 0
+
+
+def test_gives_up_after_max_attempts():
+    server = FakeSMTPServer(fail_sends=100)
+    service = make_service(server, max_attempts=3)
+    
+    async def scenario():
+        service.enqueue("sin servidor", "detalle", "urgent")
+        await wait_until(lambda: service.get_stats()["failed"] == 1)
+        await service.close()
+    
+    asyncio.run(scenario())
+    
+    assert server.sent == []
+    assert len(server.connections) == 3
+    stats = service.get_stats()
+    assert stats["retries"] == 2
+    assert stats["pending"] == 0
+
+
+def test_backoff_grows_exponentially_with_jitter_up_to_the_cap():
+    service = make_service(FakeSMTPServer(), base_backoff=1.0, max_backoff=8.0)
+    
+    for attempt, ceiling in ((1, 1.0), (2, 2.0), (3, 4.0), (4, 8.0), (10, 8.0)):
+        delays = [service._backoff(attempt) for _ in range(50)]
+        assert all(ceiling * 0.5 <= delay <= ceiling for delay in delays)
+
+
+def test_close_drains_held_repetitions_and_the_pending_digest():
+    server = FakeSMTPServer()
+    service = make_service(server, coalesce_window=300.0, digest_interval=3600.0)
+    
+    async def scenario():
+        service.enqueue("Derivación a humano", "cliente pide hablar con alguien", "high", key="tel:2615550000")
+        await wait_until(lambda: service.get_stats()["sent"] == 1)
+        
+        # Dentro de la ventana: se retiene; normal/low esperan al resumen
+        service.enqueue("Derivación a humano", "insiste por la reserva", "high", key="tel:2615550000")
+        service.enqueue("Consulta sin respuesta", "pregunta por estacionamiento", "normal")
+        stats = service.get_stats()
+        assert (stats["held"], stats["digest_pending"]) == (1, 1)
+        
+        await service.close()
+        return service.enqueue("tarde", "después de cerrar", "urgent")
+    
+    accepted_after_close = asyncio.run(scenario())
+    
+    assert server.subjects == [
+        "[HIGH] Derivación a humano",
+        "[HIGH] Derivación a humano",
+        "Resumen de notificaciones (1)"
+    ]
+    assert "pregunta por estacionamiento" in server.sent[2].get_content()
+    assert accepted_after_close is False
+    stats = service.get_stats()
+    assert stats["dropped"] == 0
+    assert (stats["pending"], stats["held"], stats["digest_pending"]) == (0, 0, 0)
+
+
+def test_coalesces_repetitions_of_the_same_customer_into_one_email():
+    server = FakeSMTPServer()
+    service = make_service(server)
+    
+    async def scenario():
+        service.enqueue("Reserva fallida", "sin lugar a las 21:00", "normal", key="tel:2615550000")
+        service.enqueue("Derivación a humano", "pide hablar con alguien", "urgent", key="tel:2615550000")
+        await service.close()
+    
+    asyncio.run(scenario())
+    
+    assert server.subjects == ["[URGENT] Derivación a humano (x2)"]
+    body = server.sent[0].get_content()
+    assert "pide hablar con alguien" in body
+    assert "sin lugar a las 21:00" in body
@@ -0,0 +1,215 @@
+"""
+Pruebas de RedisMemoryBackend contra un Redis falso en el proceso.
+
+El falso implementa solo los comandos que usa el backend y registra cada
+round trip (comando suelto o pipeline ejecutado), así se verifica que cada
+turno sale en un único viaje a la red.
+"""
+import asyncio
+import fnmatch
+from typing import Any, Dict, List, Tuple
+
+from src.services.redis_memory import RedisMemoryBackend
+
+
+class FakePipeline:
+    """Encola comandos y los ejecuta juntos en `execute` (un round trip)"""
+    
+    def __init__(self, redis: "FakeRedis"):
+        self._redis = redis
+        self._commands: List[Tuple[str, tuple, dict]] = []
+    
+    def __getattr__(self, name: str):
+        def queue(*args, **kwargs):
+            self._commands.append((name, args, kwargs))
+            return self
+        return queue
+    
+    async def execute(self) -> List[Any]:
+        self._redis.round_trips.append([name for name, _, _ in self._commands])
+        return [getattr(self._redis, f"_{name}")(*args, **kwargs) for name, args, kwargs in self._commands]
+
+
+class FakeRedis:
+    """Subconjunto de redis.asyncio.Redis en memoria (devuelve bytes, como el cliente real)"""
+    
+    def __init__(self):
+        self.lists: Dict[str, List[bytes]] = {}
+        self.hashes: Dict[str, Dict[bytes, bytes]] = {}
+        self.ttls: Dict[str, int] = {}
+        self.round_trips: List[List[str]] = []
+        self.closed = False
+    
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+    
+    async def lrange(self, key: str, start: int, stop: int) -> List[bytes]:
+        self.round_trips.append(["lrange"])
+        return self._lrange(key, start, stop)
+    
+    async def llen(self, key: str) -> int:
+        self.round_trips.append(["llen"])
+        return len(self.lists.get(key, []))
+    
+    async def hgetall(self, key: str) -> Dict[bytes, bytes]:
+        self.round_trips.append(["hgetall"])
+        return dict(self.hashes.get(key, {}))
+    
+    async def delete(self, *keys: str) -> int:
+        self.round_trips.append(["delete"])
+        return sum(self._delete(key) for key in keys)
+    
+    async def aclose(self) -> None:
+        self.closed = True
+    
+    def keys_matching(self, pattern: str) -> List[str]:
+        return [key for key in (*self.lists, *self.hashes) if fnmatch.fnmatch(key, pattern)]
+    
+    def _rpush(self, key: str, *values: str) -> int:
+        items = self.lists.setdefault(key, [])
+        items.extend(value.encode("utf-8") for value in values)
+        return len(items)
+    
+    def _ltrim(self, key: str, start: int, stop: int) -> bool:
+        if key in self.lists:
+            self.lists[key] = self._lrange(key, start, stop)
+        return True
+    
+    def _lrange(self, key: str, start: int, stop: int) -> List[bytes]:
+        items = self.lists.get(key, [])
+        stop = len(items) if stop == -1 else stop + 1
+        return items[start:stop]
+    
+    def _hset(self, key: str, mapping: Dict[str, str]) -> int:
+        fields = self.hashes.setdefault(key, {})
+        fields.update({field.encode("utf-8"): value.encode("utf-8") for field, value in mapping.items()})
+        return len(mapping)
+    
+    def _expire(self, key: str, seconds: int) -> bool:
+        self.ttls[key] = seconds
+        return True
+    
+    def _delete(self, key: str) -> int:
+        found = self.lists.pop(key, None) is not None or self.hashes.pop(key, None) is not None
+        self.ttls.pop(key, None)
+        return int(found)
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_backend(redis: FakeRedis, clock: FakeClock, **kwargs) -> RedisMemoryBackend:
+    return RedisMemoryBackend(client=redis, clock=clock, idle_ttl_seconds=3600, **kwargs)
+
+
+def test_turn_with_context_is_one_pipelined_round_trip():
+    redis, clock = FakeRedis(), FakeClock()
+    backend = make_backend(redis, clock)
+    
+    asyncio.run(backend.add_message_with_context(
+        "conv-1", "user", "Hola, quiero reservar", "tel:5492615550000", {"nombre": "Ana", "personas": 4}
+    ))
+    
+    assert redis.round_trips == [["rpush", "ltrim", "expire", "hset", "expire"]]
+    assert redis.ttls == {"lacabrera:conv:conv-1": 3600, "lacabrera:ctx:tel:5492615550000": 3600}
+    assert asyncio.run(backend.get_customer_context("tel:5492615550000")) == {"nombre": "Ana", "personas": 4}
+
+
+def test_history_is_trimmed_and_read_with_a_single_lrange():
+    redis, clock = FakeRedis(), FakeClock()
+    backend = make_backend(redis, clock, max_messages=3)
+    
+    async def scenario():
+        for index in range(5):
+            await backend.add_message("conv-1", "user", f"mensaje {index}", {"n": index} if index == 4 else None)
+        redis.round_trips.clear()
+        return await backend.get_conversation_history("conv-1")
+    
+    history = asyncio.run(scenario())
+    
+    assert redis.round_trips == [["lrange"]]
+    assert [message["content"] for message in history] == ["mensaje 2", "mensaje 3", "mensaje 4"]
+    assert history[-1]["metadata"] == {"n": 4}
+    assert len(redis.lists["lacabrera:conv:conv-1"]) == 3
+
+
+def test_near_cache_serves_repeated_reads_and_reflects_own_writes():
+    redis, clock = FakeRedis(), FakeClock()
+    backend = make_backend(redis, clock, near_cache_ttl=2.0)
+    
+    async def scenario():
+        await backend.add_message("conv-1", "user", "hola")
+        await backend.get_conversation_history("conv-1")
+        redis.round_trips.clear()
+        
+        first = await backend.check_first_interaction("conv-1")
+        await backend.add_message("conv-1", "assistant", "¡Bienvenido!")
+        history = await backend.get_conversation_history("conv-1", limit=1)
+        return first, history
+    
+    first, history = asyncio.run(scenario())
+    
+    # Solo sale a la red la escritura; las lecturas salen del near-cache
+    assert redis.round_trips == [["rpush", "ltrim", "expire"]]
+    assert first is False
+    assert [message["content"] for message in history] == ["¡Bienvenido!"]
+    assert backend.get_stats()["near_cache_hits"] == 1
+
+
+def test_near_cache_expires_and_sees_writes_from_other_replicas():
+    redis, clock = FakeRedis(), FakeClock()
+    replica_a = make_backend(redis, clock, near_cache_ttl=2.0)
+    replica_b = make_backend(redis, clock, near_cache_ttl=2.0)
+    
+    async def scenario():
+        await replica_a.add_message("conv-1", "user", "hola")
+        await replica_a.get_conversation_history("conv-1")
+        await replica_b.add_message("conv-1", "assistant", "desde otra réplica")
+        
+        stale = await replica_a.get_conversation_history("conv-1")
+        clock.now += 2.0
+        fresh = await replica_a.get_conversation_history("conv-1")
+        return stale, fresh
+    
+    stale, fresh = asyncio.run(scenario())
+    
+    assert [message["content"] for message in stale] == ["hola"]
+    assert [message["content"] for message in fresh] == ["hola", "desde otra réplica"]
+
+
+def test_clear_conversation_invalidates_the_near_cache():
+    redis, clock = FakeRedis(), FakeClock()
+    backend = make_backend(redis, clock)
+    
+    async def scenario():
+        await backend.add_message("conv-1", "user", "hola")
+        await backend.get_conversation_history("conv-1")
+        await backend.clear_conversation("conv-1")
+        return await backend.get_conversation_history("conv-1"), await backend.check_first_interaction("conv-1")
+    
+    history, first = asyncio.run(scenario())
+    
+    assert history == []
+    assert first is True
+    assert redis.keys_matching("lacabrera:conv:*") == []
+
+
+def test_near_cache_is_bounded():
+    redis, clock = FakeRedis(), FakeClock()
+    backend = make_backend(redis, clock, near_cache_size=2)
+    
+    async def scenario():
+        for conversation_id in ("a", "b", "c"):
+            await backend.add_message(conversation_id, "user", "hola")
+            await backend.get_conversation_history(conversation_id)
+        await backend.close()
+    
+    asyncio.run(scenario())
+    
+    assert backend.get_stats()["near_cache_entries"] == 2
+    assert redis.closed